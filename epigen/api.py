@@ -0,0 +1,155 @@
+##
+# Functions that simulate data in memory and return numpy arrays
+# instead of writing files. They use the same generators as the
+# commands, which only add the writing of the files on top.
+#
+# Example:
+#
+#   from epigen import api
+#   pairs = api.simulate_pairs( "binomial", mu = [ 0.1 ] * 8 + [ 0.5 ], npairs = 10 )
+#   y = api.simulate_phenotype( pairs.genotypes[ :2 ], "normal", mu = [ 0.0 ] * 8 + [ 1.0 ] )
+#
+import numpy as np
+
+from epigen.plink import generate, genmodels
+
+##
+# The genotypes of a set of simulated pairs and the phenotype
+# they were generated from.
+#
+class SimulatedPairs:
+    ##
+    # Constructor.
+    #
+    # @param genotypes A uint8 ( 2 * pairs, samples ) array, pair i is
+    #                  rows 2 * i and 2 * i + 1.
+    # @param phenotype The phenotype of each sample.
+    # @param is_case Whether each pair is an interaction or not.
+    # @param model_index The index of the model each pair was generated from.
+    # @param mu The mean value for each genotype.
+    #
+    def __init__(self, genotypes, phenotype, is_case, model_index, mu):
+        self.genotypes = genotypes
+        self.phenotype = phenotype
+        self.is_case = is_case
+        self.model_index = model_index
+        self.mu = mu
+
+    ##
+    # Returns the genotypes of a pair.
+    #
+    # @param i Index of the pair.
+    #
+    # @return A uint8 ( 2, samples ) array.
+    #
+    def pair(self, i):
+        return self.genotypes[ 2 * i:2 * i + 2 ]
+
+    def __len__(self):
+        return len( self.is_case )
+
+##
+# Returns the mean value of each genotype from either mu or beta.
+#
+# @param model The type of model (binomial or normal).
+# @param mu The mean value for each genotype.
+# @param beta The regression coefficients a, b1, b2, g1, g2, d11, d12, d21 and d22.
+# @param link The link function to use with beta.
+#
+def get_mu(model, mu, beta, link):
+    if ( mu is None ) == ( beta is None ):
+        raise ValueError( "Exactly one of mu and beta must be set." )
+
+    if mu is None:
+        mu = genmodels.get_mean_values( beta, genmodels.get_link( model, link ) )
+
+    if len( mu ) != 9:
+        raise ValueError( "There must be 9 mean values, one for each genotype." )
+
+    return list( mu )
+
+##
+# Simulates pairs of variants by conditioning on the phenotype, in
+# the same way as the pair-general and pair-glm commands.
+#
+# @param model The type of model (binomial or normal).
+# @param mu The mean value for each genotype, specified row-wise.
+# @param beta The regression coefficients (instead of mu).
+# @param link The link function to use with beta.
+# @param dispersion The dispersion parameter (only used in normal).
+# @param maf Minor allele frequency of the two variants.
+# @param sample_maf If true maf is a range that the frequencies are sampled from.
+# @param sample_size Number of cases and controls (only the first is used for normal).
+# @param npairs The number of pairs.
+# @param ld Strength of LD (signed Lewontin's D').
+#
+# @return A SimulatedPairs object.
+#
+def simulate_pairs(model, mu = None, beta = None, link = "default", dispersion = 1.0, maf = ( 0.4, 0.4 ), sample_maf = False,
+                   sample_size = ( 2000, 2000 ), npairs = 100, ld = None):
+    mu = get_mu( model, mu, beta, link )
+    fixed_params = genmodels.FixedParams( list( maf ), ld, list( sample_size ), sample_maf )
+    model_def, params = genmodels.get_model_and_params( model, mu, dispersion, list( maf ), ld )
+
+    phenotype = model_def.generate_phenotype( fixed_params )
+    genotypes = np.empty( ( 2 * npairs, len( phenotype ) ), dtype = np.uint8 )
+    is_case = np.empty( npairs, dtype = bool )
+    model_index = np.empty( npairs, dtype = np.int64 )
+    for i, ( snp1, snp2, case, index ) in enumerate( generate.generate_general_data( model_def, fixed_params, [ ( npairs, 1, params ) ], phenotype ) ):
+        genotypes[ 2 * i ] = snp1
+        genotypes[ 2 * i + 1 ] = snp2
+        is_case[ i ] = case
+        model_index[ i ] = index
+
+    return SimulatedPairs( genotypes, np.asarray( phenotype, dtype = np.float64 ), is_case, model_index, mu )
+
+##
+# Simulates a phenotype from the genotypes of two variants, in the same
+# way as the pheno-general and pheno-glm commands.
+#
+# @param genotypes A ( 2, samples ) array of genotypes, 3 is missing.
+# @param model The type of model (binomial or normal).
+# @param mu The mean value for each genotype, specified row-wise.
+# @param beta The regression coefficients (instead of mu).
+# @param link The link function to use with beta.
+# @param dispersion The dispersion parameter (only used in normal).
+#
+# @return An array with the phenotype of each sample, missing is nan.
+#
+def simulate_phenotype(genotypes, model, mu = None, beta = None, link = "default", dispersion = 1.0):
+    mu = get_mu( model, mu, beta, link )
+    genotypes = np.asarray( genotypes )
+    if genotypes.ndim != 2 or genotypes.shape[ 0 ] != 2:
+        raise ValueError( "The genotypes must be a ( 2, samples ) array." )
+
+    pheno_generator = genmodels.get_pheno_generator( model, genmodels.GeneralMuMap( mu ), dispersion )
+
+    return pheno_generator.generate_phenos( genotypes )
+
+##
+# Simulates independent variants, or variants in LD if r2 or dprime
+# is set, in the same way as the plink-data command.
+#
+# @param nvariants The number of variants.
+# @param nsamples The number of samples.
+# @param maf Range of the allele frequencies (default beta distribution).
+# @param rare_maf Threshold for generating variants from their carriers.
+# @param r2 Target r^2 between adjacent variants.
+# @param dprime Target D' between adjacent variants.
+#
+# @return A uint8 ( variants, samples ) array of genotypes.
+#
+def simulate_genotypes(nvariants, nsamples, maf = None, rare_maf = 0.01, r2 = None, dprime = None):
+    if r2 is not None and dprime is not None:
+        raise ValueError( "Only one of r2 and dprime can be set." )
+
+    if r2 is not None or dprime is not None:
+        blocks = generate.generate_ld( nvariants, nsamples, maf, r2, dprime )
+    else:
+        blocks = generate.generate_single( nvariants, nsamples, maf, rare_maf )
+
+    genotypes = np.empty( ( nvariants, nsamples ), dtype = np.uint8 )
+    for start, block in blocks:
+        genotypes[ start:start + len( block ) ] = block
+
+    return genotypes
@@ -0,0 +1,19 @@
+import click
+
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import freq
+
+@click.command( 'freq', cls = CommandWithHelp, short_help="Computes the allele frequency, missingness and HWE p-value of every variant." )
+@click.argument( 'plink_file', type=click.Path( ) )
+@click.option( '--threads', type=click.IntRange( min = 1 ), help='The number of threads that scan the .bed file (default one per cpu).', default = None )
+@click.option( '--out', help='Output .frq file (default the plink prefix with .frq).', type=click.Path( writable = True ), default = None )
+def epigen(plink_file, threads, out):
+    if not out:
+        out = plink_file + ".frq"
+
+    try:
+        stats = freq.open_frequencies( plink_file, threads )
+        freq.write_frq( plink_file, stats, out )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
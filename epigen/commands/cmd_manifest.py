@@ -0,0 +1,18 @@
+import click
+import os
+
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import manifest
+
+@click.command( 'manifest', cls = CommandWithHelp, short_help="Converts a binary .manifest to the .pair, .case and .model text files." )
+@click.argument( 'manifest_file', type=click.Path( exists = True ) )
+@click.option( '--out', help='Output prefix (default the prefix of the manifest).', type=click.Path( writable = True ), default = None )
+def epigen(manifest_file, out):
+    if not out:
+        out, ext = os.path.splitext( manifest_file )
+
+    try:
+        manifest.write_text( manifest_file, out )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
@@ -0,0 +1,14 @@
+import click
+
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import merge
+
+@click.command( 'merge', cls = CommandWithHelp, short_help="Merges the plink and pair files of shards generated with --shard." )
+@click.argument( 'shards', nargs=-1, required = True, type=click.Path( ) )
+@click.option( '--out', help='Output prefix.', type=click.Path( writable = True ), required = True )
+def epigen(shards, out):
+    try:
+        merge.merge_shards( list( shards ), out )
+    except ( IOError, OSError, ValueError ) as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
@@ -0,0 +1,34 @@
+import click
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import genmodels
+from epigen.power import simulate
+from epigen.util import probability
+
+@click.command( 'power', cls = CommandWithHelp, short_help="Estimates the power and type I error of association tests by simulating data in memory." )
+@click.option( '--model', type=click.Choice( genmodels.get_models( ) ), help='The type of model to use.', required = True )
+@click.option( '--mu', nargs=9, type=float, help='Space-separated list of floating point numbers that represents the mean value for each genotype, specified row-wise from left to right.', default = None )
+@click.option( '--beta', nargs=9, type=float, help='Space-separated list of regression coefficients a, b1, b2, g1, g2, d11, d12, d21 and d22 (instead of --mu).', default = None )
+@click.option( '--link', type=click.Choice( genmodels.get_links( ).keys( ) ), help='The link function to use with --beta.', default = "default" )
+@click.option( '--dispersion', type=float, help='The dispersion parameter (only used in normal for now).', default = 1.0 )
+@click.option( '--maf', nargs=2, type=probability.probability, help='Minor allele frequency of the two snps.', default = [0.4, 0.4] )
+@click.option( '--sample-maf/--no-sample-maf', help='The --maf is treated as a range and maf is sampled uniformly in this range.', default = False )
+@click.option( '--sample-size', nargs=2, type=int, help='Number of samples (for binomial cases and controls, only first will be considered otherwise).', default = [2000, 2000] )
+@click.option( '--ld', type=probability.probability, help='Strength of LD (signed Lewontin\'s D\').', default = None )
+@click.option( '--replicates', type=int, help='The number of simulated datasets.', default = 1000 )
+@click.option( '--alpha', type=probability.probability, help='The significance level of the tests.', default = 0.05 )
+@click.option( '--out', type=click.File( "w" ), help='Output file for the power estimates (default stdout).', default = "-" )
+def epigen(model, mu, beta, link, dispersion, maf, sample_maf, sample_size, ld, replicates, alpha, out):
+    if bool( mu ) == bool( beta ):
+        print( "epigen: error: Exactly one of --mu or --beta must be set." )
+        exit( 1 )
+
+    if beta:
+        mu = genmodels.get_mean_values( beta, genmodels.get_link( model, link ) )
+
+    fixed_params = genmodels.FixedParams( maf, ld, sample_size, sample_maf )
+    results = simulate.estimate_power( model, mu, dispersion, fixed_params, replicates, alpha )
+
+    out.write( "test\tdf\tpower\tpower_lower\tpower_upper\ttype1\ttype1_lower\ttype1_upper\n" )
+    for r in results:
+        out.write( "{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}\n".format( r[ "test" ], r[ "df" ], r[ "power" ], r[ "power_ci" ][ 0 ], r[ "power_ci" ][ 1 ],
+                                                                      r[ "type1" ], r[ "type1_ci" ][ 0 ], r[ "type1_ci" ][ 1 ] ) )
@@ -0,0 +1,18 @@
+import click
+import multiprocessing
+
+from epigen.daemon import client, server
+
+@click.command( 'serve', short_help="Runs a server that executes submitted commands with warm imports and cached input files." )
+@click.option( '--socket', 'socket_path', type=click.Path( ), help='Path to the Unix socket (default $XDG_RUNTIME_DIR/epigen.sock).', default = None )
+@click.option( '--workers', type=click.IntRange( min = 1 ), help='The number of worker processes (default the number of cpus).', default = None )
+@click.option( '--cache-size', type=click.IntRange( min = 0 ), help='The number of opened plink and environment files each worker keeps.', default = 16 )
+def epigen(socket_path, workers, cache_size):
+    if not socket_path:
+        socket_path = client.default_socket( )
+
+    if not workers:
+        workers = multiprocessing.cpu_count( )
+
+    print( "epigen: serving on {0} with {1} workers".format( socket_path, workers ) )
+    server.serve( socket_path, workers, cache_size )
@@ -0,0 +1,22 @@
+import click
+import sys
+
+from epigen.commands.command import CommandWithHelp
+from epigen.daemon import client
+
+@click.command( 'submit', cls = CommandWithHelp, short_help="Runs a command on a server started with 'epigen serve'.", context_settings = dict( ignore_unknown_options = True ) )
+@click.option( '--socket', 'socket_path', type=click.Path( ), help='Path to the Unix socket of the server.', default = None )
+@click.argument( 'args', nargs = -1, type = click.UNPROCESSED )
+def epigen(socket_path, args):
+    if not socket_path:
+        socket_path = client.default_socket( )
+
+    try:
+        response = client.submit( socket_path, args )
+    except ( IOError, OSError ) as e:
+        print( "epigen: error: Could not connect to the server at {0}: {1}".format( socket_path, e ) )
+        exit( 1 )
+
+    sys.stdout.write( response[ "stdout" ] )
+    sys.stderr.write( response[ "stderr" ] )
+    exit( response[ "status" ] )
@@ -0,0 +1,14 @@
+import click
+
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import stream
+
+@click.command( 'unstream', cls = CommandWithHelp, short_help="Writes a stream from --stream to a plink file, and the pairs to a .manifest." )
+@click.argument( 'stream_file', type=str )
+@click.option( '--out', help='Output prefix.', type=click.Path( writable = True ), required = True )
+def epigen(stream_file, out):
+    try:
+        stream.write_files( stream_file, out )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
@@ -10,8 +10,13 @@ class ComplexCLI( click.MultiCommand ):
 
     def list_commands(self, ctx):
         rv = []
+        root_dir = os.path.abspath( os.path.dirname( commands.__file__ ) )
+        for filename in os.listdir( root_dir ):
+            if filename.startswith( "cmd_" ) and filename.endswith( ".py" ):
+                rv.append( filename[ 4:-3 ] )
+
         for cmd_subdir in self.cmd_subdirs:
-            cmd_dir = os.path.join( os.path.abspath( os.path.dirname( commands.__file__ ) ), cmd_subdir )
+            cmd_dir = os.path.join( root_dir, cmd_subdir )
             for filename in os.listdir( cmd_dir ):
                 if filename.startswith( "cmd_" ) and filename.endswith( ".py" ):
                     rv.append( cmd_subdir + "-" + filename[ 4:-3 ] )
@@ -27,6 +32,8 @@ class ComplexCLI( click.MultiCommand ):
 
             cmd_dir, sep, cmd_name = name.partition( "-" )
             mod_name = "epigen.commands.{0}.cmd_{1}".format( cmd_dir, cmd_name )
+            if not sep:
+                mod_name = "epigen.commands.cmd_{0}".format( cmd_dir )
             mod = __import__( mod_name, None, None, [ "epigen" ] )
         except ImportError:
             return
@@ -1,6 +1,6 @@
 import click
 from epigen.commands.command import CommandWithHelp
-from epigen.plink import generate, genmodels, info
+from epigen.plink import generate, genmodels, info, checkpoint, shard
 from epigen.util import probability
 
 @click.command( 'glm', cls = CommandWithHelp, short_help="Generates a plink file by conditioning on the phenotype and generating genotypes, useful for case/control." )
@@ -13,8 +13,33 @@ from epigen.util import probability
 @click.option( '--sample-size', nargs=2, type=int, help='Number of samples (for binomial cases and controls, only first will be considered otherwise).', default = [2000, 2000] )
 @click.option( '--npairs', type=int, help='Number of interaction pairs', default = 100 )
 @click.option( '--ld', type=probability.probability, help='Strength of LD (signed Lewontin\'s D\').', default = None )
+@click.option( '--tables-only/--no-tables-only', help='Only write the case/control genotype counts of each pair to .tables (binomial only), no plink file is generated.', default = False )
+@click.option( '--frq/--no-frq', help='Write the realised allele frequencies and HWE p-values of each variant to a .frq file.', default = False )
+@click.option( '--queue-depth', type=click.IntRange( min = 0 ), help='Number of generated blocks that can wait to be written in the background (0 writes in the main thread).', default = 2 )
+@click.option( '--manifest/--no-manifest', help='Write the pairs, interaction status, model and realised allele frequencies to a binary .manifest instead of .pair, .case and .model.', default = False )
+@click.option( '--stream', type=str, help='Write the plink file and the pairs as a stream to this path or - for stdout instead of to --out, the .info file is still written to --out.', default = None )
+@click.option( '--checkpoint-interval', type=click.IntRange( min = 0 ), help='Seconds between checkpoints written to .checkpoint so that an interrupted run can be resumed (0 disables).', default = checkpoint.DEFAULT_INTERVAL )
+@click.option( '--resume/--no-resume', help='Continue an interrupted run from its .checkpoint with identical results (starts from the beginning if there is none).', default = False )
+@click.option( '--shard', type=shard.parse_shard, help='Only generate the i:th of N slices of the pairs, given as i/N, the shards can be combined with epigen merge (requires --seed).', default = None )
+@click.option( '--append/--no-append', help='Append the pairs to an existing output with --out, conditioned on the phenotype in its .fam file (--sample-size is ignored).', default = False )
 @click.option( '--out', help='Output plink file.', type=click.Path( writable = True ), required = True )
-def epigen(model, link, beta, dispersion, maf, sample_maf, sample_size, npairs, ld, out):
+def epigen(model, link, beta, dispersion, maf, sample_maf, sample_size, npairs, ld, tables_only, frq, queue_depth, manifest, stream, checkpoint_interval, resume, shard, append, out):
+    if tables_only and stream:
+        print( "epigen: error: --stream can not be used with --tables-only." )
+        exit( 1 )
+
+    if tables_only and resume:
+        print( "epigen: error: --resume can not be used with --tables-only." )
+        exit( 1 )
+
+    if tables_only and append:
+        print( "epigen: error: --append can not be used with --tables-only." )
+        exit( 1 )
+
+    if tables_only and model != "binomial":
+        print( "epigen: error: --tables-only is only available for the binomial model." )
+        exit( 1 )
+
     lf = genmodels.get_link( model, link )
 
     mu = genmodels.get_mean_values( beta, lf )
@@ -22,5 +47,14 @@ def epigen(model, link, beta, dispersion, maf, sample_maf, sample_size, npairs,
 
     fixed_params = genmodels.FixedParams( maf, ld, sample_size, sample_maf )
     model_list = [ ( npairs, 1, params ) ]
-    info.write_info( model, mu, maf, dispersion, sample_size, out + ".info" )
-    generate.write_general_data( model_def, fixed_params, model_list, out )
+    extra_info = { }
+    if tables_only:
+        generate.write_general_tables( model_def, fixed_params, model_list, out, manifest = manifest )
+    else:
+        try:
+            extra_info[ "realised" ] = generate.write_general_data( model_def, fixed_params, model_list, out, frq = frq, queue_depth = queue_depth, manifest = manifest, stream = stream, checkpoint_interval = checkpoint_interval, resume = resume, shard = shard, append = append )
+        except ValueError as e:
+            print( "epigen: error: {0}".format( e ) )
+            exit( 1 )
+
+    info.write_info( model, mu, maf, dispersion, sample_size, out + ".info", extra_info )
@@ -1,6 +1,6 @@
 import click
 
-from epigen.plink import generate, genmodels
+from epigen.plink import generate, genmodels, checkpoint, shard
 from epigen.util import probability
 from epigen.commands.command import CommandWithHelp
 
@@ -36,8 +36,35 @@ def parse_models(model_file):
 @click.option( '--maf', nargs=2, type=probability.probability, help='Minor allele frequency of the two snps.', default = [0.3, 0.3] )
 @click.option( '--sample-size', nargs=2, type=int, help='Number of cases and controls', default = [2000, 2000] )
 @click.option( '--ld', type=probability.probability, help='Strength of LD (ignores second maf).', default = None )
+@click.option( '--tables-only/--no-tables-only', help='Only write the case/control genotype counts of each pair to .tables (binomial only), no plink file is generated.', default = False )
+@click.option( '--queue-depth', type=click.IntRange( min = 0 ), help='Number of generated blocks that can wait to be written in the background (0 writes in the main thread).', default = 2 )
+@click.option( '--manifest/--no-manifest', help='Write the pairs, interaction status, model and realised allele frequencies to a binary .manifest instead of .pair, .case and .model.', default = False )
+@click.option( '--stream', type=str, help='Write the plink file and the pairs as a stream to this path or - for stdout instead of to --out.', default = None )
+@click.option( '--checkpoint-interval', type=click.IntRange( min = 0 ), help='Seconds between checkpoints written to .checkpoint so that an interrupted run can be resumed (0 disables).', default = checkpoint.DEFAULT_INTERVAL )
+@click.option( '--resume/--no-resume', help='Continue an interrupted run from its .checkpoint with identical results (starts from the beginning if there is none).', default = False )
+@click.option( '--shard', type=shard.parse_shard, help='Only generate the i:th of N slices of the pairs, given as i/N, the shards can be combined with epigen merge (requires --seed).', default = None )
+@click.option( '--append/--no-append', help='Append the pairs to an existing output with --out, conditioned on the phenotype in its .fam file (--sample-size is ignored).', default = False )
 @click.option( '--out', type = click.Path( writable = True ), help='Output plink file.', required = True )
-def epigen(model_file, maf, sample_size, ld, out):
+def epigen(model_file, maf, sample_size, ld, tables_only, queue_depth, manifest, stream, checkpoint_interval, resume, shard, append, out):
+    if tables_only and stream:
+        print( "epigen: error: --stream can not be used with --tables-only." )
+        exit( 1 )
+
+    if tables_only and resume:
+        print( "epigen: error: --resume can not be used with --tables-only." )
+        exit( 1 )
+
+    if tables_only and append:
+        print( "epigen: error: --append can not be used with --tables-only." )
+        exit( 1 )
+
     fixed_params = genmodels.FixedParams( maf, ld, sample_size )
     models = parse_models( model_file )
-    generate.write_general_data( genmodels.BinomialModel( ), fixed_params, models, out )
+    if tables_only:
+        generate.write_general_tables( genmodels.BinomialModel( ), fixed_params, models, out, manifest = manifest )
+    else:
+        try:
+            generate.write_general_data( genmodels.BinomialModel( ), fixed_params, models, out, queue_depth = queue_depth, manifest = manifest, stream = stream, checkpoint_interval = checkpoint_interval, resume = resume, shard = shard, append = append )
+        except ValueError as e:
+            print( "epigen: error: {0}".format( e ) )
+            exit( 1 )
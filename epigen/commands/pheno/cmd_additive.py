@@ -1,35 +1,75 @@
 import click
-from plinkio import plinkfile
 import random
 
-from epigen.plink import generate, genmodels, info
-from epigen.plink.util import find_rows, sample_loci_set, find_beta0, generate_beta, compute_mafs
+import numpy as np
+
+from epigen.plink import generate, genmodels, info, cache, subset, select, score
+from epigen.util import probability
+from epigen.plink.util import sample_causal_loci, generate_beta, solve_beta0
 from epigen.commands.command import CommandWithHelp
 
 @click.command( 'additive', cls = CommandWithHelp, short_help='Generates binary phenotypes for given plink data.' )
 @click.argument( 'plink_file', type=click.Path( ) )
-@click.option( '--beta0', type=float, help='Sets the intercept, by default it is chosen to get 50/50 cases and controls.', default = None )
+@click.option( '--beta0', type=float, help='Sets the intercept, by default it is chosen to get 50/50 cases and controls with --model binomial and to center the linear predictor otherwise.', default = None )
+@click.option( '--prevalence', type=probability.probability, help='Chooses the intercept that gives this fraction of cases among the samples, only with --model binomial.', default = None )
 @click.option( '--beta', nargs=2, type=float, help='The mean and variance of the beta variables (taken from a normal).', required = True )
 @click.option( '--num-loci', type=int, help='The number of loci that is involved in the phenotype.', default = 10 )
+@click.option( '--min-maf', type=float, help='Only variants with at least this minor allele frequency are selected as causal (default any).', default = 0.0 )
+@click.option( '--max-maf', type=float, help='Only variants with at most this minor allele frequency are selected as causal (default any).', default = 0.5 )
+@click.option( '--chromosome', type=str, multiple = True, help='Only variants on this chromosome are selected as causal, can be given several times (default any).' )
+@click.option( '--min-distance', type=click.IntRange( min = 0 ), help='The smallest distance in base pairs between two causal variants on the same chromosome.', default = 0 )
+@click.option( '--exclude-causal', type=click.Path( exists = True ), help='File with names of variants that can not be causal, one per line.', default = None )
 @click.option( '--model', type=click.Choice( genmodels.get_models( ) ), help="The model to use.", required = True )
 @click.option( '--link', type=click.Choice( genmodels.get_links( ).keys( ) ), help="The link function to use.", default = "default" )
 @click.option( '--dispersion', type=float, help="The dispersion parameter to use.", default=1.0 )
+@click.option( '--standardize/--no-standardize', help="Center and scale the genotypes by 2p and sqrt( 2p( 1 - p ) ) before applying the effects (default off).", default = False )
+@click.option( '--keep', type=click.Path( exists = True ), help='File with the family and individual id of the samples to use, one per line (default all).', default = None )
+@click.option( '--extract', type=click.Path( exists = True ), help='File with the names of the variants to use, one per line (default all).', default = None )
+@click.option( '--exclude', type=click.Path( exists = True ), help='File with the names of the variants that are not used, one per line.', default = None )
 @click.option( '--out', type = click.File( 'w' ), help='Output phenotype file.', required = True )
-def epigen(plink_file, beta0, beta, num_loci, model, link, dispersion, out):
-    input_file = plinkfile.open( plink_file ) 
+def epigen(plink_file, beta0, prevalence, beta, num_loci, min_maf, max_maf, chromosome, min_distance, exclude_causal, model, link, dispersion, standardize, keep, extract, exclude, out):
+    if prevalence is not None and ( model != "binomial" or beta0 is not None ):
+        print( "epigen: error: --prevalence requires --model binomial and can not be used with --beta0." )
+        exit( 1 )
+
+    try:
+        input_file = subset.open_subset( cache.open_plink( plink_file ), keep, extract, exclude )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
+
     loci = input_file.get_loci( )
-    snp_indices = sample_loci_set( loci, num_loci )
+    try:
+        exclude = select.read_names( exclude_causal ) if exclude_causal else None
+        constraints = select.CausalConstraints( min_maf, max_maf, chromosome, min_distance, exclude )
+        snp_indices = sample_causal_loci( input_file, num_loci, constraints )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
+
     gen_beta = generate_beta( num_loci, beta[ 0 ], beta[ 1 ] )
-    rows = find_rows( input_file, snp_indices )
+    scores = score.compute_scores( input_file, snp_indices, gen_beta, standardize )
     
     with open( plink_file + ".av", "w" ) as av_file:
         for index, b in zip( snp_indices, gen_beta ):
             av_file.write( loci[ index ].name + " " + str( b ) + "\n" )
 
-    if not beta0:
-        beta0 = find_beta0( rows, gen_beta )
+    if prevalence is None and beta0 is None and model == "binomial":
+        prevalence = 0.5
+
+    if prevalence is not None:
+        try:
+            beta0 = solve_beta0( scores, genmodels.get_array_link( model, link ), prevalence )
+        except ValueError as e:
+            print( "epigen: error: {0}".format( e ) )
+            exit( 1 )
+    elif beta0 is None:
+        beta0 = -float( np.nanmean( scores ) )
 
     mu_map = genmodels.AdditiveMuMap( beta0, gen_beta, genmodels.get_link( model, link ) )
     pheno_generator = genmodels.get_pheno_generator( model, mu_map, dispersion )
-    generate.write_general_phenotype( input_file.get_samples( ), rows, pheno_generator, out, False )
-    info.write_info( model, mu_map, compute_mafs( rows ), dispersion, pheno_generator.sample_size, plink_file + ".info", multiple = True )
+    mu = mu_map.map_scores( scores )
+    realised = generate.write_phenotype( input_file.get_samples( ), pheno_generator.generate_from_mu( mu ), pheno_generator, out, False )
+    extra_info = { "realised" : realised, "beta0" : beta0 }
+    extra_info.update( info.compute_realised( model, mu, dispersion ) )
+    info.write_info( model, mu_map, None, dispersion, pheno_generator.sample_size, plink_file + ".info", extra_info, multiple = True )
@@ -1,10 +1,9 @@
 import click
-from plinkio import plinkfile
 from math import sqrt
 import random
 
-from epigen.plink import generate, genmodels, info, envfile
-from epigen.plink.util import find_rows, sample_loci_set, find_beta0, generate_beta, compute_mafs, sample_gxe, find_gxe, mean, stdev
+from epigen.plink import generate, genmodels, info, cache, subset, select
+from epigen.plink.util import find_rows, sample_loci_set, sample_causal_loci, find_beta0, generate_beta, compute_mafs, sample_gxe, find_gxe, mean, stdev
 from epigen.commands.command import CommandWithHelp
 
 @click.command( 'env', cls = CommandWithHelp, short_help='Generates phenotypes using a gene-environment interaction model' )
@@ -18,21 +17,41 @@ from epigen.commands.command import CommandWithHelp
 @click.option( '--num-main', type=int, help='The number of genetic main effects (if --lock-main is set this option has no effect).', default = 1 )
 @click.option( '--num-env', type=int, help='The number of environmental effects.', default = 0 )
 @click.option( '--num-gxe', type=int, help='The number of gene-environment interactions.', default = 0 )
+@click.option( '--min-maf', type=float, help='Only variants with at least this minor allele frequency are selected as causal (default any).', default = 0.0 )
+@click.option( '--max-maf', type=float, help='Only variants with at most this minor allele frequency are selected as causal (default any).', default = 0.5 )
+@click.option( '--chromosome', type=str, multiple = True, help='Only variants on this chromosome are selected as causal, can be given several times (default any).' )
+@click.option( '--min-distance', type=click.IntRange( min = 0 ), help='The smallest distance in base pairs between two causal variants on the same chromosome.', default = 0 )
+@click.option( '--exclude-causal', type=click.Path( exists = True ), help='File with names of variants that can not be causal, one per line.', default = None )
 @click.option( '--model', type=click.Choice( genmodels.get_models( ) ), help="The model to use.", required = True )
 @click.option( '--link', type=click.Choice( genmodels.get_links( ).keys( ) ), help="The link function to use.", default = "default" )
 @click.option( '--dispersion', type=float, help="The dispersion parameter to use (if none will be remaining heritability, otherwise heritability will be rescaled).", default=None )
+@click.option( '--keep', type=click.Path( exists = True ), help='File with the family and individual id of the samples to use, one per line (default all).', default = None )
+@click.option( '--extract', type=click.Path( exists = True ), help='File with the names of the variants to use, one per line (default all).', default = None )
+@click.option( '--exclude', type=click.Path( exists = True ), help='File with the names of the variants that are not used, one per line.', default = None )
 @click.option( '--out', type = click.File( 'w' ), help='Output phenotype file.', required=True )
-def epigen(plink_file, env_file, beta0, main_dist, env_dist, gxe_dist, lock_main, num_main, num_env, num_gxe, model, link, dispersion, out):
-    genotype_file = plinkfile.open( plink_file ) 
+def epigen(plink_file, env_file, beta0, main_dist, env_dist, gxe_dist, lock_main, num_main, num_env, num_gxe, min_maf, max_maf, chromosome, min_distance, exclude_causal, model, link, dispersion, keep, extract, exclude, out):
+    try:
+        genotype_file = subset.open_subset( cache.open_plink( plink_file ), keep, extract, exclude )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
+
     iid = [ s.iid for s in genotype_file.get_samples( ) ]
     loci = genotype_file.get_loci( )
-    snp_indices = sample_loci_set( loci, num_main )
+    try:
+        exclude = select.read_names( exclude_causal ) if exclude_causal else None
+        constraints = select.CausalConstraints( min_maf, max_maf, chromosome, min_distance, exclude )
+        snp_indices = sample_causal_loci( genotype_file, num_main, constraints )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
+
     main_std = 0
     if num_main > 0:
         main_std = sqrt( main_dist[ 1 ] / num_main )
     genotype_beta = generate_beta( num_main, main_dist[ 0 ], main_std )
 
-    env = envfile.openenv( env_file, iid )
+    env = cache.open_env( env_file, iid )
     env_names = env.get_names( )
     env_indices = sample_loci_set( env_names, num_env )
     env_std = 0
@@ -40,7 +59,6 @@ def epigen(plink_file, env_file, beta0, main_dist, env_dist, gxe_dist, lock_main
         env_std = sqrt( env_dist[ 1 ] / num_env )
     env_beta = generate_beta( num_env, env_dist[ 0 ], env_std )
 
-    genotype_file = plinkfile.open( plink_file ) 
     gxe_indices = sample_gxe( loci, env_names, num_gxe )
     gxe_std = 0
     if num_gxe > 0:
@@ -70,6 +88,6 @@ def epigen(plink_file, env_file, beta0, main_dist, env_dist, gxe_dist, lock_main
 
     mu_map = genmodels.AdditiveMuMap( beta0, all_beta, genmodels.get_link( model, link ), data_means, data_stdev )
     pheno_generator = genmodels.get_pheno_generator( model, mu_map, sqrt( dispersion ) )
-    generate.write_general_phenotype( genotype_file.get_samples( ), gxe_data, pheno_generator, out, False )
-    extra_info = { "truth" : truth, "beta" : dict( zip( truth, all_beta ) ) }
+    realised = generate.write_general_phenotype( genotype_file.get_samples( ), gxe_data, pheno_generator, out, False )
+    extra_info = { "truth" : truth, "beta" : dict( zip( truth, all_beta ) ), "realised" : realised }
     info.write_info( model, mu_map, None, dispersion, pheno_generator.sample_size, out.name + ".info", info = extra_info )
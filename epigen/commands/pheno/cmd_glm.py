@@ -1,10 +1,9 @@
 import click
-from plinkio import plinkfile
 
-from epigen.plink import generate, genmodels, info
+from epigen.plink import generate, genmodels, info, cache, subset
 from epigen.util import probability
 from epigen.commands.command import CommandWithHelp
-from epigen.plink.util import find_rows, sample_loci_set, find_beta0, compute_mafs
+from epigen.plink.util import find_rows, find_index, sample_loci_set, find_beta0, compute_mafs
 
 @click.command( 'glm', cls = CommandWithHelp, short_help='Generates a phenotype under the given GLM model and plink file.' )
 @click.option( '--model', type=click.Choice( genmodels.get_models( ) ), help='The type of model to use.', required = True )
@@ -13,15 +12,26 @@ from epigen.plink.util import find_rows, sample_loci_set, find_beta0, compute_ma
 @click.option( '--dispersion', type=float, help='The dispersion parameter (only used in normal for now).', default = 1.0 )
 @click.option( '--pair', nargs=2, type=str, help='Name of two SNPs for which the phenotype should be based on (otherwise random).', default = None )
 @click.option( "--plink-format/--no-plink-format", help="Use plink format for the phenotype file.", default = False )
+@click.option( '--keep', type=click.Path( exists = True ), help='File with the family and individual id of the samples to use, one per line (default all).', default = None )
+@click.option( '--extract', type=click.Path( exists = True ), help='File with the names of the variants to use, one per line (default all).', default = None )
+@click.option( '--exclude', type=click.Path( exists = True ), help='File with the names of the variants that are not used, one per line.', default = None )
 @click.option( '--out', type=click.File( "w" ), help='Output phenotype file.', required = True )
 @click.argument( 'plink_file', type=click.Path( exists = False ) )
-def epigen(model, link, beta, dispersion, pair, plink_format, out, plink_file):
-    input_file = plinkfile.open( plink_file )
+def epigen(model, link, beta, dispersion, pair, plink_format, keep, extract, exclude, out, plink_file):
+    try:
+        input_file = subset.open_subset( cache.open_plink( plink_file ), keep, extract, exclude )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
+
     loci = input_file.get_loci( )
 
     snp_indices = sample_loci_set( loci, 2 )
     if pair:
-        snp_indices = [ i for i, x in enumerate( loci ) if x in pair ]
+        snp_indices = find_index( loci, pair )
+        if len( snp_indices ) != 2:
+            print( "epigen: error: Could not find both variants of --pair in the plink file." )
+            exit( 1 )
 
     rows = find_rows( input_file, snp_indices )
     
@@ -30,5 +40,5 @@ def epigen(model, link, beta, dispersion, pair, plink_format, out, plink_file):
     
     mu_map = genmodels.GeneralMuMap( mu )
     pheno_generator = genmodels.get_pheno_generator( model, mu_map, dispersion )
-    generate.write_general_phenotype( input_file.get_samples( ), rows, pheno_generator, out, plink_format )
-    info.write_info( model, mu, compute_mafs( rows ), dispersion, pheno_generator.sample_size, plink_file + ".info" )
+    realised = generate.write_general_phenotype( input_file.get_samples( ), rows, pheno_generator, out, plink_format )
+    info.write_info( model, mu, compute_mafs( rows ), dispersion, pheno_generator.sample_size, plink_file + ".info", { "realised" : realised } )
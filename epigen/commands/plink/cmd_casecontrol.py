@@ -3,9 +3,11 @@ from plinkio import plinkfile
 import random
 import json
 
+import numpy as np
+
 from epigen.util import probability
-from epigen.plink import generate, genmodels, info
-from epigen.plink.util import generate_beta
+from epigen.plink import generate, genmodels, info, variant
+from epigen.plink.util import generate_beta, joint_maf, solve_beta0
 from epigen.commands.command import CommandWithHelp
 
 def generate_mafs(maf, n):
@@ -15,10 +17,17 @@ def generate_mafs(maf, n):
 
     return [ generate_maf( ) for i in range( n ) ]
 
+##
+# Number of genotype sets drawn to find the intercept for a prevalence
+# with --beta-sim.
+#
+PREVALENCE_SAMPLES = 100000
+
 @click.command( 'additive', cls = CommandWithHelp, short_help='Generate case/control data with both true and false variants.' )
 @click.option( '--maf', nargs=2, type=probability.probability, help='If set MAF is generated uniformly between these two values (default use exp distribution).', default = None )
 @click.option( '--mu', nargs=9, type=float, help='Space-separated list of floating point numbers that represents the mean value for each genotype, specified row-wise from left to right.', default = None )
 @click.option( '--beta0', type=float, help='Sets the intercept.', default = 0.0 )
+@click.option( '--prevalence', type=probability.probability, help='Chooses the intercept that gives this population prevalence, with --beta or --beta-sim.', default = None )
 @click.option( '--beta-sim', nargs=2, type=float, help='The mean and variance of the beta variables (taken from a normal).', default = None )
 @click.option( '--beta', nargs=9, type=float, help='Space-separated list of regression coefficients a, b1, b2, g1, g2, d11, d12, d21 and d22.', default = None )
 @click.option( '--link', type=click.Choice( genmodels.get_links( ).keys( ) ), help="The link function to use.", default = "default" )
@@ -26,14 +35,19 @@ def generate_mafs(maf, n):
 @click.option( '--num-true', type=int, help='The number of loci that is involved in the phenotype (used in --beta-sim).', default = 2 )
 @click.option( '--num-false', type=int, help='The number of loci that is not involved in the phenotype', default = 10 )
 @click.option( '--sample-size', nargs=2, type=int, help='Number of samples (if only one group only first argument will be used).', default = [2000, 2000] )
+@click.option( '--frq/--no-frq', help='Write the realised allele frequencies and HWE p-values of each variant to a .frq file.', default = False )
 @click.option( '--out', type = click.Path( exists = False ), help='Output prefix (pheno will be .pheno).', required = True )
-def epigen(maf, mu, beta0, beta, beta_sim, link, dispersion, num_true, num_false, sample_size, out): 
+def epigen(maf, mu, beta0, prevalence, beta, beta_sim, link, dispersion, num_true, num_false, sample_size, frq, out): 
     pheno_generator = None
 
     if (mu or beta) and num_true != 2:
         print( "epigen: error: With 'mu' or 'beta' --num-true must be 2." )
         exit( 1 )
 
+    if prevalence is not None and mu:
+        print( "epigen: error: --prevalence can only be used with --beta or --beta-sim." )
+        exit( 1 )
+
     mu_values = mu
     if mu and not beta and not beta_sim:
         mu_map = genmodels.GeneralMuMap( mu )
@@ -53,8 +67,31 @@ def epigen(maf, mu, beta0, beta, beta_sim, link, dispersion, num_true, num_false
         exit( 1 )
     
     mafs = generate_mafs( maf, num_true + num_false )
-    info.write_info( "binomial", mu_values, mafs[ :num_true ], dispersion, sample_size, out + ".info", { "num-true" : num_true, "num-false" : num_false } )
+
+    extra_info = { }
+    if prevalence is not None:
+        # The linear predictors are over the nine genotypes of the pair
+        # with --beta, and over sampled genotype sets with --beta-sim
+        try:
+            if beta:
+                eta = genmodels.get_mean_values( [ 0.0 ] + list( beta[ 1: ] ), lambda x: x )
+                beta0 = solve_beta0( eta, genmodels.get_array_link( "binomial", link ), prevalence, joint_maf( mafs[ :num_true ], None ) )
+                mu_values = genmodels.get_mean_values( [ beta0 ] + list( beta[ 1: ] ), genmodels.get_link( "binomial", link ) )
+                pheno_generator = genmodels.get_pheno_generator( "binomial", genmodels.GeneralMuMap( mu_values ), dispersion )
+            else:
+                rows = variant.generate_variant_block( mafs[ :num_true ], PREVALENCE_SAMPLES )
+                beta0 = solve_beta0( np.dot( gen_beta, rows ), genmodels.get_array_link( "binomial", link ), prevalence )
+                mu_values.beta0 = beta0
+        except ValueError as e:
+            print( "epigen: error: {0}".format( e ) )
+            exit( 1 )
+
+        extra_info[ "beta0" ] = beta0
+
     with open( out + ".pheno", "w" ) as pheno_file:
-        generate.write_casecontrol_data( pheno_generator, sample_size, mafs, num_true, num_false, out, pheno_file, False ) 
+        realised = generate.write_casecontrol_data( pheno_generator, sample_size, mafs, num_true, num_false, out, pheno_file, False, frq = frq )
+
+    extra_info.update( { "num-true" : num_true, "num-false" : num_false, "realised" : realised } )
+    info.write_info( "binomial", mu_values, mafs[ :num_true ], dispersion, sample_size, out + ".info", extra_info, multiple = bool( beta_sim ) )
 
 
@@ -1,13 +1,43 @@
 import click
 from epigen.commands.command import CommandWithHelp
-from epigen.plink import generate
+from epigen.plink import generate, shard
 from epigen.util import probability
 
 @click.command( 'data', cls = CommandWithHelp, short_help="Generates a plink file without a phenotype." )
 @click.option( '--maf', nargs=2, type=probability.probability, help='If set MAF is generated uniformly between these two values (default use exp distribution).', default = None )
 @click.option( '--nsamples', type=int, help='The number of samples.', default = 2000 )
 @click.option( '--nvariants', type=int, help='The number of variants.', default = 10000 )
+@click.option( '--ld-r2', type=probability.probability, help='Generate haplotypes as a Markov chain with this r^2 between adjacent variants (LD decays geometrically with distance).', default = None )
+@click.option( '--ld-dprime', type=probability.probability, help='Generate haplotypes as a Markov chain with this D\' between adjacent variants (LD decays geometrically with distance).', default = None )
+@click.option( '--rare-maf', type=probability.probability, help='Variants with a minor allele frequency below this are generated by only sampling the carriers (ignored with LD).', default = 0.01 )
 @click.option( '--create-pair/--no-create-pair', help='Create a .pair file in the output prefix that contains all possible pairs of variants.', default = False )
+@click.option( '--frq/--no-frq', help='Write the realised allele frequencies and HWE p-values of each variant to a .frq file.', default = False )
+@click.option( '--stream', type=str, help='Write the plink file as a stream to this path or - for stdout instead of to --out.', default = None )
+@click.option( '--shard', type=shard.parse_shard, help='Only generate the i:th of N slices of the variants, given as i/N, the shards can be combined with epigen merge (requires --seed).', default = None )
+@click.option( '--append/--no-append', help='Append the variants to an existing plink file with --out (--nsamples is taken from its .fam file).', default = False )
 @click.option( '--out', help='Output plink file.', type=click.Path( writable = True ), required = True )
-def epigen(maf, nsamples, nvariants, create_pair, out):
-    generate.write_single( nvariants, nsamples, out, maf = maf, create_pair = create_pair )
+def epigen(maf, nsamples, nvariants, ld_r2, ld_dprime, rare_maf, create_pair, frq, stream, shard, append, out):
+    if ld_r2 is not None and ld_dprime is not None:
+        print( "epigen: error: Only one of --ld-r2 and --ld-dprime can be set." )
+        exit( 1 )
+
+    if create_pair and stream:
+        print( "epigen: error: --create-pair can not be used with --stream." )
+        exit( 1 )
+
+    if create_pair and shard:
+        print( "epigen: error: --create-pair can not be used with --shard." )
+        exit( 1 )
+
+    if append and ( stream or shard ):
+        print( "epigen: error: --append can not be used with --stream or --shard." )
+        exit( 1 )
+
+    try:
+        if ld_r2 is not None or ld_dprime is not None:
+            generate.write_ld( nvariants, nsamples, out, maf = maf, r2 = ld_r2, dprime = ld_dprime, create_pair = create_pair, frq = frq, stream = stream, shard = shard, append = append )
+        else:
+            generate.write_single( nvariants, nsamples, out, maf = maf, create_pair = create_pair, rare_maf = rare_maf, frq = frq, stream = stream, shard = shard, append = append )
+    except ValueError as e:
+        print( "epigen: error: {0}".format( e ) )
+        exit( 1 )
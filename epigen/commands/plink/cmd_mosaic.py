@@ -0,0 +1,16 @@
+import click
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import generate
+
+@click.command( 'mosaic', cls = CommandWithHelp, short_help="Generates a plink file whose samples are mosaics of the samples in a reference plink file." )
+@click.argument( 'plink_file', type=click.Path( ) )
+@click.option( '--nsamples', type=int, help='The number of samples.', default = 2000 )
+@click.option( '--nsegments', type=int, help='Average number of segments copied from different reference samples (high number means low relatedness to the reference).', default = 1000 )
+@click.option( '--create-pair/--no-create-pair', help='Create a .pair file in the output prefix that contains all possible pairs of variants.', default = False )
+@click.option( '--out', help='Output plink file.', type=click.Path( writable = True ), required = True )
+def epigen(plink_file, nsamples, nsegments, create_pair, out):
+    if nsegments < 1:
+        print( "epigen: error: --nsegments must be at least 1." )
+        exit( 1 )
+
+    generate.write_mosaic( plink_file, nsamples, nsegments, out, create_pair = create_pair )
@@ -1,6 +1,6 @@
 import click
 from epigen.commands.command import CommandWithHelp
-from epigen.plink import generate
+from epigen.plink import generate, shard
 from epigen.util import probability
 
 @click.command( 'data', cls = CommandWithHelp, short_help="Generates a plink file without a phenotype with related individuals." )
@@ -9,7 +9,18 @@ from epigen.util import probability
 @click.option( '--nvariants', type=int, help='The number of variants.', default = 10000 )
 @click.option( '--nancestors', type=int, help='The number of ancestors (low number means high relatedness, high number means low relatedness, default = 1000).', default = 1000 )
 @click.option( '--nsegments', type=int, help='Average number of independently inherited segments (high number means low LD, low number means high LD).' )
+@click.option( '--grm/--no-grm', help='Write the true genetic relationship matrix given by the ancestry in GCTA binary format (.grm.bin, .grm.N.bin, .grm.id).', default = False )
+@click.option( '--kinship-threshold', type=float, help='Write all pairs of samples with at least this true kinship to a .kin0 file.', default = None )
 @click.option( '--create-pair/--no-create-pair', help='Create a .pair file in the output prefix that contains all possible pairs of variants.', default = False )
+@click.option( '--shard', type=shard.parse_shard, help='Only generate the i:th of N slices of the variants, given as i/N, the shards can be combined with epigen merge (requires --seed).', default = None )
 @click.option( '--out', help='Output plink file.', type=click.Path( writable = True ), required = True )
-def epigen(maf, nsamples, nvariants, nancestors, nsegments, create_pair, out):
-    generate.write_related( nvariants, nsamples, nancestors, nsegments, out, maf = maf, create_pair = create_pair )
+def epigen(maf, nsamples, nvariants, nancestors, nsegments, grm, kinship_threshold, create_pair, shard, out):
+    if nsegments is None or nsegments < 1:
+        print( "epigen: error: --nsegments must be given and be at least 1." )
+        exit( 1 )
+
+    if create_pair and shard:
+        print( "epigen: error: --create-pair can not be used with --shard." )
+        exit( 1 )
+
+    generate.write_related( nvariants, nsamples, nancestors, nsegments, out, maf = maf, create_pair = create_pair, grm = grm, kinship_threshold = kinship_threshold, shard = shard )
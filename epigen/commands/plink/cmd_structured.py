@@ -0,0 +1,20 @@
+import click
+from epigen.commands.command import CommandWithHelp
+from epigen.plink import generate
+from epigen.util import probability
+
+@click.command( 'structured', cls = CommandWithHelp, short_help="Generates a plink file without a phenotype with samples from several populations." )
+@click.option( '--maf', nargs=2, type=probability.probability, help='If set the ancestral MAF is generated uniformly between these two values (default uses beta distribution estimated from 1000G).', default = None )
+@click.option( '--nsamples', type=int, help='The number of samples.', default = 2000 )
+@click.option( '--nvariants', type=int, help='The number of variants.', default = 10000 )
+@click.option( '--npops', type=int, help='The number of populations.', default = 2 )
+@click.option( '--fst', type=probability.probability, help='The fixation index of each population in the Balding-Nichols model.', default = 0.01 )
+@click.option( '--admixture', type=float, help='If set, each sample is admixed with proportions from a symmetric Dirichlet with this parameter (otherwise samples are split evenly between the populations).', default = None )
+@click.option( '--create-pair/--no-create-pair', help='Create a .pair file in the output prefix that contains all possible pairs of variants.', default = False )
+@click.option( '--out', help='Output plink file (ancestry proportions are written to .cov).', type=click.Path( writable = True ), required = True )
+def epigen(maf, nsamples, nvariants, npops, fst, admixture, create_pair, out):
+    if fst <= 0.0 or fst >= 1.0:
+        print( "epigen: error: --fst must be strictly between 0 and 1." )
+        exit( 1 )
+
+    generate.write_structured( nvariants, nsamples, npops, fst, out, maf = maf, admixture = admixture, create_pair = create_pair )
@@ -0,0 +1,41 @@
+import json
+import os
+import socket
+
+##
+# Returns the default path of the socket.
+#
+def default_socket():
+    runtime_dir = os.environ.get( "XDG_RUNTIME_DIR" )
+    if runtime_dir:
+        return os.path.join( runtime_dir, "epigen.sock" )
+
+    return os.path.join( "/tmp", "epigen-{0}.sock".format( os.getuid( ) ) )
+
+##
+# Sends a command to a running server and waits for it to finish.
+#
+# @param socket_path Path to the socket of the server.
+# @param args The command line arguments.
+#
+# @return A dict with the exit status and the output of the command.
+#
+def submit(socket_path, args):
+    request = { "args" : list( args ), "cwd" : os.getcwd( ) }
+
+    connection = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        connection.connect( socket_path )
+        connection.sendall( ( json.dumps( request ) + "\n" ).encode( "utf-8" ) )
+
+        response = bytearray( )
+        while not response.endswith( b"\n" ):
+            data = connection.recv( 65536 )
+            if not data:
+                break
+
+            response.extend( data )
+    finally:
+        connection.close( )
+
+    return json.loads( response.decode( "utf-8" ) )
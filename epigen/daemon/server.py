@@ -0,0 +1,144 @@
+##
+# A local server that runs epigen commands in a pool of worker
+# processes that stay alive between jobs, so that the imports and
+# the opened plink and environment files are reused.
+#
+# Requests and responses are single lines of JSON on a Unix socket.
+# A request is { "args" : [ ... ], "cwd" : "/path" } with the same
+# arguments as the command line, and the response is
+# { "status" : exit code, "stdout" : "...", "stderr" : "..." }.
+#
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from epigen.plink import cache
+
+##
+# Commands that can not be run by the server.
+#
+EXCLUDED_COMMANDS = [ "serve", "submit" ]
+
+##
+# Prepares a worker process.
+#
+# @param cache_size The number of opened files each worker keeps.
+#
+def init_worker(cache_size):
+    cache.set_cache_size( cache_size )
+
+    # The workers are forked from the same process and
+    # would otherwise generate the same data
+    random.seed( )
+    np.random.seed( )
+
+    # Import all commands before the first job
+    from epigen.tools.run_epigen import epigen
+    for name in epigen.list_commands( None ):
+        epigen.get_command( None, name )
+
+##
+# Runs a single command in a worker.
+#
+# @param args The command line arguments.
+# @param cwd The working directory of the client.
+#
+# @return A dict with the exit status and the output.
+#
+def run_job(args, cwd):
+    from epigen.tools.run_epigen import epigen
+
+    stdout = io.StringIO( )
+    stderr = io.StringIO( )
+    status = 0
+    with contextlib.redirect_stdout( stdout ), contextlib.redirect_stderr( stderr ):
+        try:
+            os.chdir( cwd )
+            epigen.main( args = args, prog_name = "epigen" )
+        except SystemExit as e:
+            if e.code is None:
+                status = 0
+            elif isinstance( e.code, int ):
+                status = e.code
+            else:
+                print( e.code )
+                status = 1
+        except Exception:
+            traceback.print_exc( )
+            status = 1
+
+    return { "status" : status, "stdout" : stdout.getvalue( ), "stderr" : stderr.getvalue( ) }
+
+##
+# Checks that a request is valid.
+#
+# @return An error message or None.
+#
+def validate_request(request):
+    if not isinstance( request, dict ):
+        return "The request must be a JSON object."
+
+    args = request.get( "args" )
+    if not isinstance( args, list ) or not all( isinstance( a, str ) for a in args ):
+        return "The request must have a list of string 'args'."
+
+    if not isinstance( request.get( "cwd" ), str ):
+        return "The request must have a 'cwd'."
+
+    if len( args ) > 0 and args[ 0 ] in EXCLUDED_COMMANDS:
+        return "The command {0} can not be run by the server.".format( args[ 0 ] )
+
+    return None
+
+##
+# Serves epigen commands on a Unix socket until interrupted.
+#
+# @param socket_path Path to the socket.
+# @param num_workers The number of worker processes.
+# @param cache_size The number of opened files each worker keeps.
+#
+def serve(socket_path, num_workers, cache_size):
+    if os.path.exists( socket_path ):
+        os.unlink( socket_path )
+
+    executor = ProcessPoolExecutor( num_workers, initializer = init_worker, initargs = ( cache_size, ) )
+
+    async def handle(reader, writer):
+        try:
+            request = json.loads( ( await reader.readline( ) ).decode( "utf-8" ) )
+            error = validate_request( request )
+        except ValueError:
+            error = "The request is not valid JSON."
+
+        if error:
+            response = { "status" : 2, "stdout" : "", "stderr" : "epigen: error: {0}\n".format( error ) }
+        else:
+            loop = asyncio.get_running_loop( )
+            response = await loop.run_in_executor( executor, run_job, request[ "args" ], request[ "cwd" ] )
+
+        writer.write( ( json.dumps( response ) + "\n" ).encode( "utf-8" ) )
+        await writer.drain( )
+        writer.close( )
+
+    async def run_server():
+        server = await asyncio.start_unix_server( handle, path = socket_path )
+        os.chmod( socket_path, 0o600 )
+        async with server:
+            await server.serve_forever( )
+
+    try:
+        asyncio.run( run_server( ) )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown( )
+        if os.path.exists( socket_path ):
+            os.unlink( socket_path )
@@ -0,0 +1,120 @@
+##
+# Reads what is needed to append variants or pairs to an existing
+# output prefix: the samples, the index of the next variant and the
+# number of models that have been used.
+#
+import os
+import re
+
+from . import bed
+from .manifest import ManifestReader
+
+##
+# Number of bytes read at a time when searching for the last line.
+#
+TAIL_BYTES = 2**16
+
+##
+# Reads the phenotype of each sample from a .fam file.
+#
+# @param path Prefix of the plink file.
+# @param is_binary If true the phenotype must be a case (2) or a control (1).
+#
+# @return A list with the phenotype of each sample, 1 and 0 for cases and
+#         controls if is_binary.
+#
+def read_phenotype(path, is_binary):
+    phenotype = [ ]
+    with open( path + ".fam", "r" ) as fam_file:
+        for line in fam_file:
+            value = line.split( )[ 5 ]
+            if not is_binary:
+                phenotype.append( float( value ) )
+            elif value in ( "1", "2" ):
+                phenotype.append( int( value ) - 1 )
+            else:
+                raise ValueError( "{0}.fam has a sample that is neither a case nor a control.".format( path ) )
+
+    return phenotype
+
+##
+# Returns the last line of a file.
+#
+def last_line(path):
+    with open( path, "rb" ) as input_file:
+        input_file.seek( 0, os.SEEK_END )
+        end = input_file.tell( )
+        position = end
+        data = b""
+        while position > 0 and data.rstrip( b"\n" ).count( b"\n" ) == 0:
+            position = max( 0, position - TAIL_BYTES )
+            input_file.seek( position )
+            data = input_file.read( end - position )
+
+    lines = data.rstrip( b"\n" ).split( b"\n" )
+    return lines[ -1 ].decode( "utf-8" )
+
+##
+# Returns the number of lines of a file.
+#
+def count_lines(path):
+    with open( path, "rb" ) as input_file:
+        return sum( chunk.count( b"\n" ) for chunk in iter( lambda: input_file.read( TAIL_BYTES ), b"" ) )
+
+##
+# Returns the index that the next appended variant is named by, one
+# after the index of the last variant in the .bim file. Also checks
+# that the .bed file contains all variants of the .bim file.
+#
+# @param path Prefix of the plink file.
+# @param num_samples The number of samples.
+#
+# @return The index of the next variant.
+#
+def next_variant(path, num_samples):
+    num_variants = count_lines( path + ".bim" )
+    with open( path + ".bed", "rb" ) as bed_file:
+        if bytearray( bed_file.read( len( bed.BED_MAGIC ) ) ) != bed.BED_MAGIC:
+            raise ValueError( "{0}.bed is not a SNP-major .bed file.".format( path ) )
+
+    if os.path.getsize( path + ".bed" ) != len( bed.BED_MAGIC ) + num_variants * bed.bytes_per_row( num_samples ):
+        raise ValueError( "{0}.bed does not match {0}.bim and {0}.fam.".format( path ) )
+
+    if num_variants == 0:
+        raise ValueError( "{0}.bim has no variants.".format( path ) )
+
+    name = last_line( path + ".bim" ).split( )[ 1 ]
+    match = re.match( r"^rs(\d+)$", name )
+    if not match:
+        raise ValueError( "The last variant {0} of {1}.bim is not named by its index.".format( name, path ) )
+
+    return int( match.group( 1 ) ) + 1
+
+##
+# Returns the largest model index of the pairs of an output prefix,
+# from the .manifest if there is one and otherwise from the .model file.
+#
+# @param path Output prefix.
+#
+def max_model(path):
+    if os.path.exists( path + ".manifest" ):
+        models = [ int( block[ "model" ].max( ) ) for block in ManifestReader( path + ".manifest" ).blocks( ) if len( block[ "model" ] ) > 0 ]
+        return max( models + [ 0 ] )
+
+    max_index = 0
+    with open( path + ".model", "r" ) as model_file:
+        for line in model_file:
+            max_index = max( max_index, int( line.split( )[ 2 ] ) )
+
+    return max_index
+
+##
+# Checks that the files that will be appended to exist.
+#
+# @param path Output prefix.
+# @param extensions The file endings that must exist.
+#
+def check_files(path, extensions):
+    for ext in extensions:
+        if not os.path.exists( path + ext ):
+            raise ValueError( "Can not append to {0}, {1} does not exist.".format( path, path + ext ) )
@@ -0,0 +1,156 @@
+import numpy as np
+
+from epigen.plink import kernels
+
+##
+# The three magic bytes that start a SNP-major .bed file.
+#
+BED_MAGIC = bytearray( [ 0x6c, 0x1b, 0x01 ] )
+
+##
+# Maps a genotype (0, 1, 2 and 3 for missing) to its 2-bit .bed code,
+# this is the same encoding as used by plinkio.
+#
+GENOTYPE_TO_CODE = kernels.GENOTYPE_TO_CODE
+
+##
+# Maps a 2-bit .bed code back to a genotype.
+#
+CODE_TO_GENOTYPE = np.array( [ 0, 3, 1, 2 ], dtype = np.uint8 )
+
+##
+# Lookup table that maps a packed byte to its four genotypes.
+#
+BYTE_TO_GENOTYPES = CODE_TO_GENOTYPE[ ( np.arange( 256, dtype = np.uint8 )[ :, np.newaxis ] >> np.array( [ 0, 2, 4, 6 ], dtype = np.uint8 ) ) & 3 ]
+
+##
+# Returns the number of bytes used to store one variant.
+#
+# @param num_samples The number of samples.
+#
+def bytes_per_row(num_samples):
+    return ( num_samples + 3 ) // 4
+
+##
+# Packs a matrix of genotypes into .bed rows.
+#
+# @param rows A matrix of genotypes with one row per variant.
+#
+# @return A uint8 matrix with bytes_per_row( num_samples ) columns.
+#
+def pack_rows(rows):
+    rows = np.asarray( rows, dtype = np.uint8 )
+    if rows.ndim == 1:
+        rows = rows[ np.newaxis, : ]
+
+    return kernels.pack_rows( rows )
+
+##
+# Unpacks .bed rows into a matrix of genotypes.
+#
+# @param packed A uint8 matrix of packed rows.
+# @param num_samples The number of samples in each row.
+#
+# @return A uint8 matrix with one row per variant.
+#
+def unpack_rows(packed, num_samples):
+    packed = np.asarray( packed, dtype = np.uint8 )
+    if packed.ndim == 1:
+        packed = packed[ np.newaxis, : ]
+
+    return BYTE_TO_GENOTYPES[ packed ].reshape( packed.shape[ 0 ], -1 )[ :, :num_samples ]
+
+##
+# Formats a line of a .fam file in the same way as plinkio.
+#
+# @param fid Family id.
+# @param iid Individual id.
+# @param phenotype The phenotype.
+# @param is_binary If true 1 is a case and 0 a control, otherwise
+#                  the phenotype is continuous.
+#
+def format_sample(fid, iid, phenotype, is_binary):
+    if is_binary:
+        affection = { 0 : 1, 1 : 2 }.get( phenotype, 0 )
+        return "{0}\t{1}\t0\t0\t1\t{2}\n".format( fid, iid, affection )
+    else:
+        return "{0}\t{1}\t0\t0\t1\t{2:f}\n".format( fid, iid, phenotype )
+
+##
+# Formats a line of a .bim file in the same way as plinkio.
+#
+# @param name Name of the variant.
+# @param bp_position Base pair position of the variant.
+# @param chromosome The chromosome.
+#
+def format_locus(name, bp_position, chromosome = 1):
+    return "{0}\t{1}\t{2:f}\t{3}\tA\tG\n".format( chromosome, name, 0.0, bp_position )
+
+##
+# Counts the number of lines in a file.
+#
+def count_lines(path):
+    with open( path, "rb" ) as f:
+        return sum( 1 for line in f )
+
+##
+# A read-only memory mapped SNP-major .bed file.
+#
+class BedReader:
+    ##
+    # Constructor.
+    #
+    # @param path Prefix to the plink file.
+    #
+    def __init__(self, path):
+        self.path = path
+        self.num_samples = count_lines( path + ".fam" )
+        self.num_variants = count_lines( path + ".bim" )
+        self.row_size = bytes_per_row( self.num_samples )
+
+        with open( path + ".bed", "rb" ) as bed_file:
+            if bytearray( bed_file.read( 3 ) ) != BED_MAGIC:
+                raise ValueError( "{0}.bed is not a SNP-major plink file.".format( path ) )
+
+        self.packed = np.memmap( path + ".bed", dtype = np.uint8, mode = "r", offset = len( BED_MAGIC ),
+                                 shape = ( self.num_variants, self.row_size ) )
+
+    ##
+    # Returns the packed rows in the given range.
+    #
+    # @param start Index of the first variant.
+    # @param stop Index after the last variant.
+    #
+    def read_packed(self, start, stop):
+        return self.packed[ start:stop ]
+
+    ##
+    # Returns the genotypes of the variants in the given range.
+    #
+    # @param start Index of the first variant.
+    # @param stop Index after the last variant.
+    #
+    # @return A uint8 matrix with one row per variant.
+    #
+    def read_rows(self, start, stop):
+        return unpack_rows( self.packed[ start:stop ], self.num_samples )
+
+    ##
+    # Returns the genotypes of a single variant.
+    #
+    def read_row(self, i):
+        return self.read_rows( i, i + 1 )[ 0 ]
+
+    ##
+    # Closes the file.
+    #
+    def close(self):
+        self.packed = None
+
+##
+# Opens a plink file for memory mapped reading.
+#
+# @param path Prefix to the plink file.
+#
+def open_bed(path):
+    return BedReader( path )
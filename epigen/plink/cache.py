@@ -0,0 +1,97 @@
+import os
+from collections import OrderedDict
+
+from epigen.plink import envfile
+from epigen.plink import index
+from epigen.plink import multi
+
+##
+# Maximum number of opened files that are kept, 0 disables the cache
+# so that every call opens the file again.
+#
+cache_size = 0
+
+##
+# The opened files from the least to the most recently used.
+#
+opened = OrderedDict( )
+
+##
+# Sets the number of opened files that are kept.
+#
+# @param size The maximum number of files.
+#
+def set_cache_size(size):
+    global cache_size
+
+    cache_size = size
+    while len( opened ) > max( size, 0 ):
+        opened.popitem( last = False )
+
+##
+# Returns a key that changes when any of the given files changes.
+#
+def file_key(paths):
+    key = [ ]
+    for path in paths:
+        st = os.stat( path )
+        key.append( ( os.path.abspath( path ), st.st_mtime, st.st_size ) )
+
+    return tuple( key )
+
+##
+# Returns a cached value or creates it.
+#
+# @param key The key of the value.
+# @param create A function that creates the value.
+#
+def lookup(key, create):
+    if key in opened:
+        opened.move_to_end( key )
+        return opened[ key ]
+
+    value = create( )
+    opened[ key ] = value
+    if len( opened ) > cache_size:
+        opened.popitem( last = False )
+
+    return value
+
+##
+# Opens a plink file through its index, see index.py, or a list file
+# of plink prefixes as one plink file, see multi.py. When the cache is
+# enabled the opened file is also kept between commands.
+#
+# @param path Prefix to the plink file or path to a list file.
+#
+# @return An IndexedPlinkFile or a MultiPlinkFile.
+#
+def open_plink(path):
+    if multi.is_list_file( path ):
+        prefixes = multi.read_list( path )
+        paths = [ path ] + [ prefix + ext for prefix in prefixes for ext in ( ".bed", ".bim", ".fam" ) ]
+        create = lambda: multi.MultiPlinkFile( prefixes )
+    else:
+        paths = [ path + ".bed", path + ".bim", path + ".fam" ]
+        create = lambda: index.IndexedPlinkFile( path )
+
+    if cache_size <= 0:
+        return create( )
+
+    return lookup( ( "plink", ) + file_key( paths ), create )
+
+##
+# Opens an environment file, when the cache is enabled the file
+# is only parsed the first time for each sample order.
+#
+# @param path Path to the environment file.
+# @param order The iids in the order of the plink file.
+#
+# @return An EnvFile.
+#
+def open_env(path, order):
+    if cache_size <= 0:
+        return envfile.openenv( path, order )
+
+    key = ( "env", tuple( order ) ) + file_key( [ path ] )
+    return lookup( key, lambda: envfile.openenv( path, order ) )
@@ -0,0 +1,139 @@
+##
+# Checkpoints of a long running pair generation, so that it can be
+# resumed after it has been interrupted. A checkpoint contains the
+# number of pairs that have been written, the state of both random
+# number generators after the last of them, the size of each output
+# file and everything else needed to continue with identical results.
+#
+import os
+import pickle
+import random
+import time
+
+import numpy as np
+
+##
+# Version of the checkpoint format.
+#
+CHECKPOINT_VERSION = 1
+
+##
+# Default number of seconds between checkpoints.
+#
+DEFAULT_INTERVAL = 600
+
+##
+# Writes checkpoints at most once every interval seconds.
+#
+class Checkpoint:
+    ##
+    # Constructor.
+    #
+    # @param path Path to the checkpoint file.
+    # @param interval Minimum number of seconds between checkpoints.
+    # @param settings The options that must be the same when resuming.
+    # @param phenotype The phenotype of each sample.
+    # @param param_list The list of models that are generated from.
+    # @param first_pair The number of pairs in the output before the first
+    #                   generated pair.
+    #
+    def __init__(self, path, interval, settings, phenotype, param_list, first_pair = 0):
+        self.path = path
+        self.interval = interval
+        self.settings = settings
+        self.phenotype = phenotype
+        self.param_list = param_list
+        self.first_pair = first_pair
+        self.last_time = time.time( )
+
+    ##
+    # Returns true if it is time for a new checkpoint.
+    #
+    def is_due(self):
+        return time.time( ) - self.last_time >= self.interval
+
+    ##
+    # Returns the current state of the random number generators,
+    # and restarts the interval.
+    #
+    def capture_random(self):
+        self.last_time = time.time( )
+        return random.getstate( ), np.random.get_state( )
+
+    ##
+    # Atomically replaces the checkpoint. The output files must have
+    # been written to disk before.
+    #
+    # @param num_pairs The number of pairs that have been written.
+    # @param random_state The random number generator states after the last pair.
+    # @param offsets A dict from path to the size of each output file.
+    # @param genotype_stats The state of the genotype statistics.
+    #
+    def save(self, num_pairs, random_state, offsets, genotype_stats):
+        state = { "version" : CHECKPOINT_VERSION,
+                  "settings" : self.settings,
+                  "phenotype" : self.phenotype,
+                  "param_list" : self.param_list,
+                  "first-pair" : self.first_pair,
+                  "pairs" : num_pairs,
+                  "random" : random_state,
+                  "offsets" : offsets,
+                  "genotype-stats" : genotype_stats }
+
+        tmp_path = self.path + ".tmp"
+        with open( tmp_path, "wb" ) as checkpoint_file:
+            pickle.dump( state, checkpoint_file, pickle.HIGHEST_PROTOCOL )
+            checkpoint_file.flush( )
+            os.fsync( checkpoint_file.fileno( ) )
+
+        os.rename( tmp_path, self.path )
+
+    ##
+    # Removes the checkpoint after the output is complete.
+    #
+    def remove(self):
+        if os.path.exists( self.path ):
+            os.unlink( self.path )
+
+##
+# Loads a checkpoint and checks that it can be resumed.
+#
+# @param path Path to the checkpoint file.
+# @param settings The options of the resumed run.
+#
+# @return The checkpoint state, or None if there is no checkpoint.
+#
+def load_checkpoint(path, settings):
+    if not os.path.exists( path ):
+        return None
+
+    with open( path, "rb" ) as checkpoint_file:
+        state = pickle.load( checkpoint_file )
+
+    if state.get( "version" ) != CHECKPOINT_VERSION:
+        raise ValueError( "The checkpoint {0} was written by a different version.".format( path ) )
+
+    for key, value in settings.items( ):
+        if state[ "settings" ].get( key ) != value:
+            raise ValueError( "The checkpoint {0} was written with a different {1}.".format( path, key ) )
+
+    return state
+
+##
+# Truncates the output files to their size at the checkpoint and
+# restores the random number generators.
+#
+# @param state A checkpoint state from load_checkpoint.
+#
+def restore(state):
+    for path, size in state[ "offsets" ].items( ):
+        if not os.path.exists( path ) or os.path.getsize( path ) < size:
+            raise ValueError( "The output file {0} is shorter than at the checkpoint.".format( path ) )
+
+    for path, size in state[ "offsets" ].items( ):
+        with open( path, "r+b" ) as output_file:
+            output_file.truncate( size )
+
+    random_state, numpy_state = state[ "random" ]
+    random.setstate( random_state )
+    np.random.set_state( numpy_state )
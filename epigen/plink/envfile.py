@@ -20,12 +20,15 @@ class EnvFile:
         header = next( self.env_file ).strip( ).split( )
         self.header = header[ 2: ]
         for i in range( len( self.header ) ):
-            self.data.append( [ "NA" ] * len( order ) )
+            self.data.append( [ float( "nan" ) ] * len( order ) )
 
         for line in self.env_file:
             column = line.strip( ).split( )
-            row = list( map( float, column[ 2: ] ) )
+            row = [ float( "nan" ) if value == "NA" else float( value ) for value in column[ 2: ] ]
             iid = column[ 1 ]
+            if iid not in position:
+                continue
+
             cur_pos = position[ iid ]
 
             for i, value in enumerate( row ):
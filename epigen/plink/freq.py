@@ -0,0 +1,349 @@
+##
+# Per-variant genotype counts computed directly from the packed bytes
+# of a .bed file. Every byte holds four genotypes, so the number of
+# second alleles, heterozygotes and missing genotypes of a row is the
+# sum of a lookup table over its bytes, taken two bytes at a time. The
+# rows are scanned in blocks by a pool of threads, numpy releases the
+# GIL while it gathers and sums.
+#
+# The counts are stored beside the plink file as <prefix>.epgfrq and
+# memory mapped by later runs as long as the size and modification
+# time of the .bed, .bim and .fam files match. The cache also holds
+# the variants sorted by chromosome and minor allele frequency, so
+# that the variants in a frequency range can be found by a binary
+# search, see select.py. The sections of the file are:
+#
+#   counts           The counts of genotype 0, 1, 2 and missing.
+#   selection-keys   The chromosome code plus the minor allele
+#                    frequency of each variant, sorted.
+#   selection-order  The index of the variant of each key.
+#
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from epigen.plink import bed
+from epigen.plink import index
+from epigen.plink import memory
+from epigen.plink.qc import hwe_pvalue, format_frq, FRQ_HEADER
+
+##
+# The first bytes of a frequency cache.
+#
+FREQ_MAGIC = b"EPGFRQ03"
+
+##
+# The size and modification time of the .bed, .bim and .fam files, and
+# the number of variants and samples.
+#
+FREQ_HEADER = struct.Struct( "<QdQdQdQQ" )
+
+##
+# The sections of the cache and their types.
+#
+FREQ_SECTIONS = [ ( "counts", np.dtype( "<u4" ) ),
+                  ( "selection-keys", np.dtype( "<f8" ) ),
+                  ( "selection-order", np.dtype( "<u8" ) ) ]
+
+##
+# Number of variants written to a .frq file at a time.
+#
+FRQ_BLOCK = 2**16
+
+##
+# Default number of packed bytes scanned by each task.
+#
+BLOCK_BYTES = 2**24
+
+##
+# Number of second alleles, heterozygotes and missing genotypes
+# among the four genotypes of each byte.
+#
+BYTE_ALLELES = np.where( bed.BYTE_TO_GENOTYPES == 3, 0, bed.BYTE_TO_GENOTYPES ).sum( axis = 1 ).astype( np.uint8 )
+BYTE_HETEROZYGOTES = ( bed.BYTE_TO_GENOTYPES == 1 ).sum( axis = 1 ).astype( np.uint8 )
+BYTE_MISSING = ( bed.BYTE_TO_GENOTYPES == 3 ).sum( axis = 1 ).astype( np.uint8 )
+
+##
+# The three counts are packed into one 64-bit integer with this many
+# bits each, so that a row is summed in a single pass.
+#
+FIELD_BITS = 21
+
+##
+# The packed counts of each byte.
+#
+BYTE_FIELDS = ( BYTE_ALLELES.astype( np.uint64 ) |
+                ( BYTE_HETEROZYGOTES.astype( np.uint64 ) << np.uint64( FIELD_BITS ) ) |
+                ( BYTE_MISSING.astype( np.uint64 ) << np.uint64( 2 * FIELD_BITS ) ) )
+
+##
+# The packed counts of each pair of bytes, which halves the number of
+# lookups.
+#
+WORD_FIELDS = BYTE_FIELDS[ np.arange( 2**16 ) & 0xff ] + BYTE_FIELDS[ np.arange( 2**16 ) >> 8 ]
+
+##
+# Maximum number of bytes of a row that are summed at once, the sum of
+# the second alleles (at most 8 per byte) must fit in FIELD_BITS.
+#
+COLUMN_BYTES = 2**( FIELD_BITS - 4 )
+
+##
+# Splits packed counts into the number of second alleles,
+# heterozygotes and missing genotypes.
+#
+def unpack_fields(fields):
+    mask = np.uint64( 2**FIELD_BITS - 1 )
+    return [ ( ( fields >> np.uint64( k * FIELD_BITS ) ) & mask ).astype( np.int64 ) for k in range( 3 ) ]
+
+##
+# Sums the packed counts of each row of a block of bytes.
+#
+def sum_fields(packed):
+    fields = np.zeros( packed.shape[ 0 ], dtype = np.uint64 )
+    if packed.shape[ 1 ] % 2 == 1:
+        fields += BYTE_FIELDS[ packed[ :, -1 ] ]
+        packed = packed[ :, :-1 ]
+
+    try:
+        words = packed.view( np.uint16 )
+    except ValueError:
+        words = np.ascontiguousarray( packed ).view( np.uint16 )
+
+    return fields + WORD_FIELDS[ words ].sum( axis = 1, dtype = np.uint64 )
+
+##
+# Counts the genotypes of packed .bed rows.
+#
+# @param packed A uint8 matrix of packed rows.
+# @param num_samples The number of samples in each row.
+# @param padded If true the last byte may have unused genotypes,
+#               which is not the case for masked rows.
+#
+# @return An int64 matrix with the counts of genotype 0, 1, 2 and
+#         missing for each row.
+#
+def count_packed(packed, num_samples, padded = True):
+    packed = np.asarray( packed, dtype = np.uint8 )
+    if packed.ndim == 1:
+        packed = packed[ np.newaxis, : ]
+
+    alleles = np.zeros( packed.shape[ 0 ], dtype = np.int64 )
+    heterozygotes = np.zeros( packed.shape[ 0 ], dtype = np.int64 )
+    missing = np.zeros( packed.shape[ 0 ], dtype = np.int64 )
+    for start in range( 0, packed.shape[ 1 ], COLUMN_BYTES ):
+        a, h, m = unpack_fields( sum_fields( packed[ :, start:start + COLUMN_BYTES ] ) )
+        alleles += a
+        heterozygotes += h
+        missing += m
+
+    # The unused genotypes of the last byte should be zero, but
+    # are removed in case they are not
+    padding = ( 4 - num_samples % 4 ) % 4
+    if padded and padding > 0 and packed.shape[ 1 ] > 0:
+        a, h, m = unpack_fields( BYTE_FIELDS[ packed[ :, -1 ] & np.uint8( ( 0xff << ( 2 * ( 4 - padding ) ) ) & 0xff ) ] )
+        alleles -= a
+        heterozygotes -= h
+        missing -= m
+
+    homozygotes = ( alleles - heterozygotes ) // 2
+    counts = np.empty( ( packed.shape[ 0 ], 4 ), dtype = np.int64 )
+    counts[ :, 0 ] = num_samples - heterozygotes - homozygotes - missing
+    counts[ :, 1 ] = heterozygotes
+    counts[ :, 2 ] = homozygotes
+    counts[ :, 3 ] = missing
+
+    return counts
+
+##
+# Counts the genotypes of the variants in a .bed file.
+#
+# @param reader A BedReader.
+# @param threads The number of threads, by default one per cpu.
+# @param mask If set a subset.SampleMask, only the genotypes of its
+#             samples are counted.
+# @param variants If set the indices of the variants that are counted,
+#                 otherwise all variants.
+#
+# @return An int64 matrix with the counts of genotype 0, 1, 2 and
+#         missing for each variant.
+#
+def scan_bed(reader, threads = None, mask = None, variants = None):
+    if threads is None:
+        threads = os.cpu_count( ) or 1
+
+    num_variants = reader.num_variants if variants is None else len( variants )
+    block_size = memory.block_size( 4 * reader.row_size, BLOCK_BYTES // max( reader.row_size, 1 ) )
+    starts = range( 0, num_variants, block_size )
+    counts = np.zeros( ( num_variants, 4 ), dtype = np.int64 )
+
+    def scan_block(start):
+        stop = min( start + block_size, num_variants )
+        if variants is None:
+            packed = reader.read_packed( start, stop )
+        else:
+            packed = reader.packed[ variants[ start:stop ] ]
+
+        if mask is None:
+            counts[ start:stop ] = count_packed( packed, reader.num_samples )
+        else:
+            counts[ start:stop ] = count_packed( mask.apply( packed ), mask.num_samples, padded = False )
+
+    if threads <= 1 or len( starts ) <= 1:
+        for start in starts:
+            scan_block( start )
+    else:
+        with ThreadPoolExecutor( max_workers = threads ) as executor:
+            list( executor.map( scan_block, starts ) )
+
+    return counts
+
+##
+# Genotype counts and the statistics derived from them for every
+# variant of a plink file.
+#
+class VariantStats:
+    ##
+    # Constructor.
+    #
+    # @param counts A matrix with the counts of genotype 0, 1, 2 and
+    #               missing for each variant.
+    # @param keys The sorted chromosome code plus minor allele frequency
+    #             of the variants.
+    # @param order The index of the variant of each key.
+    #
+    def __init__(self, counts, keys, order):
+        self.counts = counts
+        self.keys = keys
+        self.order = order
+        self.hwe = None
+    def __len__(self):
+        return len( self.counts )
+
+    ##
+    # Returns the number of non-missing genotypes of each variant.
+    #
+    def observed(self):
+        return self.counts[ :, :3 ].sum( axis = 1, dtype = np.int64 )
+
+    ##
+    # Returns the frequency of the second allele of each variant,
+    # which is 0 for variants without any observed genotypes.
+    #
+    def allele_freq(self):
+        observed = self.observed( )
+        alleles = self.counts[ :, 1 ].astype( np.float64 ) + 2.0 * self.counts[ :, 2 ]
+        with np.errstate( divide = "ignore", invalid = "ignore" ):
+            return np.where( observed > 0, alleles / ( 2 * observed ), 0.0 )
+
+    ##
+    # Returns the minor allele frequency of each variant.
+    #
+    def maf(self):
+        return counts_maf( self.counts )
+
+    ##
+    # Returns the fraction of missing genotypes of each variant.
+    #
+    def missing_rate(self):
+        total = self.counts.sum( axis = 1, dtype = np.int64 )
+        with np.errstate( divide = "ignore", invalid = "ignore" ):
+            return np.where( total > 0, self.counts[ :, 3 ] / total.astype( np.float64 ), 0.0 )
+
+    ##
+    # Returns the Hardy-Weinberg p-value of each variant, the p-values
+    # are only computed the first time.
+    #
+    def hwe_pvalue(self):
+        if self.hwe is None:
+            self.hwe = hwe_pvalue( self.counts[ :, :3 ] )
+
+        return self.hwe
+
+##
+# Computes the minor allele frequency of each variant from its counts.
+#
+def counts_maf(counts):
+    observed = counts[ :, :3 ].sum( axis = 1, dtype = np.int64 )
+    alleles = counts[ :, 1 ].astype( np.float64 ) + 2.0 * counts[ :, 2 ]
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        freq = np.where( observed > 0, alleles / ( 2 * observed ), 0.0 )
+
+    return np.minimum( freq, 1.0 - freq )
+
+##
+# Sorts the variants by chromosome and minor allele frequency.
+#
+# @param counts The genotype counts of each variant.
+# @param chromosomes The chromosome code of each variant.
+#
+# @return A tuple ( sorted keys, index of the variant of each key ).
+#
+def make_selection(counts, chromosomes):
+    keys = np.asarray( chromosomes, dtype = np.float64 ) + counts_maf( counts )
+    order = np.argsort( keys, kind = "mergesort" )
+
+    return keys[ order ], order.astype( np.uint64 )
+
+##
+# Returns the genotype counts of a plink file, from the frequency
+# cache if it is up to date and otherwise by scanning the .bed file.
+# A new cache is written if possible, otherwise the counts are only
+# kept in memory.
+#
+# @param path Prefix of the plink file.
+# @param threads The number of threads used to scan the .bed file.
+#
+# @return A VariantStats.
+#
+def open_frequencies(path, threads = None):
+    freq_path = path + ".epgfrq"
+    stamps = index.file_stamp( path + ".bed" ) + index.file_stamp( path + ".bim" ) + index.file_stamp( path + ".fam" )
+    result = index.read_sections( freq_path, FREQ_MAGIC, FREQ_HEADER, FREQ_SECTIONS )
+    if result is not None and result[ 0 ][ :6 ] == stamps:
+        num_variants = result[ 0 ][ 6 ]
+        sections = result[ 1 ]
+        return VariantStats( sections[ "counts" ].reshape( num_variants, 4 ), sections[ "selection-keys" ], sections[ "selection-order" ] )
+
+    reader = bed.open_bed( path )
+    counts = scan_bed( reader, threads )
+    reader.close( )
+
+    keys, order = make_selection( counts, index.open_index( path ).chromosomes )
+    try:
+        sections = { "counts" : counts, "selection-keys" : keys, "selection-order" : order }
+        index.write_sections( freq_path, FREQ_MAGIC, FREQ_HEADER, stamps + ( reader.num_variants, reader.num_samples ), FREQ_SECTIONS, sections )
+    except ( IOError, OSError ):
+        pass
+
+    return VariantStats( counts, keys, order )
+
+##
+# Writes the frequencies of a plink file to a plink style .frq file.
+#
+# @param path Prefix of the plink file.
+# @param stats The VariantStats of the plink file.
+# @param frq_path Path to the .frq file.
+#
+def write_frq(path, stats, frq_path):
+    freq = stats.allele_freq( )
+    maf = np.minimum( freq, 1.0 - freq )
+    observed = stats.observed( )
+    hwe = stats.hwe_pvalue( )
+
+    with open( path + ".bim", "r" ) as bim_file, open( frq_path, "w" ) as frq_file:
+        frq_file.write( FRQ_HEADER )
+        start = 0
+        loci = [ ]
+        for line in bim_file:
+            fields = line.split( )
+            loci.append( ( fields[ 0 ], fields[ 1 ], fields[ 4 ], fields[ 5 ] ) )
+            if len( loci ) == FRQ_BLOCK:
+                stop = start + len( loci )
+                frq_file.writelines( format_frq( loci, freq[ start:stop ] <= 0.5, maf[ start:stop ], observed[ start:stop ], hwe[ start:stop ] ) )
+                start, loci = stop, [ ]
+
+        stop = start + len( loci )
+        frq_file.writelines( format_frq( loci, freq[ start:stop ] <= 0.5, maf[ start:stop ], observed[ start:stop ], hwe[ start:stop ] ) )
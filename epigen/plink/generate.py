@@ -1,3 +1,4 @@
+import bisect
 import random
 import os
 import sys
@@ -5,11 +6,53 @@ from math import exp, ceil
 
 from epigen.plink.output import OutputFiles
 from epigen.plink.plink_file import PlinkFile
+from epigen.plink.cov import CovFile
+from epigen.plink.pair import PairFile
+from epigen.plink.case import CaseFile
+from epigen.plink.model import ModelFile
+from epigen.plink.table import TableFile
+from epigen.plink.manifest import ManifestFile
 from epigen.plink.genmodels import joint_maf
 from epigen.plink import util
 from epigen.plink import variant
+from epigen.plink import ld
+
+from epigen.plink import bed
+from epigen.plink import kinship
+from epigen.plink import kernels
+from epigen.plink import qc
+from epigen.plink import genmodels
+from epigen.plink import memory
+from epigen.plink import stream as plink_stream
+from epigen.plink import checkpoint
+from epigen.plink import shard as plink_shard
+from epigen.plink import append as plink_append
 
 from plinkio import plinkfile
+from itertools import islice
+import numpy as np
+
+##
+# Number of genotypes that are generated in memory at once
+# by the block-wise generators.
+#
+BLOCK_GENOTYPES = 2**24
+
+##
+# Number of pairs whose contingency tables are generated at once.
+#
+BLOCK_PAIRS = 2**16
+
+##
+# Estimated peak number of bytes per genotype while a block is sampled,
+# packed and written by each of the block-wise generators.
+#
+GENOTYPE_BYTES = { "single" : 10, "ld" : 9, "related" : 3, "mosaic" : 4, "structured" : 18, "casecontrol" : 10 }
+
+##
+# Estimated number of bytes per pair in write_general_tables.
+#
+PAIR_BYTES = 1024
 
 ##
 # Writes the plink data in the location specified by the
@@ -20,25 +63,188 @@ from plinkio import plinkfile
 # @param param_list The list of parameters to generate from.
 # @param output_prefix The output prefix, different file endings will be generated.
 # @param iid_prefix Prefix for 'iid'.
+# @param frq If true the realised allele frequencies are written to .frq.
+# @param queue_depth Number of genotype blocks that can wait to be written
+#                    by the background writer, 0 disables it.
+# @param manifest If true the pairs are written to a binary .manifest
+#                 instead of the .pair, .case and .model files.
+# @param stream If set the plink file and the pairs are written as a
+#               stream to this path or - for stdout.
+# @param checkpoint_interval If set a .checkpoint is written beside the output
+#                            at most once every this many seconds.
+# @param resume If true and there is a .checkpoint, the output files are
+#               truncated to it and the generation continues from it.
+# @param shard If set a tuple ( i, N ), only the i:th of N slices of the
+#              pairs is generated.
+# @param append If true the pairs are appended to the existing output,
+#               conditioned on the phenotype in its .fam file.
+#
+# @return A dict with the realised phenotype and genotype statistics.
 #
-def write_general_data(model, fixed_params, param_list, output_prefix, iid_prefix = "iid"):
+def write_general_data(model, fixed_params, param_list, output_prefix, iid_prefix = "iid", frq = False, queue_depth = 2, manifest = False, stream = None,
+                       checkpoint_interval = None, resume = False, shard = None, append = False):
     path, ext = os.path.splitext( output_prefix )
+    if stream and resume:
+        raise ValueError( "A stream can not be resumed." )
+
+    if append and ( stream or shard ):
+        raise ValueError( "Pairs can not be appended to a stream or a shard." )
+
+    settings = { "model" : type( model ).__name__,
+                 "maf" : list( fixed_params.maf ),
+                 "ld" : fixed_params.ld,
+                 "sample-size" : list( fixed_params.sample_size ),
+                 "sample-maf" : fixed_params.sample_maf,
+                 "iid-prefix" : iid_prefix,
+                 "frq" : frq,
+                 "manifest" : manifest,
+                 "shard" : shard,
+                 "append" : append }
+
+    state = None
+    if resume:
+        state = checkpoint.load_checkpoint( path + ".checkpoint", settings )
+
+    first_pair = 0
+    if state:
+        # The models may have been sampled, so they are taken from the checkpoint
+        phenotype = state[ "phenotype" ]
+        param_list = state[ "param_list" ]
+        first_pair = state[ "first-pair" ]
+        checkpoint.restore( state )
+    elif append:
+        extensions = [ ".fam", ".bim", ".bed" ] + ( [ ".manifest" ] if manifest else [ ".pair", ".case", ".model" ] ) + ( [ ".frq" ] if frq else [ ] )
+        plink_append.check_files( path, extensions )
+
+        phenotype = plink_append.read_phenotype( path, model.is_binary( ) )
+        next_variant = plink_append.next_variant( path, len( phenotype ) )
+        if next_variant % 2 != 1:
+            raise ValueError( "{0}.bim does not contain pairs of variants.".format( path ) )
+
+        # The new models are numbered after the existing ones
+        first_pair = ( next_variant - 1 ) // 2
+        param_list = [ ( 0, False, None ) ] * plink_append.max_model( path ) + list( param_list )
+    else:
+        param_list = list( param_list )
+
+        # Number of samples must be known beforehand
+        phenotype = model.generate_phenotype( fixed_params )
+        plink_shard.seed_shard( shard )
+
+    run_checkpoint = None
+    if checkpoint_interval and not stream:
+        run_checkpoint = checkpoint.Checkpoint( path + ".checkpoint", checkpoint_interval, settings, phenotype, param_list, first_pair )
+
+    start, end = plink_shard.shard_range( sum( num_pairs for num_pairs, is_case, params in param_list ), shard )
+    if state:
+        start = state[ "pairs" ] - first_pair
 
-    # Number of samples must be known beforehand
-    phenotype = model.generate_phenotype( fixed_params )
-    output_files = OutputFiles( path, phenotype, model.is_binary( ), iid_prefix )
+    output_files = OutputFiles( path, phenotype, model.is_binary( ), iid_prefix, frq, queue_depth, manifest, stream, run_checkpoint, state, first_pair + start, append )
   
+    for snp1, snp2, is_case, model_index in generate_general_data( model, fixed_params, param_list, phenotype, start, end ):
+        output_files.write( snp1, snp2, is_case, model_index )
+  
+    output_files.close( )
+    if run_checkpoint:
+        run_checkpoint.remove( )
+
+    return output_files.summary( )
+
+##
+# Generates the genotypes of each pair given the phenotype.
+#
+# @param model The type of GLM model used to generate data.
+# @param fixed_params The simulation parameters.
+# @param param_list The list of parameters to generate from.
+# @param phenotype The phenotype of each sample.
+# @param start Index of the first pair to generate, the pairs before are skipped.
+# @param end Index after the last pair to generate (default all pairs).
+#
+# @return An iterator over tuples ( snp1, snp2, is_case, model_index ).
+#
+def generate_general_data(model, fixed_params, param_list, phenotype, start = 0, end = None):
     model_index = 1
+    first = 0
     for num_pairs, is_case, params in param_list:
-        model.init_cache( fixed_params, params, phenotype )
-        for i in range( num_pairs ):
-            snp1, snp2 = model.generate_genotype( fixed_params, params, phenotype )
-            output_files.write( snp1, snp2, is_case, model_index )
-        
+        last = num_pairs if end is None else min( num_pairs, end - first )
+        if start - first < last:
+            model.init_cache( fixed_params, params, phenotype )
+            for i in range( max( start - first, 0 ), last ):
+                snp1, snp2 = model.generate_genotype( fixed_params, params, phenotype )
+                yield snp1, snp2, is_case, model_index
+
+        first += num_pairs
         model_index += 1
-  
-    output_files.close( )
     
+##
+# Writes only the case and control contingency tables of each pair,
+# without generating any individual genotypes. The counts of a pair
+# are multinomial with the genotype distributions of the cases and
+# controls, so they are drawn directly for a whole block of pairs.
+#
+# @param model The binary model used to generate data.
+# @param fixed_params The simulation parameters.
+# @param param_list The list of parameters to generate from.
+# @param output_prefix The output prefix, different file endings will be generated.
+# @param manifest If true the pairs are written to a binary .manifest
+#                 instead of the .pair, .case and .model files.
+#
+def write_general_tables(model, fixed_params, param_list, output_prefix, manifest = False):
+    path, ext = os.path.splitext( output_prefix )
+
+    if manifest:
+        manifest_file = ManifestFile( path + ".manifest" )
+        text_files = [ ]
+    else:
+        pair_file = PairFile( path + ".pair" )
+        case_file = CaseFile( path + ".case" )
+        model_file = ModelFile( path + ".model" )
+        text_files = [ pair_file, case_file, model_file ]
+    table_file = TableFile( path + ".tables" )
+
+    index = 1
+    model_index = 1
+    block_size = memory.block_size( PAIR_BYTES, BLOCK_PAIRS )
+    for num_pairs, is_case, params in param_list:
+        for start in range( 0, num_pairs, block_size ):
+            n = min( block_size, num_pairs - start )
+            if fixed_params.maf_is_fixed( ):
+                mafs = [ fixed_params.get_maf( ) ]
+            else:
+                mafs = [ fixed_params.get_maf( ) for i in range( n ) ]
+
+            case_probs = np.array( [ model.joint_prob( m, params.penetrance, 1 ) for m in mafs ] )
+            control_probs = np.array( [ model.joint_prob( m, params.penetrance, 0 ) for m in mafs ] )
+            case_counts = util.multinomial_rows( fixed_params.num_cases( ), np.broadcast_to( case_probs, ( n, 9 ) ) )
+            control_counts = util.multinomial_rows( fixed_params.num_controls( ), np.broadcast_to( control_probs, ( n, 9 ) ) )
+
+            pairs = [ "rs{0} rs{1}".format( index + 2 * k, index + 2 * k + 1 ) for k in range( n ) ]
+            if manifest:
+                # Realised frequencies from the margins of the 3x3 tables
+                counts = ( case_counts + control_counts ).reshape( n, 3, 3 )
+                num_alleles = 2.0 * counts.sum( axis = ( 1, 2 ) )
+                maf1 = np.dot( counts.sum( axis = 2 ), [ 0, 1, 2 ] ) / num_alleles
+                maf2 = np.dot( counts.sum( axis = 1 ), [ 0, 1, 2 ] ) / num_alleles
+                snps = index + 2 * np.arange( n )
+                manifest_file.write( snps, snps + 1, is_case, model_index, maf1, maf2 )
+            else:
+                for pair in pairs:
+                    pair_file.write( pair )
+                    case_file.write( pair, is_case )
+                    model_file.write( pair, model_index )
+
+            table_file.write( pairs, case_counts, control_counts )
+            index += 2 * n
+
+        model_index += 1
+
+    if manifest:
+        manifest_file.close( )
+
+    for text_file in text_files:
+        text_file.close( )
+    table_file.close( )
+
 ##
 # Generates a phenotype for the given snp pair and penetrance
 # matrix. 
@@ -79,27 +285,52 @@ def generate_environment(env):
 #
 # @param sample_list List of plinkio.plinkfile.Sample.
 # @param rows List of genotypes for all variants.
-# @param beta List of beta coefficients for each variant.
-# @param dispersion Dispersion parameter.
-# @param link The link function.
+# @param pheno_generator A PhenoGenerator object.
 # @param output_file The phenotypes will be written to this file.
+# @param plink_format Should the phenotype be in plink format?
+#
+# @return A dict with the realised phenotype statistics.
 #
 def write_general_phenotype(sample_list, rows, pheno_generator, output_file, plink_format):
+    rows = np.array( rows, dtype = np.float64 ).reshape( len( rows ), len( sample_list ) )
+    phenotype = pheno_generator.generate_phenos( rows )
+
+    return write_phenotype( sample_list, phenotype, pheno_generator, output_file, plink_format )
+
+##
+# Writes generated phenotypes.
+#
+# @param sample_list List of samples.
+# @param phenotype The phenotype of each sample, missing is nan.
+# @param pheno_generator The phenotype generator.
+# @param output_file The phenotype file.
+# @param plink_format If true missing is -9 instead of NA.
+#
+# @return A dict with the realised phenotype statistics.
+#
+def write_phenotype(sample_list, phenotype, pheno_generator, output_file, plink_format):
     na_string = "NA"
     if plink_format:
         na_string = "-9"
 
+    is_binary = isinstance( pheno_generator, genmodels.BinomialPhenoGenerator )
+    stats = qc.PhenotypeStats( is_binary )
     output_file.write( "FID\tIID\tPheno\n" )
-    for i, sample in enumerate( sample_list ):
-        variants = [ rows[ j ][ i ] for j in range( len( rows ) ) ]
-
-        pheno = pheno_generator.generate_pheno( variants )
-        pheno_str = str( pheno )
-        if pheno == None:
+    for sample, pheno in zip( sample_list, phenotype.tolist( ) ):
+        if pheno != pheno:
+            stats.add( None )
             pheno_str = na_string
+        else:
+            if is_binary:
+                pheno = int( pheno )
+
+            stats.add( pheno )
+            pheno_str = str( pheno )
  
         output_file.write( "{0}\t{1}\t{2}\n".format( sample.fid, sample.iid, pheno_str ) )
 
+    return stats.summary( )
+
 ##
 # Generate case/control data that contains both variants that are associated with
 # phenotype (true) and variants that are not (false).
@@ -114,8 +345,11 @@ def write_general_phenotype(sample_list, rows, pheno_generator, output_file, pli
 # @param pheno_file The phenotype file.
 # @param plink_format Should the phenotype be in plink format?
 # @param create_pair Should a .pair file be created?
+# @param frq If true the realised allele frequencies are written to .frq.
 #
-def write_casecontrol_data(pheno_generator, sample_size, mafs, num_true, num_false, output_prefix, pheno_file, plink_format = False, create_pair = True):
+# @return A dict with the realised phenotype and genotype statistics.
+#
+def write_casecontrol_data(pheno_generator, sample_size, mafs, num_true, num_false, output_prefix, pheno_file, plink_format = False, create_pair = True, frq = False):
     na_string = "NA"
     if plink_format:
         na_string = "-9"
@@ -127,7 +361,11 @@ def write_casecontrol_data(pheno_generator, sample_size, mafs, num_true, num_fal
     true_mafs = mafs[ :num_true ]
     false_mafs = mafs[ num_true: ]
 
-    true_variants_matrix = list( )
+    # The true variants of the accepted samples are kept until
+    # all samples have been generated
+    total_samples = sample_size[ 0 ] + sample_size[ 1 ]
+    true_variants_matrix = np.empty( ( num_true, total_samples ), dtype = np.uint8 )
+    pheno_stats = qc.PhenotypeStats( True )
 
     pheno_file.write( "FID\tIID\tPheno\n" )
     while num_samples < sample_size[ 0 ] + sample_size[ 1 ]:
@@ -148,23 +386,29 @@ def write_casecontrol_data(pheno_generator, sample_size, mafs, num_true, num_fal
             continue
 
         pheno_file.write( "fid{0}\tiid{0}\t{1}\n".format( num_samples - 1, pheno_str ) )
-        true_variants_matrix.append( true_variants )
+        pheno_stats.add( pheno )
+        true_variants_matrix[ :, num_samples - 1 ] = true_variants
 
     # Write the genotype data consisting of both true and false variants
-    pf = PlinkFile( output_prefix, [ -9 ] * num_samples, True )
-    for i in range( num_true ):
-        true_row = [ true_variants_matrix[ j ][ i ] for j in range( num_samples ) ]
-        pf.write( i, true_row )
+    pf = PlinkFile( output_prefix, [ -9 ] * num_samples, True, frq = frq )
+    block_size = memory.block_size( num_samples * GENOTYPE_BYTES[ "casecontrol" ], BLOCK_GENOTYPES // num_samples, true_variants_matrix.nbytes )
+    for start in range( 0, num_true, block_size ):
+        pf.write_block( start, true_variants_matrix[ start:start + block_size ] )
 
-    for i in range( num_false ):
-        false_row = variant.generate_variant_row( false_mafs[ i ], num_samples )
-        pf.write( num_true + i, false_row )
+    for start in range( 0, num_false, block_size ):
+        false_rows = variant.generate_variant_block( false_mafs[ start:start + block_size ], num_samples )
+        pf.write_block( num_true + start, false_rows )
 
     pf.close( )
     
     if create_pair:
         generate_pairs( output_prefix )
 
+    summary = pheno_stats.summary( )
+    summary.update( pf.stats.summary( ) )
+
+    return summary
+
 ##
 # Writes the .pair file for a given plink file. This
 # can be very time consuming for a large number of variants.
@@ -197,95 +441,366 @@ def write_environment(samples, nvariables, output_file):
 ##
 # Generate a set of single variants.
 #
-def write_single(nvariants, nsamples, output_prefix, maf = None, create_pair = False):
+# @param stream If set the plink file is written as a stream to this
+#               path or - for stdout.
+# @param shard If set a tuple ( i, N ), only the i:th of N slices of the
+#              variants is generated.
+# @param append If true the variants are appended to an existing plink
+#               file, nsamples is then taken from its .fam file.
+#
+def write_single(nvariants, nsamples, output_prefix, maf = None, create_pair = False, rare_maf = 0.01, frq = False, stream = None, shard = None, append = False):
     if create_pair and nvariants > 10000:
         raise ValueError( "Creating pairs for more than 10000 variants is too time consuming." )
     
-    pf = PlinkFile( output_prefix, [ -9 ] * nsamples, 0 )
+    pf, first_variant = open_variant_file( output_prefix, nsamples, frq, stream, append )
+    first, last = plink_shard.shard_range( nvariants, shard )
+    plink_shard.seed_shard( shard )
+    for start, genotypes in generate_single( last - first, pf.num_samples, maf, rare_maf ):
+        pf.write_block( first_variant + first + start, genotypes )
 
+    pf.close( )
+
+    if create_pair:
+        generate_pairs( output_prefix )
+
+##
+# Opens the plink file of write_single and write_ld.
+#
+# @param output_prefix The output plink prefix.
+# @param nsamples The number of samples of a new plink file.
+# @param frq If true the realised allele frequencies are written to .frq.
+# @param stream If set the plink file is written as a stream to this path.
+# @param append If true the variants are appended to an existing plink file.
+#
+# @return A tuple ( plink file, index of the first variant ).
+#
+def open_variant_file(output_prefix, nsamples, frq, stream, append):
+    if not append:
+        return plink_stream.open_plink_file( output_prefix, [ -9 ] * nsamples, 0, frq = frq, stream = stream ), 0
+
+    if stream:
+        raise ValueError( "Variants can not be appended to a stream." )
+
+    plink_append.check_files( output_prefix, [ ".fam", ".bim", ".bed" ] + ( [ ".frq" ] if frq else [ ] ) )
+    nsamples = plink_append.count_lines( output_prefix + ".fam" )
+    first_variant = plink_append.next_variant( output_prefix, nsamples )
+
+    return PlinkFile( output_prefix, [ -9 ] * nsamples, 0, frq = frq, append = True ), first_variant
+
+##
+# Generates blocks of single variants.
+#
+# @param nvariants The number of variants.
+# @param nsamples The number of samples.
+# @param maf Range of the allele frequencies (default beta distribution).
+# @param rare_maf Threshold for generating variants from their carriers.
+#
+# @return An iterator over tuples ( index of the first variant, genotypes ).
+#
+def generate_single(nvariants, nsamples, maf = None, rare_maf = 0.01):
+    block_size = memory.block_size( nsamples * GENOTYPE_BYTES[ "single" ], BLOCK_GENOTYPES // nsamples )
+    for start in range( 0, nvariants, block_size ):
+        mafs = generate_maf_array( min( block_size, nvariants - start ), maf )
+        genotypes = variant.generate_variant_block( mafs, nsamples, rare_maf )
+        fix_monomorphic( genotypes )
+
+        yield start, genotypes
+
+##
+# Generates allele frequencies for a set of variants.
+#
+# @param n The number of variants.
+# @param maf If set, frequencies are uniform in this range, otherwise
+#            they follow a beta distribution fitted to EUR 1000G.
+#
+# @return A numpy array of allele frequencies.
+#
+def generate_maf_array(n, maf = None):
     # These a and b values were taken by fitting a beta distribution to the
     # allele frequency distribution of EUR 1000G.
-    generate_maf = lambda: random.betavariate( 0.4679562, 0.4679562 )
     if maf:
-        generate_maf = lambda: maf[ 0 ] + ( maf[ 1 ] - maf[ 0 ] ) * random.random( )
-    
-    for i in range( nvariants ):
-        m = generate_maf( )
-        genotypes = [ variant.generate_variant( m ) for j in range( nsamples ) ]
-        actual_maf = sum( genotypes ) / ( 2.0 * nsamples )
-        if actual_maf * ( 1 - actual_maf ) <= 0.0:
-            r = random.randint( 0, nsamples - 1 )
-            genotypes[ r ] = 1 
+        return maf[ 0 ] + ( maf[ 1 ] - maf[ 0 ] ) * np.random.random( n )
+    else:
+        return np.random.beta( 0.4679562, 0.4679562, n )
+
+##
+# Makes every monomorphic row polymorphic by setting one randomly
+# chosen sample to heterozygous, in the same way as write_single.
+#
+# @param genotypes A matrix of genotypes with one row per variant.
+#
+def fix_monomorphic(genotypes):
+    num_samples = genotypes.shape[ 1 ]
+    row_sum = genotypes.sum( axis = 1, dtype = np.int64 )
+    fixed = np.flatnonzero( ( row_sum == 0 ) | ( row_sum == 2 * num_samples ) )
+    genotypes[ fixed, np.random.randint( 0, num_samples, len( fixed ) ) ] = 1
+
+##
+# Generate a set of variants in linkage disequilibrium. Each haplotype
+# is a Markov chain along the variants, so the LD between two variants
+# decays geometrically with the number of variants between them.
+#
+# @param nvariants The number of variants.
+# @param nsamples The number of samples.
+# @param output_prefix The output plink prefix.
+# @param maf Range of the allele frequencies (default beta distribution).
+# @param r2 Target r^2 between adjacent variants.
+# @param dprime Target D' between adjacent variants.
+# @param create_pair Should a .pair file be created?
+# @param frq If true the realised allele frequencies are written to .frq.
+# @param stream If set the plink file is written as a stream to this
+#               path or - for stdout.
+# @param shard If set a tuple ( i, N ), only the i:th of N slices of the
+#              variants is generated, the chain starts over in each slice.
+# @param append If true the variants are appended to an existing plink
+#               file, nsamples is then taken from its .fam file and the
+#               chain starts over.
+#
+def write_ld(nvariants, nsamples, output_prefix, maf = None, r2 = None, dprime = None, create_pair = False, frq = False, stream = None, shard = None, append = False):
+    if create_pair and nvariants > 10000:
+        raise ValueError( "Creating pairs for more than 10000 variants is too time consuming." )
 
-        pf.write( i, genotypes )
+    pf, first_variant = open_variant_file( output_prefix, nsamples, frq, stream, append )
+    first, last = plink_shard.shard_range( nvariants, shard )
+    plink_shard.seed_shard( shard )
+    for start, genotypes in generate_ld( last - first, pf.num_samples, maf, r2, dprime ):
+        pf.write_block( first_variant + first + start, genotypes )
 
     pf.close( )
 
     if create_pair:
         generate_pairs( output_prefix )
 
+##
+# Generates blocks of variants in linkage disequilibrium, see write_ld.
+#
+# @return An iterator over tuples ( index of the first variant, genotypes ).
+#
+def generate_ld(nvariants, nsamples, maf = None, r2 = None, dprime = None):
+    mafs = generate_maf_array( nvariants, maf )
+    chain = ld.HaplotypeChain( 2 * nsamples, r2, dprime )
+    block_size = memory.block_size( nsamples * GENOTYPE_BYTES[ "ld" ], BLOCK_GENOTYPES // ( 2 * nsamples ), mafs.nbytes )
+    for start in range( 0, nvariants, block_size ):
+        haplotypes = chain.next_block( mafs[ start:start + block_size ] )
+        genotypes = ld.to_genotypes( haplotypes )
+        fix_monomorphic( genotypes )
+
+        yield start, genotypes
+
 ##
 # Generate a set of single variants.
 #
-def write_related(nvariants, nsamples, nancestors, nsegments, output_prefix, maf = None, create_pair = False):
+# @param shard If set a tuple ( i, N ), only the i:th of N slices of the
+#              variants is generated, the ancestry is the same in all shards
+#              and the relationship matrix is only written by the first.
+#
+def write_related(nvariants, nsamples, nancestors, nsegments, output_prefix, maf = None, create_pair = False, grm = False, kinship_threshold = None, shard = None):
     if create_pair and nvariants > 10000:
         raise ValueError( "Creating pairs for more than 10000 variants is too time consuming, use besiq pairs instead." )
     
     pf = PlinkFile( output_prefix, [ -9 ] * nsamples, 0 )
 
-    # These a and b values were taken by fitting a beta distribution to the
-    # allele frequency distribution of EUR 1000G.
-    generate_maf = lambda: random.betavariate( 0.4679562, 0.4679562 )
-    if maf:
-        generate_maf = lambda: maf[ 0 ] + ( maf[ 1 ] - maf[ 0 ] ) * random.random( )
+    segments = generate_segments( nvariants, nsegments )
+
+    # Determine the ancestor of each segment of the two haplotypes
+    # of every sample, will allow us to generate data per variant.
+    ancestry = np.random.randint( 0, nancestors, ( nsamples, 2, len( segments ) - 1 ) ).astype( np.int32 )
+
+    # Generate the ancestral haplotypes and the data per block of variants
+    block_size = memory.block_size( 9 * nancestors + nsamples * GENOTYPE_BYTES[ "related" ], BLOCK_GENOTYPES // max( nancestors, nsamples ), ancestry.nbytes )
+    first, last = plink_shard.shard_range( nvariants, shard )
+    plink_shard.seed_shard( shard )
+    s = bisect.bisect_right( segments, first ) - 1
+    for start in range( first, last, block_size ):
+        end = min( start + block_size, last )
+        mafs = generate_maf_array( end - start, maf )
+        haplotypes = ( np.random.random( ( nancestors, end - start ) ) <= mafs ).astype( np.uint8 )
+
+        geno_sum = haplotypes.sum( axis = 0 )
+        fixed = np.flatnonzero( ( geno_sum == 0 ) | ( geno_sum == nancestors ) )
+        r = np.random.randint( 0, nancestors, len( fixed ) )
+        haplotypes[ r, fixed ] = 1 - haplotypes[ r, fixed ]
+
+        # Each segment that overlaps the block
+        genotypes = np.empty( ( end - start, nsamples ), dtype = np.uint8 )
+        while segments[ s ] < end:
+            seg_start = max( segments[ s ], start ) - start
+            seg_end = min( segments[ s + 1 ], end ) - start
+            genotypes[ seg_start:seg_end ] = kernels.segment_genotypes( haplotypes, ancestry[ :, 0, s ], ancestry[ :, 1, s ], seg_start, seg_end )
+            if segments[ s + 1 ] > end:
+                break
+
+            s += 1
+
+        pf.write_block( start, genotypes )
+
+    pf.close( )
+
+    if ( grm or kinship_threshold is not None ) and plink_shard.is_first( shard ):
+        weights = np.diff( segments ) / float( nvariants )
+        kinship.write_kinship( ancestry, weights, nvariants, output_prefix, grm, kinship_threshold )
+
+    if create_pair:
+        generate_pairs( output_prefix )
+
+##
+# Finds the indices where a new chromosome starts in a .bim file.
+#
+# @param bim_path Path to the .bim file.
+#
+# @return A list of the indices that start a new chromosome (except the first).
+#
+def find_chromosome_starts(bim_path):
+    starts = [ ]
+    prev_chr = None
+    with open( bim_path, "r" ) as bim_file:
+        for i, line in enumerate( bim_file ):
+            chromosome = line.split( None, 1 )[ 0 ]
+            if prev_chr is not None and chromosome != prev_chr:
+                starts.append( i )
 
-    # Generate allele frequencies
-    maf = [ generate_maf( ) for i in range( nvariants ) ]
+            prev_chr = chromosome
 
-    # Generate ancestral haplotypes
-    haplotypes = [ ]
-    for i in range( nancestors ):
-        haplotypes.append( [ int( random.random( ) <= f ) for f in maf ] )
+    return starts
 
-    for i in range( nvariants ):
-        geno_sum = sum( haplotypes[ h ][ i ] for h in range( nancestors ) )
-        if geno_sum == 0 or geno_sum == nancestors:
-            r = random.randint( 0, nancestors - 1 )
-            haplotypes[ r ][ i ] = ( haplotypes[ r ][ i ] + 1 ) % 2
+##
+# Generates segment boundaries with exponentially distributed lengths,
+# in the same way as write_related.
+#
+# @param nvariants The number of variants.
+# @param nsegments The average number of segments.
+# @param breaks Additional boundaries that segments may not cross.
+#
+# @return A sorted list of boundaries starting with 0 and ending with nvariants.
+#
+def generate_segments(nvariants, nsegments, breaks = None):
+    if nsegments < 1:
+        raise ValueError( "The number of segments must be at least 1." )
+
+    if breaks is None:
+        breaks = [ ]
 
     segments = [ 0 ]
-    while segments[ -1 ] < nvariants:        
+    while segments[ -1 ] < nvariants:
         break_length = random.expovariate( float( nvariants ) / nsegments )
-        next_break = segments[ -1 ] + max( int( break_length *  nvariants ), 1 )
+        next_break = segments[ -1 ] + max( int( break_length * nvariants ), 1 )
         if next_break >= nvariants:
             next_break = nvariants
 
         segments.append( next_break )
 
-    # Determine ancestry of each segment, will allow us to generate
-    # data per variant.
-    path = [ ]
-    for i in range( nsamples ):
-        cur_haplo = list( )
-        for h in range( 2 ):
-            ancestry = dict( )
-            for s in segments[ :-1 ]:
-                ancestry[ s ] = random.randint( 0, nancestors - 1 )
-            
-            cur_haplo.append( ancestry )
-        
-        path.append( cur_haplo )
-
-    # Generate data per snp
-    for i in range( 1, len( segments ) ):
-        for v in range( segments[ i - 1 ], segments[ i ] ):
-            genotypes = [ haplotypes[ path[ sample ][ 0 ][ segments[ i - 1 ] ] ][ v ] +
-                haplotypes[ path[ sample ][ 1 ][ segments[ i - 1 ] ]][ v ] for sample in range( nsamples ) ]
-            pf.write( v, genotypes )
+    return sorted( set( segments ).union( b for b in breaks if 0 < b < nvariants ) )
+
+##
+# Generate samples that are mosaics of the samples in a reference plink
+# file. The genome is split into segments and each segment of a new sample
+# is copied from a randomly chosen reference sample, so that the allele
+# frequencies and LD structure of the reference are kept.
+#
+# @param input_prefix The reference plink prefix.
+# @param nsamples The number of samples to generate.
+# @param nsegments Average number of segments the genome is split into.
+# @param output_prefix The output plink prefix.
+# @param create_pair Should a .pair file be created?
+#
+def write_mosaic(input_prefix, nsamples, nsegments, output_prefix, create_pair = False):
+    reference = bed.open_bed( input_prefix )
+    nvariants = reference.num_variants
+    if create_pair and nvariants > 10000:
+        raise ValueError( "Creating pairs for more than 10000 variants is too time consuming." )
+
+    segments = generate_segments( nvariants, nsegments, find_chromosome_starts( input_prefix + ".bim" ) )
+    ancestors = np.random.randint( 0, reference.num_samples, ( len( segments ) - 1, nsamples ) )
+
+    pf = PlinkFile( output_prefix, [ -9 ] * nsamples, 0 )
+    block_size = memory.block_size( ( reference.num_samples + nsamples ) * GENOTYPE_BYTES[ "mosaic" ], BLOCK_GENOTYPES // max( reference.num_samples, nsamples ), ancestors.nbytes )
+    with open( input_prefix + ".bim", "r" ) as bim_file:
+        s = 0
+        for start in range( 0, nvariants, block_size ):
+            end = min( start + block_size, nvariants )
+            reference_rows = reference.read_rows( start, end )
+            genotypes = np.empty( ( end - start, nsamples ), dtype = np.uint8 )
+
+            # Copy each segment that overlaps the block in bulk
+            while segments[ s ] < end:
+                seg_start = max( segments[ s ], start )
+                seg_end = min( segments[ s + 1 ], end )
+                genotypes[ seg_start - start:seg_end - start ] = reference_rows[ seg_start - start:seg_end - start ][ :, ancestors[ s ] ]
+                if segments[ s + 1 ] > end:
+                    break
+
+                s += 1
+
+            pf.write_block( start, genotypes, list( islice( bim_file, end - start ) ) )
 
     pf.close( )
+    reference.close( )
 
     if create_pair:
         generate_pairs( output_prefix )
 
+##
+# Draws population specific allele frequencies from the Balding-Nichols
+# model.
+#
+# @param mafs Ancestral allele frequency of each variant.
+# @param npops The number of populations.
+# @param fst The fixation index of each population.
+#
+# @return A ( npops, variants ) array of allele frequencies.
+#
+def balding_nichols(mafs, npops, fst):
+    mafs = np.clip( mafs, 1e-6, 1 - 1e-6 )
+    a = mafs * ( 1 - fst ) / fst
+    b = ( 1 - mafs ) * ( 1 - fst ) / fst
+
+    return np.random.beta( a, b, ( npops, len( mafs ) ) )
 
+##
+# Generate samples from several populations, or admixed from several
+# populations, whose allele frequencies follow the Balding-Nichols
+# model. The true ancestry proportions are written to a .cov file.
+#
+# @param nvariants The number of variants.
+# @param nsamples The number of samples.
+# @param npops The number of populations.
+# @param fst The fixation index of each population.
+# @param output_prefix The output plink prefix.
+# @param maf Range of the ancestral allele frequencies (default beta distribution).
+# @param admixture If set, the ancestry proportions of each sample are drawn
+#                  from a symmetric Dirichlet with this parameter, otherwise
+#                  the samples are split into npops equally sized populations.
+# @param create_pair Should a .pair file be created?
+#
+def write_structured(nvariants, nsamples, npops, fst, output_prefix, maf = None, admixture = None, create_pair = False):
+    if create_pair and nvariants > 10000:
+        raise ValueError( "Creating pairs for more than 10000 variants is too time consuming." )
+
+    if admixture:
+        proportions = np.random.dirichlet( [ admixture ] * npops, nsamples )
+    else:
+        proportions = np.zeros( ( nsamples, npops ) )
+        proportions[ np.arange( nsamples ), np.arange( nsamples ) * npops // nsamples ] = 1.0
+
+    cov_file = CovFile( output_prefix + ".cov", [ "FID", "IID" ] + [ "pop{0}".format( k + 1 ) for k in range( npops ) ] )
+    for i in range( nsamples ):
+        cov_file.write( [ "fid{0}".format( i ), "iid{0}".format( i ) ] + list( proportions[ i ] ) )
+    cov_file.close( )
+
+    pf = PlinkFile( output_prefix, [ -9 ] * nsamples, 0 )
+
+    block_size = memory.block_size( nsamples * GENOTYPE_BYTES[ "structured" ], BLOCK_GENOTYPES // nsamples, proportions.nbytes )
+    for start in range( 0, nvariants, block_size ):
+        mafs = generate_maf_array( min( block_size, nvariants - start ), maf )
+        pop_mafs = balding_nichols( mafs, npops, fst )
+        sample_mafs = np.clip( np.dot( pop_mafs.T, proportions.T ), 0.0, 1.0 )
+
+        genotypes = np.random.binomial( 2, sample_mafs ).astype( np.uint8 )
+        fix_monomorphic( genotypes )
+
+        pf.write_block( start, genotypes )
+
+    pf.close( )
+
+    if create_pair:
+        generate_pairs( output_prefix )
@@ -1,6 +1,8 @@
 import random
 from math import exp, log, sqrt, pi
-from epigen.plink.util import sample_categorical, joint_maf
+from epigen.plink.util import sample_categorical, joint_maf, fast_sample_setup, fast_sample_array
+
+import numpy as np
 
 ##
 # The parameters that does not changed between models.
@@ -41,8 +43,15 @@ class FixedParams:
 # a phenotype, and then generate the genotypes.
 #
 class BinomialModel:
+    def __init__(self):
+        self.alias_cache = { }
+
     def init_cache(self, fixed_params, params, phenotype):
-        pass
+        self.alias_cache = { }
+        if fixed_params.maf_is_fixed( ):
+            maf = fixed_params.get_maf( )
+            for pheno in ( 0, 1 ):
+                self.alias_cache[ pheno ] = fast_sample_setup( self.joint_prob( maf, params.penetrance, pheno ) )
 
     def generate_phenotype(self, fixed_params):
         return [ 1 ] * fixed_params.num_cases( ) + [ 0 ] * fixed_params.num_controls( )
@@ -59,19 +68,20 @@ class BinomialModel:
         return [ g / geno_denom for g in geno_prob ]
 
     def generate_genotype(self, fixed_params, params, phenotype):
-        maf = fixed_params.get_maf( )
-        prob = [ ]
-        prob.append( self.joint_prob( maf, params.penetrance, 0 ) )
-        prob.append( self.joint_prob( maf, params.penetrance, 1 ) )
+        alias = self.alias_cache
+        if len( alias ) == 0:
+            maf = fixed_params.get_maf( )
+            alias = dict( ( pheno, fast_sample_setup( self.joint_prob( maf, params.penetrance, pheno ) ) ) for pheno in ( 0, 1 ) )
 
-        snp1_list = list( )
-        snp2_list = list( )
-        for pheno in phenotype:
-            snp1, snp2 =  sample_categorical( prob[ pheno ] )
-            snp1_list.append( snp1 )
-            snp2_list.append( snp2 )
+        # Genotypes are sampled as one of the 9 cells, 3 * snp1 + snp2
+        phenotype = np.asarray( phenotype )
+        cells = np.empty( len( phenotype ), dtype = np.int64 )
+        for pheno in ( 0, 1 ):
+            index = np.flatnonzero( phenotype == pheno )
+            J, q = alias[ pheno ]
+            cells[ index ] = fast_sample_array( J, q, len( index ) )
 
-        return snp1_list, snp2_list
+        return cells // 3, cells % 3
 
     def is_binary(self):
         return True
@@ -91,6 +101,32 @@ class BinomialPhenoGenerator:
         else:
             return None
 
+    ##
+    # Generates the phenotype of all samples at once.
+    #
+    # @param rows A ( variables, samples ) array.
+    #
+    # @return An array of phenotypes where missing is nan.
+    #
+    def generate_phenos(self, rows):
+        return self.generate_from_mu( self.mu_map.map_rows( rows ) )
+
+    ##
+    # Generates the phenotype of all samples from their mean values.
+    #
+    # @param mu The mean value of each sample, missing is nan.
+    #
+    # @return An array of phenotypes where missing is nan.
+    #
+    def generate_from_mu(self, mu):
+        y = ( np.random.random( len( mu ) ) <= mu ).astype( np.float64 )
+        y[ np.isnan( mu ) ] = np.nan
+
+        self.sample_size[ 0 ] += int( ( y == 0 ).sum( ) )
+        self.sample_size[ 1 ] += int( ( y == 1 ).sum( ) )
+
+        return y
+
 class BinomialParams:
     def __init__(self, penetrance):
         self.penetrance = penetrance
@@ -165,6 +201,28 @@ class NormalPhenoGenerator:
         else:
             return None
 
+    ##
+    # Generates the phenotype of all samples at once.
+    #
+    # @param rows A ( variables, samples ) array.
+    #
+    # @return An array of phenotypes where missing is nan.
+    #
+    def generate_phenos(self, rows):
+        return self.generate_from_mu( self.mu_map.map_rows( rows ) )
+
+    ##
+    # Generates the phenotype of all samples from their mean values.
+    #
+    # @param mu The mean value of each sample, missing is nan.
+    #
+    # @return An array of phenotypes where missing is nan.
+    #
+    def generate_from_mu(self, mu):
+        self.sample_size[ 0 ] += int( ( ~np.isnan( mu ) ).sum( ) )
+
+        return mu + self.dispersion * np.random.standard_normal( len( mu ) )
+
 class NormalParams:
     def __init__(self, mu, std):
         self.mu = mu
@@ -182,6 +240,21 @@ class GeneralMuMap:
         else:
             return self.mu[ 3 * variants[ 0 ] + variants[ 1 ] ]
 
+    ##
+    # Maps the genotypes of all samples, missing is nan.
+    #
+    # @param rows A ( 2, samples ) array of genotypes.
+    #
+    def map_rows(self, rows):
+        rows = np.asarray( rows )
+        if len( rows ) != 2:
+            return np.full( rows.shape[ -1 ], np.nan )
+
+        missing = ( rows == 3 ).any( axis = 0 )
+        cells = np.where( missing, 0, 3 * rows[ 0 ] + rows[ 1 ] ).astype( np.int64 )
+
+        return np.where( missing, np.nan, np.asarray( self.mu, dtype = np.float64 )[ cells ] )
+
 class AdditiveMuMap:
     def __init__(self, beta0, beta, link, mu = None, std = None):
         self.beta0 = beta0
@@ -205,6 +278,35 @@ class AdditiveMuMap:
         else:
             return self.link( self.beta0 + sum( ((v-m)/s) * b for v, b, m, s in zip( variants, self.beta, self.mu, self.std ) ) )
 
+    ##
+    # Maps the values of all samples, missing is nan.
+    #
+    # @param rows A ( variables, samples ) array.
+    #
+    def map_rows(self, rows):
+        rows = np.asarray( rows, dtype = np.float64 )
+        if len( rows ) != len( self.beta ):
+            return np.full( rows.shape[ -1 ], np.nan )
+
+        missing = ( rows == 3 ).any( axis = 0 )
+        scaled = ( rows - np.asarray( self.mu )[ :, np.newaxis ] ) / np.asarray( self.std )[ :, np.newaxis ]
+        eta = self.beta0 + np.dot( self.beta, scaled )
+
+        return np.where( missing, np.nan, np.vectorize( self.link, otypes = [ np.float64 ] )( np.where( missing, 0.0, eta ) ) )
+
+    ##
+    # Maps the linear predictors of all samples, computed without the
+    # intercept, missing is nan.
+    #
+    # @param scores The sum of beta times genotype of each sample.
+    #
+    def map_scores(self, scores):
+        scores = np.asarray( scores, dtype = np.float64 )
+        missing = np.isnan( scores )
+        eta = self.beta0 + np.where( missing, 0.0, scores )
+
+        return np.where( missing, np.nan, np.vectorize( self.link, otypes = [ np.float64 ] )( eta ) )
+
 def get_pheno_generator(model, mu_map, dispersion):
     if model == "normal":
         return NormalPhenoGenerator( mu_map, dispersion )
@@ -226,6 +328,19 @@ def get_links():
         "logodds" : lambda x: 1/(1+exp(-x)),
         "default" : None }
 
+##
+# The link functions of get_links for arrays of linear predictors.
+#
+def get_array_links():
+    return {
+        "identity" : lambda x: x,
+        "log" : np.exp,
+        "exp" : np.log,
+        "logc" : lambda x: 1 - np.exp( x ),
+        "odds" : lambda x: x/(1+x),
+        "logodds" : lambda x: 1/(1+np.exp(-x)),
+        "default" : None }
+
 def get_default_links():
     return {
         "normal" : "identity",
@@ -241,6 +356,12 @@ def get_link(model, link_str):
     else:
         return get_links( ).get( link_str, None )
 
+def get_array_link(model, link_str):
+    if link_str == "default":
+        return get_array_links( ).get( get_default_links( ).get( model ) )
+    else:
+        return get_array_links( ).get( link_str, None )
+
 def get_mean_values(beta, lf):
     P = [ [ 1, 0, 0, 0, 0, 0, 0, 0, 0 ],
           [ 1, 1, 0, 0, 0, 0, 0, 0, 0 ],
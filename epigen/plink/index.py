@@ -0,0 +1,545 @@
+##
+# A binary index of the variant names and samples of a plink file, so
+# that large inputs do not need to be parsed into one Python object per
+# variant and sample on every run.
+#
+# The index is written beside the plink file as <prefix>.epgidx the first
+# time the file is opened, and is memory mapped on later runs as long as
+# the size and modification time of the .bim and .fam files match. The
+# file consists of the magic bytes, a header and a number of sections:
+#
+#   variant-offsets, variant-names  String table of the variant names.
+#   variant-hashes, variant-order   The FNV-1a hash of every name sorted,
+#                                   and the index of the variant of each.
+#   fid-offsets, fid-names          String table of the family ids.
+#   iid-offsets, iid-names          String table of the individual ids.
+#   iid-hashes, iid-order           The sorted hashes of the individual ids.
+#   chromosome-offsets,             String table of the distinct chromosome
+#   chromosome-names                names in the order they first occur.
+#   variant-chromosome              The chromosome code of each variant, its
+#                                   index in the chromosome string table.
+#   variant-position                The base pair position of each variant.
+#
+# A string table stores the strings concatenated, string i is the bytes
+# from offsets[ i ] to offsets[ i + 1 ].
+#
+import collections
+import os
+import struct
+
+import numpy as np
+
+from epigen.plink import bed
+from epigen.plink import freq
+
+##
+# The first bytes of an index file.
+#
+INDEX_MAGIC = b"EPGIDX03"
+
+##
+# The size and modification time of the .bim and .fam files, and the
+# number of variants and samples.
+#
+INDEX_HEADER = struct.Struct( "<QdQdQQ" )
+
+##
+# The sections of the index and their types, each section is stored
+# as its offset and length in bytes after the header.
+#
+INDEX_SECTIONS = [ ( "variant-offsets", np.dtype( "<u8" ) ),
+                   ( "variant-names", np.dtype( "u1" ) ),
+                   ( "variant-hashes", np.dtype( "<u8" ) ),
+                   ( "variant-order", np.dtype( "<u8" ) ),
+                   ( "fid-offsets", np.dtype( "<u8" ) ),
+                   ( "fid-names", np.dtype( "u1" ) ),
+                   ( "iid-offsets", np.dtype( "<u8" ) ),
+                   ( "iid-names", np.dtype( "u1" ) ),
+                   ( "iid-hashes", np.dtype( "<u8" ) ),
+                   ( "iid-order", np.dtype( "<u8" ) ),
+                   ( "chromosome-offsets", np.dtype( "<u8" ) ),
+                   ( "chromosome-names", np.dtype( "u1" ) ),
+                   ( "variant-chromosome", np.dtype( "<u2" ) ),
+                   ( "variant-position", np.dtype( "<i8" ) ) ]
+
+##
+# Other names of chromosomes, as in plink.
+#
+CHROMOSOME_ALIASES = { "M" : "MT", "23" : "X", "24" : "Y", "25" : "XY", "26" : "MT" }
+
+##
+# The largest number of distinct chromosomes of a plink file.
+#
+MAX_CHROMOSOMES = 2**16
+
+##
+# Constants of the 64-bit FNV-1a hash.
+#
+FNV_OFFSET = np.uint64( 14695981039346656037 )
+FNV_PRIME = np.uint64( 1099511628211 )
+
+##
+# A sample of an indexed plink file.
+#
+Sample = collections.namedtuple( "Sample", [ "fid", "iid" ] )
+
+##
+# A variant of an indexed plink file, only the name is indexed.
+#
+Locus = collections.namedtuple( "Locus", [ "name" ] )
+
+##
+# Returns the name that a chromosome is compared by, so that for
+# example 1, chr1 and 01 or MT, chrM and 26 are the same chromosome.
+#
+def chromosome_key(name):
+    key = name.upper( )
+    if key.startswith( "CHR" ):
+        key = key[ 3: ]
+
+    if key.isdigit( ):
+        key = str( int( key ) )
+
+    return CHROMOSOME_ALIASES.get( key, key )
+
+##
+# Returns the codes of the given chromosomes.
+#
+# @param chromosome_names The name of each chromosome code of a file.
+# @param names The names to look up, see chromosome_key.
+#
+# @return A sorted list of the codes of the chromosomes.
+#
+# @raises ValueError if a name is not a chromosome of the file.
+#
+def find_chromosomes(chromosome_names, names):
+    codes = collections.defaultdict( list )
+    for code, name in enumerate( chromosome_names ):
+        codes[ chromosome_key( name ) ].append( code )
+
+    found = set( )
+    for name in names:
+        if chromosome_key( name ) not in codes:
+            raise ValueError( "The chromosome {0} is not in the plink file.".format( name ) )
+
+        found.update( codes[ chromosome_key( name ) ] )
+
+    return sorted( found )
+
+##
+# Computes the FNV-1a hash of a set of strings.
+#
+# @param offsets The offsets of a string table.
+# @param names The bytes of a string table.
+#
+# @return A uint64 array with the hash of each string.
+#
+def hash_strings(offsets, names):
+    offsets = np.asarray( offsets, dtype = np.int64 )
+    names = np.asarray( names, dtype = np.uint8 )
+    lengths = np.diff( offsets )
+    hashes = np.full( len( lengths ), FNV_OFFSET, dtype = np.uint64 )
+
+    # One byte of every string that is long enough at a time
+    max_length = int( lengths.max( ) ) if len( lengths ) > 0 else 0
+    for j in range( max_length ):
+        active = np.flatnonzero( lengths > j )
+        hashes[ active ] = ( hashes[ active ] ^ names[ offsets[ active ] + j ].astype( np.uint64 ) ) * FNV_PRIME
+
+    return hashes
+
+##
+# Builds a string table from a list of strings.
+#
+# @return A tuple ( offsets, names ).
+#
+def make_table(strings):
+    encoded = [ s.encode( "utf-8" ) for s in strings ]
+    offsets = np.zeros( len( encoded ) + 1, dtype = np.uint64 )
+    np.cumsum( [ len( s ) for s in encoded ], out = offsets[ 1: ] )
+
+    return offsets, np.frombuffer( b"".join( encoded ), dtype = np.uint8 )
+
+##
+# Sorts the hashes of a string table for lookup.
+#
+# @return A tuple ( sorted hashes, index of each sorted hash ).
+#
+def make_lookup(offsets, names):
+    hashes = hash_strings( offsets, names )
+    order = np.argsort( hashes, kind = "mergesort" )
+
+    return hashes[ order ], order.astype( np.uint64 )
+
+##
+# A table of strings that can be looked up by index and by value.
+#
+class StringTable:
+    ##
+    # Constructor.
+    #
+    # @param offsets The offsets of the strings.
+    # @param names The bytes of the strings.
+    # @param hashes The sorted hashes, or None if lookup is not needed.
+    # @param order The index of each sorted hash.
+    #
+    def __init__(self, offsets, names, hashes = None, order = None):
+        self.offsets = offsets
+        self.names = names
+        self.hashes = hashes
+        self.order = order
+
+    def __len__(self):
+        return len( self.offsets ) - 1
+
+    def __getitem__(self, i):
+        return self.names[ int( self.offsets[ i ] ):int( self.offsets[ i + 1 ] ) ].tobytes( ).decode( "utf-8" )
+
+    ##
+    # Returns all strings as a list.
+    #
+    def tolist(self):
+        text = self.names.tobytes( ).decode( "utf-8" )
+        offsets = self.offsets.tolist( )
+        return [ text[ offsets[ i ]:offsets[ i + 1 ] ] for i in range( len( offsets ) - 1 ) ] if text.isascii( ) else [ self[ i ] for i in range( len( self ) ) ]
+
+    ##
+    # Returns the index of a string, or -1 if it is not in the table.
+    # If the string occurs more than once the first index is returned.
+    #
+    def find(self, name):
+        encoded = name.encode( "utf-8" )
+        offsets = np.array( [ 0, len( encoded ) ], dtype = np.uint64 )
+        h = hash_strings( offsets, np.frombuffer( encoded, dtype = np.uint8 ) )[ 0 ]
+
+        k = int( np.searchsorted( self.hashes, h ) )
+        while k < len( self.hashes ) and self.hashes[ k ] == h:
+            i = int( self.order[ k ] )
+            if self[ i ] == name:
+                return i
+
+            k += 1
+
+        return -1
+
+    ##
+    # Returns the indices of every occurrence of a string in increasing
+    # order.
+    #
+    def find_all(self, name):
+        encoded = name.encode( "utf-8" )
+        offsets = np.array( [ 0, len( encoded ) ], dtype = np.uint64 )
+        h = hash_strings( offsets, np.frombuffer( encoded, dtype = np.uint8 ) )[ 0 ]
+
+        found = [ ]
+        k = int( np.searchsorted( self.hashes, h ) )
+        while k < len( self.hashes ) and self.hashes[ k ] == h:
+            i = int( self.order[ k ] )
+            if self[ i ] == name:
+                found.append( i )
+
+            k += 1
+
+        return sorted( found )
+
+##
+# The index of a plink file.
+#
+class PlinkIndex:
+    ##
+    # Constructor.
+    #
+    # @param sections A dict from section name to array.
+    #
+    def __init__(self, sections):
+        self.variants = StringTable( sections[ "variant-offsets" ], sections[ "variant-names" ], sections[ "variant-hashes" ], sections[ "variant-order" ] )
+        self.fids = StringTable( sections[ "fid-offsets" ], sections[ "fid-names" ] )
+        self.iids = StringTable( sections[ "iid-offsets" ], sections[ "iid-names" ], sections[ "iid-hashes" ], sections[ "iid-order" ] )
+        self.chromosome_names = StringTable( sections[ "chromosome-offsets" ], sections[ "chromosome-names" ] )
+        self.chromosomes = sections[ "variant-chromosome" ]
+        self.positions = sections[ "variant-position" ]
+
+##
+# Returns the size and modification time of a file.
+#
+def file_stamp(path):
+    st = os.stat( path )
+    return st.st_size, st.st_mtime
+
+##
+# Reads the given columns of a whitespace separated file.
+#
+# @return A list for each column.
+#
+def read_columns(path, columns):
+    values = [ [ ] for c in columns ]
+    with open( path, "r" ) as input_file:
+        for line in input_file:
+            fields = line.split( )
+            for j, c in enumerate( columns ):
+                values[ j ].append( fields[ c ] )
+
+    return values
+
+##
+# Builds the sections of an index from the .bim and .fam files.
+#
+# @param path Prefix of the plink file.
+#
+# @return A dict from section name to array.
+#
+def build_sections(path):
+    sections = { }
+    chromosomes, variant_names, positions = read_columns( path + ".bim", [ 0, 1, 3 ] )
+    sections[ "variant-offsets" ], sections[ "variant-names" ] = make_table( variant_names )
+    sections[ "variant-hashes" ], sections[ "variant-order" ] = make_lookup( sections[ "variant-offsets" ], sections[ "variant-names" ] )
+    chromosome_names = list( dict.fromkeys( chromosomes ) )
+    if len( chromosome_names ) > MAX_CHROMOSOMES:
+        raise ValueError( "The plink file {0} has more than {1} chromosomes.".format( path, MAX_CHROMOSOMES ) )
+
+    codes = { name : code for code, name in enumerate( chromosome_names ) }
+    sections[ "chromosome-offsets" ], sections[ "chromosome-names" ] = make_table( chromosome_names )
+    sections[ "variant-chromosome" ] = np.array( [ codes[ c ] for c in chromosomes ], dtype = np.uint16 )
+    sections[ "variant-position" ] = np.array( positions, dtype = np.int64 )
+
+    fids, iids = read_columns( path + ".fam", [ 0, 1 ] )
+    sections[ "fid-offsets" ], sections[ "fid-names" ] = make_table( fids )
+    sections[ "iid-offsets" ], sections[ "iid-names" ] = make_table( iids )
+    sections[ "iid-hashes" ], sections[ "iid-order" ] = make_lookup( sections[ "iid-offsets" ], sections[ "iid-names" ] )
+
+    return sections
+
+##
+# Writes a file of sections atomically: the magic bytes, a header, the
+# offset and length of each section and then the sections, each
+# aligned to 8 bytes.
+#
+# @param path Path to the file.
+# @param magic The first bytes of the file.
+# @param header A struct.Struct of the header.
+# @param header_values The values of the header.
+# @param layout A list of the name and dtype of each section.
+# @param sections A dict from section name to array.
+#
+def write_sections(path, magic, header, header_values, layout, sections):
+    offset = len( magic ) + header.size + 16 * len( layout )
+    table = [ ]
+    for name, dtype in layout:
+        offset += -offset % 8
+        nbytes = sections[ name ].size * dtype.itemsize
+        table.append( ( offset, nbytes ) )
+        offset += nbytes
+
+    tmp_path = path + ".tmp"
+    with open( tmp_path, "wb" ) as output_file:
+        output_file.write( magic )
+        output_file.write( header.pack( *header_values ) )
+        for section_offset, nbytes in table:
+            output_file.write( struct.pack( "<QQ", section_offset, nbytes ) )
+
+        for ( name, dtype ), ( section_offset, nbytes ) in zip( layout, table ):
+            output_file.write( b"\0" * ( section_offset - output_file.tell( ) ) )
+            output_file.write( np.ascontiguousarray( sections[ name ], dtype = dtype ).tobytes( ) )
+
+    os.rename( tmp_path, path )
+
+##
+# Memory maps a file written by write_sections.
+#
+# @param path Path to the file.
+# @param magic The first bytes of the file.
+# @param header A struct.Struct of the header.
+# @param layout A list of the name and dtype of each section.
+#
+# @return A tuple ( header values, dict from section name to array ), or
+#         None if the file is missing or has a different format.
+#
+def read_sections(path, magic, header, layout):
+    if not os.path.exists( path ):
+        return None
+
+    data = np.memmap( path, dtype = np.uint8, mode = "r" )
+    header_end = len( magic ) + header.size
+    if len( data ) < header_end + 16 * len( layout ) or data[ :len( magic ) ].tobytes( ) != magic:
+        return None
+
+    sections = { }
+    for i, ( name, dtype ) in enumerate( layout ):
+        start = header_end + 16 * i
+        section_offset, nbytes = struct.unpack( "<QQ", data[ start:start + 16 ].tobytes( ) )
+        if section_offset + nbytes > len( data ):
+            return None
+
+        sections[ name ] = data[ section_offset:section_offset + nbytes ].view( dtype )
+
+    return header.unpack( data[ len( magic ):header_end ].tobytes( ) ), sections
+
+##
+# Memory maps an index if it matches the plink file.
+#
+# @param index_path Path to the index file.
+# @param stamps The stamps of the .bim and .fam files.
+#
+# @return A dict from section name to array, or None if the index is
+#         missing or out of date.
+#
+def read_index(index_path, stamps):
+    result = read_sections( index_path, INDEX_MAGIC, INDEX_HEADER, INDEX_SECTIONS )
+    if result is None:
+        return None
+
+    header_values, sections = result
+    if ( header_values[ 0:2 ], header_values[ 2:4 ] ) != tuple( stamps ):
+        return None
+
+    return sections
+
+##
+# Opens the index of a plink file, builds and writes it if it is
+# missing or out of date. If the index can not be written, for
+# example in a read-only directory, it is only kept in memory.
+#
+# @param path Prefix of the plink file.
+#
+# @return A PlinkIndex.
+#
+def open_index(path):
+    index_path = path + ".epgidx"
+    stamps = [ file_stamp( path + ".bim" ), file_stamp( path + ".fam" ) ]
+    sections = read_index( index_path, stamps )
+    if sections is None:
+        sections = build_sections( path )
+        try:
+            header_values = stamps[ 0 ] + stamps[ 1 ] + ( len( sections[ "variant-offsets" ] ) - 1, len( sections[ "iid-offsets" ] ) - 1 )
+            write_sections( index_path, INDEX_MAGIC, INDEX_HEADER, header_values, INDEX_SECTIONS, sections )
+        except ( IOError, OSError ):
+            pass
+
+    return PlinkIndex( sections )
+
+##
+# The variants of an indexed plink file, as a sequence of Locus.
+#
+class IndexedLoci:
+    ##
+    # Constructor.
+    #
+    # @param plink_index A PlinkIndex.
+    #
+    def __init__(self, plink_index):
+        self.table = plink_index.variants
+        self.chromosome_names = plink_index.chromosome_names.tolist( )
+        self.chromosomes = plink_index.chromosomes
+        self.positions = plink_index.positions
+
+    def __len__(self):
+        return len( self.table )
+
+    def __getitem__(self, i):
+        return Locus( self.table[ i ] )
+
+    def __iter__(self):
+        for name in self.table.tolist( ):
+            yield Locus( name )
+
+    ##
+    # Returns the index of each of the given names that is present.
+    #
+    def find(self, names):
+        return sorted( set( i for i in ( self.table.find( name ) for name in names ) if i >= 0 ) )
+
+##
+# The samples of an indexed plink file, as a sequence of Sample.
+#
+class IndexedSamples:
+    def __init__(self, fids, iids):
+        self.fids = fids
+        self.iids = iids
+
+    def __len__(self):
+        return len( self.iids )
+
+    def __getitem__(self, i):
+        return Sample( self.fids[ i ], self.iids[ i ] )
+
+    def __iter__(self):
+        for fid, iid in zip( self.fids.tolist( ), self.iids.tolist( ) ):
+            yield Sample( fid, iid )
+
+    ##
+    # Returns the position of a sample given its iid, or -1.
+    #
+    def find(self, iid):
+        return self.iids.find( iid )
+
+    ##
+    # Returns the position of a sample given its fid and iid, or -1.
+    #
+    def find_pair(self, fid, iid):
+        for i in self.iids.find_all( iid ):
+            if self.fids[ i ] == fid:
+                return i
+
+        return -1
+
+##
+# A plink file whose variant names and samples are read from its index
+# and whose genotypes are read from a memory mapped .bed file.
+#
+class IndexedPlinkFile:
+    ##
+    # Constructor.
+    #
+    # @param path Prefix to the plink file.
+    #
+    def __init__(self, path):
+        self.path = path
+        self.index = open_index( path )
+        self.loci = IndexedLoci( self.index )
+        self.samples = IndexedSamples( self.index.fids, self.index.iids )
+        self.bed = bed.open_bed( path )
+        self.frequencies = None
+
+    def get_samples(self):
+        return self.samples
+
+    def get_loci(self):
+        return self.loci
+
+    ##
+    # Returns the genotype counts of every variant, see freq.py.
+    #
+    def get_frequencies(self):
+        if self.frequencies is None:
+            self.frequencies = freq.open_frequencies( self.path )
+
+        return self.frequencies
+
+    ##
+    # Returns the genotype counts of the given variants, counting only
+    # the samples of a mask if one is given, see freq.scan_bed.
+    #
+    def count_genotypes(self, mask = None, variants = None):
+        return freq.scan_bed( self.bed, mask = mask, variants = variants )
+
+    ##
+    # Returns the packed rows in the given range.
+    #
+    def read_packed(self, start, stop):
+        return self.bed.read_packed( start, stop )
+
+    ##
+    # Returns the packed rows of the given variants.
+    #
+    def read_packed_rows(self, variants):
+        return self.bed.packed[ np.asarray( variants, dtype = np.int64 ) ]
+
+    ##
+    # Returns the genotypes of a single variant.
+    #
+    def read_row(self, i):
+        return self.bed.read_row( i )
+
+    def __iter__(self):
+        for i in range( self.bed.num_variants ):
+            yield self.bed.read_row( i )
@@ -2,6 +2,8 @@ from epigen.plink import variant
 
 import json
 
+import numpy as np
+
 ##
 # Computes the heritability V(P|G) / V(P).
 #
@@ -103,6 +105,41 @@ def estimate_heritability(model, mu_map, maf, dispersion, pop_mu):
 
     return gen_var / ( gen_var + pop_var )
 
+##
+# Computes the realised prevalence E[P] and heritability V(P|G) / V(P)
+# from the mean value of each sample.
+#
+# @param model The type of model used (normal, binomial, poisson etc)
+# @param mu The mean value of each sample, missing is nan. For the
+#           binomial model it is clipped to [0, 1] as when the
+#           phenotype is generated.
+# @param dispersion The dispersion parameter if applicable.
+#
+# @return A dict with the prevalence and heritability.
+#
+def compute_realised(model, mu, dispersion):
+    mu = np.asarray( mu, dtype = np.float64 )
+    mu = mu[ ~np.isnan( mu ) ]
+    if len( mu ) == 0:
+        return { }
+
+    if model == "binomial":
+        mu = np.clip( mu, 0.0, 1.0 )
+
+    gen_var = float( np.var( mu ) )
+    if model == "binomial":
+        pop_var = float( np.mean( mu * ( 1 - mu ) ) )
+    elif model == "poisson":
+        pop_var = float( np.mean( mu ) )
+    else:
+        pop_var = dispersion**2
+
+    H2 = gen_var / ( gen_var + pop_var ) if gen_var + pop_var > 0 else 0.0
+    if abs( H2 ) <= 1e-6:
+        H2 = 0.0
+
+    return { "prevalence" : float( np.mean( mu ) ), "heritability" : H2 }
+
 ##
 # Writes some information about the model to a json file.
 #
@@ -0,0 +1,135 @@
+##
+# Kernels for the inner loops of the generators. Every kernel has a
+# vectorized numpy version and an explicit loop version, the loop
+# versions are compiled with numba when it is installed. All random
+# numbers are drawn by the caller, so both versions give identical
+# results for the same input.
+#
+# Set EPIGEN_NO_JIT=1 in the environment or call use_jit( False ) to
+# always use the numpy versions.
+#
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+##
+# Maps a genotype (0, 1, 2 and 3 for missing) to its 2-bit .bed code.
+#
+GENOTYPE_TO_CODE = np.array( [ 0, 2, 3, 1 ], dtype = np.uint8 )
+
+##
+# Chooses between the two outcomes of each column of an alias table.
+#
+# @param J The alias of each column.
+# @param q The probability of keeping each column.
+# @param k The uniformly drawn column of each sample.
+# @param u A uniform number in [0, 1) for each sample.
+#
+# @return The index of the sampled outcome.
+#
+def alias_sample_numpy(J, q, k, u):
+    return np.where( u < q[ k ], k, J[ k ] )
+
+def alias_sample_loop(J, q, k, u):
+    out = np.empty( len( k ), dtype = np.int64 )
+    for i in range( len( k ) ):
+        if u[ i ] < q[ k[ i ] ]:
+            out[ i ] = k[ i ]
+        else:
+            out[ i ] = J[ k[ i ] ]
+
+    return out
+
+##
+# Computes the genotypes of a segment from the ancestral haplotypes
+# that each sample copies in that segment.
+#
+# @param haplotypes A uint8 ( ancestors, variants ) matrix of haplotypes.
+# @param first The ancestor of the first haplotype of each sample.
+# @param second The ancestor of the second haplotype of each sample.
+# @param start Index of the first variant in the segment.
+# @param end Index after the last variant in the segment.
+#
+# @return A uint8 ( variants, samples ) matrix of genotypes.
+#
+def segment_genotypes_numpy(haplotypes, first, second, start, end):
+    return ( haplotypes[ first, start:end ] + haplotypes[ second, start:end ] ).T
+
+def segment_genotypes_loop(haplotypes, first, second, start, end):
+    out = np.empty( ( end - start, len( first ) ), dtype = np.uint8 )
+    for v in range( start, end ):
+        for i in range( len( first ) ):
+            out[ v - start, i ] = haplotypes[ first[ i ], v ] + haplotypes[ second[ i ], v ]
+
+    return out
+
+##
+# Packs a matrix of genotypes into .bed rows.
+#
+# @param rows A uint8 ( variants, samples ) matrix of genotypes.
+#
+# @return A uint8 matrix with ( samples + 3 ) // 4 columns.
+#
+def pack_rows_numpy(rows):
+    num_rows, num_samples = rows.shape
+    codes = np.zeros( ( num_rows, 4 * ( ( num_samples + 3 ) // 4 ) ), dtype = np.uint8 )
+    codes[ :, :num_samples ] = GENOTYPE_TO_CODE[ rows ]
+    codes = codes.reshape( num_rows, -1, 4 )
+
+    return codes[ :, :, 0 ] | ( codes[ :, :, 1 ] << 2 ) | ( codes[ :, :, 2 ] << 4 ) | ( codes[ :, :, 3 ] << 6 )
+
+def pack_rows_loop(rows):
+    num_rows, num_samples = rows.shape
+    packed = np.zeros( ( num_rows, ( num_samples + 3 ) // 4 ), dtype = np.uint8 )
+    for r in range( num_rows ):
+        for i in range( num_samples ):
+            packed[ r, i >> 2 ] |= GENOTYPE_TO_CODE[ rows[ r, i ] ] << ( 2 * ( i & 3 ) )
+
+    return packed
+
+NUMPY_KERNELS = {
+    "alias_sample" : alias_sample_numpy,
+    "segment_genotypes" : segment_genotypes_numpy,
+    "pack_rows" : pack_rows_numpy,
+}
+
+JIT_KERNELS = { }
+if numba is not None:
+    JIT_KERNELS = {
+        "alias_sample" : numba.njit( cache = True )( alias_sample_loop ),
+        "segment_genotypes" : numba.njit( cache = True )( segment_genotypes_loop ),
+        "pack_rows" : numba.njit( cache = True )( pack_rows_loop ),
+    }
+
+active = dict( NUMPY_KERNELS )
+
+##
+# Selects whether the compiled kernels should be used.
+#
+# @param enabled If true the numba kernels are used when numba is
+#                installed, otherwise the numpy kernels.
+#
+# @return True if the compiled kernels are in use.
+#
+def use_jit(enabled):
+    active.clear( )
+    active.update( NUMPY_KERNELS )
+    if enabled:
+        active.update( JIT_KERNELS )
+
+    return enabled and len( JIT_KERNELS ) > 0
+
+use_jit( os.environ.get( "EPIGEN_NO_JIT", "0" ) in ( "", "0" ) )
+
+def alias_sample(J, q, k, u):
+    return active[ "alias_sample" ]( J, q, k, u )
+
+def segment_genotypes(haplotypes, first, second, start, end):
+    return active[ "segment_genotypes" ]( haplotypes, first, second, start, end )
+
+def pack_rows(rows):
+    return active[ "pack_rows" ]( np.ascontiguousarray( rows, dtype = np.uint8 ) )
@@ -0,0 +1,73 @@
+import numpy as np
+
+##
+# Computes the kinship coefficients between a sample and all samples
+# before it from the known ancestry of each segment. The kinship is
+# the probability that two alleles drawn at random, one from each sample,
+# are identical by descent, i.e. copied from the same ancestor.
+#
+# @param ancestry A ( samples, 2, segments ) array with the ancestor of
+#                 each segment of both haplotypes.
+# @param weights The fraction of the genome covered by each segment.
+# @param i Index of the sample.
+#
+# @return The kinship between sample i and samples 0, ..., i.
+#
+def kinship_row(ancestry, weights, i):
+    others = ancestry[ :i + 1 ]
+    shared = np.zeros( i + 1 )
+    for h in range( 2 ):
+        same = others == ancestry[ i, h ]
+        shared += np.dot( same.reshape( -1, same.shape[ 2 ] ), weights ).reshape( i + 1, 2 ).sum( axis = 1 )
+
+    return shared / 4.0
+
+##
+# Writes the genetic relationship matrix (twice the kinship) in the
+# binary GCTA format, and/or the pairs of samples whose kinship is
+# above a threshold.
+#
+# @param ancestry A ( samples, 2, segments ) array with the ancestor of
+#                 each segment of both haplotypes.
+# @param weights The fraction of the genome covered by each segment.
+# @param num_variants The number of variants, written to .grm.N.bin.
+# @param output_prefix The output prefix, the sample ids are assumed to
+#                      be the ones written by PlinkFile.
+# @param grm If true the .grm.bin, .grm.N.bin and .grm.id files are written.
+# @param threshold If set, pairs with at least this kinship are written
+#                  to the .kin0 file.
+#
+def write_kinship(ancestry, weights, num_variants, output_prefix, grm = True, threshold = None):
+    num_samples = ancestry.shape[ 0 ]
+    ids = [ ( "fid{0}".format( i ), "iid{0}".format( i ) ) for i in range( num_samples ) ]
+
+    grm_file = None
+    n_file = None
+    if grm:
+        grm_file = open( output_prefix + ".grm.bin", "wb" )
+        n_file = open( output_prefix + ".grm.N.bin", "wb" )
+        with open( output_prefix + ".grm.id", "w" ) as id_file:
+            for fid, iid in ids:
+                id_file.write( "{0}\t{1}\n".format( fid, iid ) )
+
+    pair_file = None
+    if threshold is not None:
+        pair_file = open( output_prefix + ".kin0", "w" )
+        pair_file.write( "FID1\tID1\tFID2\tID2\tKinship\n" )
+
+    for i in range( num_samples ):
+        row = kinship_row( ancestry, weights, i )
+        if grm_file:
+            grm_file.write( ( 2 * row ).astype( np.float32 ).tobytes( ) )
+            n_file.write( np.full( i + 1, num_variants, dtype = np.float32 ).tobytes( ) )
+
+        if pair_file:
+            for j in np.flatnonzero( row[ :i ] >= threshold ):
+                pair_file.write( "{0}\t{1}\t{2}\t{3}\t{4}\n".format( ids[ j ][ 0 ], ids[ j ][ 1 ], ids[ i ][ 0 ], ids[ i ][ 1 ], row[ j ] ) )
+
+    if grm_file:
+        grm_file.close( )
+        n_file.close( )
+
+    if pair_file:
+        pair_file.close( )
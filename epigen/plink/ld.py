@@ -0,0 +1,114 @@
+import numpy as np
+
+##
+# Computes the linkage disequilibrium coefficient D between adjacent
+# variants from either a target r^2 or a target D'. The result is
+# truncated so that all haplotype frequencies are valid.
+#
+# @param prev_maf Allele frequencies of the previous variants.
+# @param maf Allele frequencies of the current variants.
+# @param r2 Target r^2 between adjacent variants.
+# @param dprime Target Lewontin's D' between adjacent variants.
+#
+# @return D for each pair of adjacent variants.
+#
+def adjacent_d(prev_maf, maf, r2 = None, dprime = None):
+    prev_maf = np.asarray( prev_maf, dtype = np.float64 )
+    maf = np.asarray( maf, dtype = np.float64 )
+
+    dmax = np.minimum( prev_maf * ( 1 - maf ), ( 1 - prev_maf ) * maf )
+    if r2 is not None:
+        d = np.sqrt( r2 * prev_maf * ( 1 - prev_maf ) * maf * ( 1 - maf ) )
+        return np.minimum( d, dmax )
+    elif dprime is not None:
+        return dprime * dmax
+    else:
+        return np.zeros( len( maf ) )
+
+##
+# Computes the transition probabilities of the haplotype Markov chain.
+# The chain keeps the marginal allele frequency of each variant and
+# gives the requested D between adjacent variants, the correlation
+# between two variants therefore decays geometrically with the number
+# of variants between them.
+#
+# @param prev_maf Allele frequencies of the previous variants.
+# @param maf Allele frequencies of the current variants.
+# @param d Linkage disequilibrium between the previous and current variants.
+#
+# @return A tuple ( p1, p0 ) of the probability to carry the allele given
+#         that the previous variant was 1 and 0 respectively.
+#
+def transition_probs(prev_maf, maf, d):
+    prev_maf = np.asarray( prev_maf, dtype = np.float64 )
+    maf = np.asarray( maf, dtype = np.float64 )
+
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        p1 = np.where( prev_maf > 0, ( prev_maf * maf + d ) / prev_maf, maf )
+        p0 = np.where( prev_maf < 1, ( ( 1 - prev_maf ) * maf - d ) / ( 1 - prev_maf ), maf )
+
+    return np.clip( p1, 0.0, 1.0 ), np.clip( p0, 0.0, 1.0 )
+
+##
+# Generates haplotypes along a chain of variants, one variant at a time
+# but vectorized over all haplotypes.
+#
+class HaplotypeChain:
+    ##
+    # Constructor.
+    #
+    # @param num_haplotypes The number of haplotypes, i.e. twice the number of samples.
+    # @param r2 Target r^2 between adjacent variants.
+    # @param dprime Target D' between adjacent variants.
+    #
+    def __init__(self, num_haplotypes, r2 = None, dprime = None):
+        self.num_haplotypes = num_haplotypes
+        self.r2 = r2
+        self.dprime = dprime
+        self.state = None
+        self.prev_maf = None
+
+    ##
+    # Generates the next block of variants.
+    #
+    # @param mafs Allele frequency of each variant in the block.
+    #
+    # @return A uint8 matrix of haplotypes with one row per variant.
+    #
+    def next_block(self, mafs):
+        mafs = np.asarray( mafs, dtype = np.float64 )
+        block = np.empty( ( len( mafs ), self.num_haplotypes ), dtype = np.uint8 )
+        if len( mafs ) == 0:
+            return block
+
+        prev_maf = np.empty( len( mafs ) )
+        prev_maf[ 1: ] = mafs[ :-1 ]
+        prev_maf[ 0 ] = mafs[ 0 ] if self.prev_maf is None else self.prev_maf
+
+        d = adjacent_d( prev_maf, mafs, self.r2, self.dprime )
+        p1, p0 = transition_probs( prev_maf, mafs, d )
+
+        state = self.state
+        for j in range( len( mafs ) ):
+            u = np.random.random( self.num_haplotypes )
+            if state is None:
+                state = u < mafs[ j ]
+            else:
+                state = u < np.where( state, p1[ j ], p0[ j ] )
+
+            block[ j ] = state
+
+        self.state = state
+        self.prev_maf = mafs[ -1 ]
+
+        return block
+
+##
+# Combines consecutive pairs of haplotypes into genotypes.
+#
+# @param haplotypes A matrix of haplotypes with one row per variant.
+#
+# @return A matrix of genotypes with one row per variant.
+#
+def to_genotypes(haplotypes):
+    return haplotypes[ :, 0::2 ] + haplotypes[ :, 1::2 ]
@@ -0,0 +1,186 @@
+import struct
+
+import numpy as np
+
+from .pair import PairFile
+from .case import CaseFile
+from .model import ModelFile
+
+##
+# The first bytes of a manifest file.
+#
+MANIFEST_MAGIC = b"EPGMAN01"
+
+##
+# The columns of a manifest and their little-endian types. The snps are
+# the indices of the variants, variant i is named rs{i} in the .bim file.
+#
+MANIFEST_COLUMNS = [ ( "snp1", np.dtype( "<u8" ) ),
+                     ( "snp2", np.dtype( "<u8" ) ),
+                     ( "is_case", np.dtype( "u1" ) ),
+                     ( "model", np.dtype( "<u4" ) ),
+                     ( "maf1", np.dtype( "<f4" ) ),
+                     ( "maf2", np.dtype( "<f4" ) ) ]
+
+##
+# Number of pairs that are buffered before a block is written.
+#
+BLOCK_PAIRS = 2**16
+
+##
+# Writes the pairs, whether they are interactions, their model and
+# their realised minor allele frequencies to a binary manifest. The file
+# consists of the magic bytes followed by blocks, each block is the
+# number of pairs as an unsigned 64-bit integer followed by the
+# values of each column in the order of MANIFEST_COLUMNS.
+#
+class ManifestFile:
+    ##
+    # Constructor.
+    #
+    # @param path Path to the file.
+    # @param block_pairs Number of pairs in each block.
+    # @param append If true blocks are appended to an existing manifest.
+    #
+    def __init__(self, path, block_pairs = BLOCK_PAIRS, append = False):
+        if append:
+            self.file = open( path, "ab" )
+        else:
+            self.file = open( path, "wb" )
+            self.file.write( MANIFEST_MAGIC )
+        self.block_pairs = block_pairs
+        self.columns = dict( ( name, [ ] ) for name, dtype in MANIFEST_COLUMNS )
+        self.num_buffered = 0
+
+    ##
+    # Adds a block of pairs, all arguments are arrays with one
+    # value per pair or scalars.
+    #
+    # @param snp1 Index of the first variant.
+    # @param snp2 Index of the second variant.
+    # @param is_case Whether the pair is an interaction or not.
+    # @param model Index of the model the pair was generated from.
+    # @param maf1 Realised minor allele frequency of the first variant.
+    # @param maf2 Realised minor allele frequency of the second variant.
+    #
+    def write(self, snp1, snp2, is_case, model, maf1, maf2):
+        num_pairs = len( np.atleast_1d( snp1 ) )
+        values = dict( zip( [ name for name, dtype in MANIFEST_COLUMNS ], [ snp1, snp2, is_case, model, maf1, maf2 ] ) )
+        for name, dtype in MANIFEST_COLUMNS:
+            self.columns[ name ].append( np.broadcast_to( np.asarray( values[ name ], dtype = dtype ), ( num_pairs, ) ) )
+
+        self.num_buffered += num_pairs
+        if self.num_buffered >= self.block_pairs:
+            self.flush( )
+
+    ##
+    # Writes the buffered pairs as a block.
+    #
+    def flush(self):
+        if self.num_buffered == 0:
+            return
+
+        data = [ struct.pack( "<Q", self.num_buffered ) ]
+        for name, dtype in MANIFEST_COLUMNS:
+            data.append( np.concatenate( self.columns[ name ] ).astype( dtype ).tobytes( ) )
+            self.columns[ name ] = [ ]
+
+        self.write_packed( b"".join( data ) )
+        self.num_buffered = 0
+
+    ##
+    # Writes a packed block to the file.
+    #
+    def write_packed(self, data):
+        self.file.write( data )
+
+    ##
+    # Writes the remaining pairs and closes the file.
+    #
+    def close(self):
+        self.flush( )
+        self.file.close( )
+
+##
+# Reads a manifest written by ManifestFile.
+#
+class ManifestReader:
+    ##
+    # Constructor.
+    #
+    # @param path Path to the file.
+    #
+    def __init__(self, path):
+        self.path = path
+        with open( path, "rb" ) as manifest_file:
+            if manifest_file.read( len( MANIFEST_MAGIC ) ) != MANIFEST_MAGIC:
+                raise ValueError( "{0} is not an epigen manifest.".format( path ) )
+
+    ##
+    # Iterates over the blocks of the manifest.
+    #
+    # @return A dict from column name to an array of each block.
+    #
+    def blocks(self):
+        with open( self.path, "rb" ) as manifest_file:
+            manifest_file.seek( len( MANIFEST_MAGIC ) )
+            while True:
+                header = manifest_file.read( 8 )
+                if len( header ) < 8:
+                    break
+
+                num_pairs = struct.unpack( "<Q", header )[ 0 ]
+                block = { }
+                for name, dtype in MANIFEST_COLUMNS:
+                    data = manifest_file.read( num_pairs * dtype.itemsize )
+                    if len( data ) < num_pairs * dtype.itemsize:
+                        raise ValueError( "{0} is truncated.".format( self.path ) )
+
+                    block[ name ] = np.frombuffer( data, dtype = dtype )
+
+                yield block
+
+    ##
+    # Reads the whole manifest.
+    #
+    # @return A dict from column name to an array.
+    #
+    def read(self):
+        columns = dict( ( name, [ np.zeros( 0, dtype = dtype ) ] ) for name, dtype in MANIFEST_COLUMNS )
+        for block in self.blocks( ):
+            for name, values in block.items( ):
+                columns[ name ].append( values )
+
+        return dict( ( name, np.concatenate( values ) ) for name, values in columns.items( ) )
+
+##
+# Reads a manifest.
+#
+# @param path Path to the file.
+#
+# @return A dict from column name to an array.
+#
+def read_manifest(path):
+    return ManifestReader( path ).read( )
+
+##
+# Converts a manifest to the .pair, .case and .model text files.
+#
+# @param path Path to the manifest.
+# @param output_prefix The text files are written to this prefix.
+#
+def write_text(path, output_prefix):
+    pair_file = PairFile( output_prefix + ".pair" )
+    case_file = CaseFile( output_prefix + ".case" )
+    model_file = ModelFile( output_prefix + ".model" )
+
+    for block in ManifestReader( path ).blocks( ):
+        for snp1, snp2, is_case, model in zip( block[ "snp1" ].tolist( ), block[ "snp2" ].tolist( ), block[ "is_case" ].tolist( ), block[ "model" ].tolist( ) ):
+            pair = "rs{0} rs{1}".format( snp1, snp2 )
+            pair_file.write( pair )
+            case_file.write( pair, is_case )
+            model_file.write( pair, model )
+
+    pair_file.close( )
+    case_file.close( )
+    model_file.close( )
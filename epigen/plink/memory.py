@@ -0,0 +1,95 @@
+##
+# Chooses the block sizes of the generators from a memory budget. The
+# generators estimate how many bytes each unit of a block (a variant,
+# a pair or a replicate) needs while it is sampled, packed and written,
+# and ask for the largest block that fits in the budget.
+#
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+##
+# The memory limit in bytes, or None for no limit.
+#
+max_memory = None
+
+##
+# Memory already in use when the limit was set (the interpreter and
+# the imported modules), it is subtracted from the limit.
+#
+baseline_memory = 0
+
+##
+# Fraction of the remaining memory that is given to a single block,
+# the rest is left for the output buffers and allocator overhead.
+#
+BLOCK_FRACTION = 0.5
+
+##
+# Suffixes accepted by parse_memory.
+#
+UNITS = { "": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40 }
+
+##
+# Parses a memory size such as 512M or 4G.
+#
+# @param value The size as a string, a plain number is in bytes.
+#
+# @return The size in bytes.
+#
+def parse_memory(value):
+    value = value.strip( ).upper( ).rstrip( "B" )
+    unit = value[ -1: ] if value[ -1: ] in UNITS else ""
+    number = float( value[ :len( value ) - len( unit ) ] )
+    if number <= 0:
+        raise ValueError( "Memory size must be positive: {0}".format( value ) )
+
+    return int( number * UNITS[ unit ] )
+
+##
+# Returns the peak resident memory of the process in bytes.
+#
+def peak_memory():
+    if resource is None:
+        return 0
+
+    # OS X reports bytes, Linux and the BSDs kilobytes
+    usage = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    if sys.platform == "darwin":
+        return usage
+
+    return usage * 1024
+
+##
+# Sets the memory limit used to size the blocks.
+#
+# @param limit The limit in bytes, or None for no limit.
+#
+def set_max_memory(limit):
+    global max_memory, baseline_memory
+
+    max_memory = limit
+    baseline_memory = peak_memory( ) if limit is not None else 0
+
+##
+# Returns the number of units that are processed at once.
+#
+# @param unit_bytes Estimated number of bytes needed per unit.
+# @param default The number of units used when there is no limit.
+# @param fixed_bytes Memory that the generator holds regardless of
+#                    the block size.
+#
+# @return The number of units in a block, at least one.
+#
+def block_size(unit_bytes, default, fixed_bytes = 0):
+    if max_memory is None:
+        return max( 1, int( default ) )
+
+    available = ( max_memory - baseline_memory - fixed_bytes ) * BLOCK_FRACTION
+    if available < unit_bytes:
+        raise ValueError( "The memory limit is too small, at least {0} MB is needed.".format( int( ( baseline_memory + fixed_bytes + 2 * unit_bytes ) / 2**20 ) + 1 ) )
+
+    return max( 1, int( available // max( unit_bytes, 1 ) ) )
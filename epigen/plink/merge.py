@@ -0,0 +1,157 @@
+##
+# Merges the outputs of the shards of a run, see shard.py. The shards
+# contain the same samples and consecutive slices of the variants, so
+# the .bed files are concatenated byte-wise after their magic bytes and
+# the text files line by line.
+#
+import os
+import re
+import shutil
+
+from . import bed
+from .append import last_line
+from .manifest import MANIFEST_MAGIC
+
+##
+# Number of bytes that are copied at a time.
+#
+COPY_BYTES = 2**24
+
+##
+# Files of a shard that are concatenated as they are, if present.
+#
+TEXT_EXTENSIONS = [ ".bim", ".pair", ".case", ".model" ]
+
+##
+# Files that are only written by the first shard, they are copied as
+# they are.
+#
+FIRST_EXTENSIONS = [ ".grm.bin", ".grm.N.bin", ".grm.id", ".kin0" ]
+
+##
+# The name of a generated variant, rs followed by its index.
+#
+VARIANT_NAME = re.compile( r"^rs(\d+)$" )
+
+##
+# Copies the rest of a file to another file.
+#
+def copy_rest(input_file, output_file):
+    shutil.copyfileobj( input_file, output_file, COPY_BYTES )
+
+##
+# Checks that a file is present in all or none of the shards.
+#
+# @return True if the file is present in all shards.
+#
+def in_all(prefixes, ext):
+    present = [ os.path.exists( prefix + ext ) for prefix in prefixes ]
+    if any( present ) and not all( present ):
+        missing = prefixes[ present.index( False ) ]
+        raise ValueError( "The shard {0} has no {1} file.".format( missing, ext ) )
+
+    return all( present )
+
+##
+# Concatenates files that start with a header, the header is only
+# written once.
+#
+# @param paths The files in order.
+# @param output_path The output file.
+# @param header_bytes The length of the header, or None if the header
+#                     is the first line.
+# @param magic If set every file must start with this header.
+#
+def concatenate(paths, output_path, header_bytes = 0, magic = None):
+    with open( output_path, "wb" ) as output_file:
+        for i, path in enumerate( paths ):
+            with open( path, "rb" ) as input_file:
+                if header_bytes is None:
+                    header = input_file.readline( )
+                else:
+                    header = input_file.read( header_bytes )
+
+                if magic is not None and header != magic:
+                    raise ValueError( "{0} does not start with the expected header.".format( path ) )
+
+                if i == 0:
+                    output_file.write( header )
+
+                copy_rest( input_file, output_file )
+
+##
+# Returns the index of the variant of a line of a .bim file.
+#
+def variant_index(prefix, line):
+    fields = line.split( )
+    match = VARIANT_NAME.match( fields[ 1 ] ) if len( fields ) > 1 else None
+    if not match:
+        raise ValueError( "The shard {0} has a variant that is not named rsN.".format( prefix ) )
+
+    return int( match.group( 1 ) )
+
+##
+# Checks that the variants of each shard continue where the variants of
+# the previous shard ended, so that shards that are out of order,
+# repeated or missing are detected.
+#
+# @param prefixes The output prefixes of the shards in order.
+#
+def check_order(prefixes):
+    last = None
+    last_prefix = None
+    for prefix in prefixes:
+        with open( prefix + ".bim", "r" ) as bim_file:
+            first_line = bim_file.readline( )
+
+        # A shard can be empty if there are more shards than variants
+        if not first_line.strip( ):
+            continue
+
+        first = variant_index( prefix, first_line )
+        if last is not None and first != last + 1:
+            raise ValueError( "The first variant rs{0} of the shard {1} does not follow the last variant rs{2} of the shard {3}, the shards must be given in order without gaps.".format( first, prefix, last, last_prefix ) )
+
+        last = variant_index( prefix, last_line( prefix + ".bim" ) )
+        last_prefix = prefix
+
+##
+# Merges the plink files and pair files of the shards in the given order.
+#
+# @param prefixes The output prefixes of the shards.
+# @param output_prefix The merged files are written to this prefix.
+#
+def merge_shards(prefixes, output_prefix):
+    with open( prefixes[ 0 ] + ".fam", "rb" ) as fam_file:
+        fam = fam_file.read( )
+
+    num_samples = len( fam.splitlines( ) )
+    for prefix in prefixes[ 1: ]:
+        with open( prefix + ".fam", "rb" ) as fam_file:
+            if fam_file.read( ) != fam:
+                raise ValueError( "The shard {0} has different samples than {1}.".format( prefix, prefixes[ 0 ] ) )
+
+    for prefix in prefixes:
+        size = os.path.getsize( prefix + ".bed" ) - len( bed.BED_MAGIC )
+        if size < 0 or size % bed.bytes_per_row( num_samples ) != 0:
+            raise ValueError( "The shard {0} has a truncated .bed file.".format( prefix ) )
+
+    check_order( prefixes )
+
+    with open( output_prefix + ".fam", "wb" ) as fam_file:
+        fam_file.write( fam )
+
+    concatenate( [ p + ".bed" for p in prefixes ], output_prefix + ".bed", len( bed.BED_MAGIC ), bytes( bed.BED_MAGIC ) )
+    for ext in TEXT_EXTENSIONS:
+        if in_all( prefixes, ext ):
+            concatenate( [ p + ext for p in prefixes ], output_prefix + ext )
+
+    if in_all( prefixes, ".frq" ):
+        concatenate( [ p + ".frq" for p in prefixes ], output_prefix + ".frq", None )
+
+    if in_all( prefixes, ".manifest" ):
+        concatenate( [ p + ".manifest" for p in prefixes ], output_prefix + ".manifest", len( MANIFEST_MAGIC ), MANIFEST_MAGIC )
+
+    for ext in FIRST_EXTENSIONS:
+        if os.path.exists( prefixes[ 0 ] + ext ):
+            shutil.copyfile( prefixes[ 0 ] + ext, output_prefix + ext )
@@ -0,0 +1,185 @@
+##
+# A virtual plink file made of several plink files with the same
+# samples, such as one file per chromosome. The files are given as a
+# list file with one prefix per line, and their variants are numbered
+# consecutively in the order of the list. Rows are read from the
+# memory mapped .bed file of the member that holds them.
+#
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from epigen.plink import freq
+from epigen.plink.index import IndexedPlinkFile
+
+##
+# Returns true if a path is a list of plink prefixes rather than a
+# plink prefix.
+#
+def is_list_file(path):
+    return os.path.isfile( path ) and not os.path.exists( path + ".bed" )
+
+##
+# Reads the prefixes of a list file, one per line.
+#
+def read_list(path):
+    prefixes = [ ]
+    with open( path, "r" ) as list_file:
+        for line in list_file:
+            line = line.strip( )
+            if line and not line.startswith( "#" ):
+                if not os.path.exists( line + ".bed" ):
+                    raise ValueError( "The plink file {0} in {1} does not exist.".format( line, path ) )
+
+                prefixes.append( line )
+
+    if len( prefixes ) == 0:
+        raise ValueError( "The list file {0} has no plink prefixes.".format( path ) )
+
+    return prefixes
+
+##
+# Checks that two plink files have the same samples in the same order.
+#
+def same_samples(first, second):
+    a, b = first.index, second.index
+    return all( np.array_equal( x.offsets, y.offsets ) and np.array_equal( x.names, y.names ) for x, y in ( ( a.fids, b.fids ), ( a.iids, b.iids ) ) )
+
+##
+# The variants of all members, as a sequence of Locus.
+#
+class MultiLoci:
+    ##
+    # Constructor.
+    #
+    # @param members The IndexedPlinkFile of each member.
+    # @param starts The global index of the first variant of each member.
+    #
+    def __init__(self, members, starts):
+        self.members = [ m.get_loci( ) for m in members ]
+        self.starts = starts
+
+        # The chromosome codes of each member are mapped to codes of the
+        # distinct chromosome names of all members
+        self.chromosome_names = list( dict.fromkeys( name for l in self.members for name in l.chromosome_names ) )
+        codes = { name : code for code, name in enumerate( self.chromosome_names ) }
+        self.chromosomes = np.concatenate( [ np.array( [ codes[ name ] for name in l.chromosome_names ], dtype = np.int64 )[ np.asarray( l.chromosomes ) ] for l in self.members ] )
+        self.positions = np.concatenate( [ np.asarray( l.positions ) for l in self.members ] )
+
+    def __len__(self):
+        return int( self.starts[ -1 ] )
+
+    def __getitem__(self, i):
+        m = int( np.searchsorted( self.starts, i, side = "right" ) ) - 1
+        return self.members[ m ][ i - int( self.starts[ m ] ) ]
+
+    def __iter__(self):
+        for loci in self.members:
+            for locus in loci:
+                yield locus
+
+    ##
+    # Returns the global index of each of the given names that is present.
+    #
+    def find(self, names):
+        found = [ ]
+        for loci, start in zip( self.members, self.starts.tolist( ) ):
+            found.extend( start + i for i in loci.find( names ) )
+
+        return sorted( found )
+
+##
+# A plink file that consists of several plink files with the same samples.
+#
+class MultiPlinkFile:
+    ##
+    # Constructor, the members are opened in parallel.
+    #
+    # @param prefixes The prefixes of the member plink files.
+    #
+    def __init__(self, prefixes):
+        threads = min( len( prefixes ), os.cpu_count( ) or 1 )
+        with ThreadPoolExecutor( max_workers = threads ) as executor:
+            self.members = list( executor.map( IndexedPlinkFile, prefixes ) )
+
+        for prefix, member in zip( prefixes[ 1: ], self.members[ 1: ] ):
+            if not same_samples( self.members[ 0 ], member ):
+                raise ValueError( "The samples of {0} are not the same as in {1}.".format( prefix, prefixes[ 0 ] ) )
+
+        self.starts = np.zeros( len( self.members ) + 1, dtype = np.int64 )
+        np.cumsum( [ len( m.get_loci( ) ) for m in self.members ], out = self.starts[ 1: ] )
+
+        self.loci = MultiLoci( self.members, self.starts )
+        self.frequencies = None
+
+    def get_samples(self):
+        return self.members[ 0 ].get_samples( )
+
+    def get_loci(self):
+        return self.loci
+
+    ##
+    # Splits global variant indices by member.
+    #
+    # @param variants Sorted global indices.
+    #
+    # @return A list of ( member, local indices ) for the members that
+    #         hold any of the variants.
+    #
+    def split(self, variants):
+        variants = np.asarray( variants, dtype = np.int64 )
+        bounds = np.searchsorted( variants, self.starts )
+        parts = [ ]
+        for m, member in enumerate( self.members ):
+            if bounds[ m + 1 ] > bounds[ m ]:
+                parts.append( ( member, variants[ bounds[ m ]:bounds[ m + 1 ] ] - self.starts[ m ] ) )
+
+        return parts
+
+    ##
+    # Returns the genotype counts of every variant, from the frequency
+    # cache of each member.
+    #
+    def get_frequencies(self):
+        if self.frequencies is None:
+            counts = np.concatenate( [ np.asarray( m.get_frequencies( ).counts ) for m in self.members ] )
+            keys, order = freq.make_selection( counts, self.loci.chromosomes )
+            self.frequencies = freq.VariantStats( counts, keys, order )
+
+        return self.frequencies
+
+    ##
+    # Returns the genotype counts of the given variants, counting only
+    # the samples of a mask if one is given.
+    #
+    def count_genotypes(self, mask = None, variants = None):
+        if variants is None:
+            variants = np.arange( len( self.loci ) )
+
+        parts = [ member.count_genotypes( mask, local ) for member, local in self.split( variants ) ]
+        return np.concatenate( parts ) if parts else np.zeros( ( 0, 4 ), dtype = np.int64 )
+
+    ##
+    # Returns the packed rows in the given range.
+    #
+    def read_packed(self, start, stop):
+        return self.read_packed_rows( np.arange( start, stop ) )
+
+    ##
+    # Returns the packed rows of the given sorted variants.
+    #
+    def read_packed_rows(self, variants):
+        return np.concatenate( [ member.read_packed_rows( local ) for member, local in self.split( variants ) ] )
+
+    ##
+    # Returns the genotypes of a single variant.
+    #
+    def read_row(self, i):
+        m = int( np.searchsorted( self.starts, i, side = "right" ) ) - 1
+        return self.members[ m ].read_row( i - int( self.starts[ m ] ) )
+
+    def __iter__(self):
+        for member in self.members:
+            for row in member:
+                yield row
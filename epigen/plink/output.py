@@ -1,32 +1,210 @@
-from .plink_file import PlinkFile
+import numpy as np
+
 from .pair import PairFile
 from .case import CaseFile
 from .model import ModelFile
+from .manifest import ManifestFile
+from . import qc
+from . import memory
+from . import writer
+from . import stream as plink_stream
+
+##
+# Number of genotypes that are buffered before they are
+# handed to the writer.
+#
+BLOCK_GENOTYPES = 2**22
+
+##
+# Estimated number of bytes per genotype needed to pack and write a block.
+#
+WRITE_BYTES = 10
+
+##
+# Computes the minor allele frequency of each variant from its
+# non-missing genotypes.
+#
+# @param rows The genotypes of the variants, 3 is missing.
+#
+# @return The frequency of the less common allele of each variant,
+#         nan if all genotypes are missing.
+#
+def minor_allele_frequencies(rows):
+    observed = rows != 3
+    num_alleles = 2 * observed.sum( axis = 1 )
+    freq = np.where( observed, rows, 0 ).sum( axis = 1, dtype = np.int64 ) / np.maximum( num_alleles, 1 )
+    freq[ num_alleles == 0 ] = np.nan
+    return np.minimum( freq, 1.0 - freq )
 
 class OutputFiles:
-    def __init__(self, path, phenotype, is_binary = True, iid_prefix = "iid"):
-        self.plink_file = PlinkFile( path, phenotype, is_binary, iid_prefix )
-        self.pair_file = PairFile( path + ".pair" )
-        self.case_file = CaseFile( path + ".case" )
-        self.model_file = ModelFile( path + ".model" )
-        self.index = 1
+    ##
+    # Constructor.
+    #
+    # @param path Prefix of the output files.
+    # @param phenotype Phenotypes of all individuals.
+    # @param is_binary Determines whether phenotype should be interpreted
+    #                  as binary or not.
+    # @param iid_prefix Prefix for iids.
+    # @param frq If true the realised allele frequencies are written to .frq.
+    # @param queue_depth Number of blocks that can wait for the background
+    #                    writer, 0 writes in the calling thread.
+    # @param manifest If true the pairs are written to a binary .manifest
+    #                 instead of the .pair, .case and .model files.
+    # @param stream If set the plink file and the pairs are written as a
+    #               stream to this path or - for stdout, see stream.py.
+    # @param checkpoint If set a Checkpoint that is saved after the blocks
+    #                   have been written.
+    # @param resume_state If set the files are appended to, continuing
+    #                     from this checkpoint state.
+    # @param first_pair The number of pairs before the first pair, the
+    #                   variants of pair k are named rs{2k + 1} and rs{2k + 2}.
+    # @param append If true the pairs are appended to existing files.
+    #
+    def __init__(self, path, phenotype, is_binary = True, iid_prefix = "iid", frq = False, queue_depth = 2, manifest = False, stream = None,
+                 checkpoint = None, resume_state = None, first_pair = 0, append = False):
+        append = append or resume_state is not None
+        self.plink_file = plink_stream.open_plink_file( path, phenotype, is_binary, iid_prefix, frq, stream, append )
+        self.pheno_stats = qc.PhenotypeStats( is_binary )
+        self.pheno_stats.update( phenotype )
+
+        self.manifest_file = None
+        self.text_files = [ ]
+        if stream:
+            self.manifest_file = plink_stream.StreamManifestFile( self.plink_file.stream )
+        elif manifest:
+            self.manifest_file = ManifestFile( path + ".manifest", append = append )
+        else:
+            self.pair_file = PairFile( path + ".pair", append )
+            self.case_file = CaseFile( path + ".case", append )
+            self.model_file = ModelFile( path + ".model", append )
+            self.text_files = [ self.pair_file, self.case_file, self.model_file ]
+
+        self.index = 1 + 2 * first_pair
+        if resume_state:
+            self.plink_file.stats.set_state( resume_state[ "genotype-stats" ] )
+
+        self.checkpoint = checkpoint
+
+        # Every queued block, the block being filled and the one being
+        # written are in memory at the same time
+        num_samples = len( phenotype )
+        self.block_rows = memory.block_size( num_samples * ( queue_depth + 2 + WRITE_BYTES ), BLOCK_GENOTYPES // max( num_samples, 1 ) )
+        self.block_rows += self.block_rows % 2
+
+        self.writer = writer.BackgroundWriter( queue_depth )
+        self.new_block( )
+
+    ##
+    # Starts a new block of genotypes.
+    #
+    def new_block(self):
+        self.rows = np.empty( ( self.block_rows, self.plink_file.num_samples ), dtype = np.uint8 )
+        self.pairs = [ ]
 
     ##
     # Writes a row of genotypes to the output file.
-    # 
+    #
     def write(self, row1, row2, is_case, model_index):
-        self.plink_file.write( self.index, row1 )
-        self.plink_file.write( self.index + 1, row2 )
-        
-        pair = "rs{0} rs{1}".format( self.index, self.index + 1 )
-        self.pair_file.write( pair )
-        self.case_file.write( pair, is_case )
-        self.model_file.write( pair, model_index )
+        offset = 2 * len( self.pairs )
+        self.rows[ offset ] = row1
+        self.rows[ offset + 1 ] = row2
+        self.pairs.append( ( is_case, model_index ) )
 
         self.index += 2
+        if 2 * len( self.pairs ) == self.block_rows:
+            self.flush( )
+
+    ##
+    # Hands the buffered block to the writer.
+    #
+    def flush(self):
+        if len( self.pairs ) == 0:
+            return
+
+        first = self.index - 2 * len( self.pairs )
+        self.writer.submit( self.write_block, first, self.rows[ :2 * len( self.pairs ) ], self.pairs )
+        self.new_block( )
 
+        # The generators are at the state after the last pair of the block
+        if self.checkpoint and self.checkpoint.is_due( ):
+            self.writer.submit( self.save_checkpoint, ( self.index - 1 ) // 2, self.checkpoint.capture_random( ) )
+
+    ##
+    # Writes a block of pairs, called by the writer.
+    #
+    # @param first Index of the first variant.
+    # @param rows The genotypes of the variants.
+    # @param pairs The is_case and model index of each pair.
+    #
+    def write_block(self, first, rows, pairs):
+        self.plink_file.write_block( first, rows )
+        if self.manifest_file:
+            snps = np.arange( first, first + len( rows ) )
+            mafs = minor_allele_frequencies( rows )
+            is_case, model_index = zip( *pairs )
+            self.manifest_file.write( snps[ 0::2 ], snps[ 1::2 ], is_case, model_index, mafs[ 0::2 ], mafs[ 1::2 ] )
+            return
+
+        for j, ( is_case, model_index ) in enumerate( pairs ):
+            pair = "rs{0} rs{1}".format( first + 2 * j, first + 2 * j + 1 )
+            self.pair_file.write( pair )
+            self.case_file.write( pair, is_case )
+            self.model_file.write( pair, model_index )
+
+    ##
+    # Returns the open output files.
+    #
+    def output_files(self):
+        files = self.plink_file.files( ) + [ f.file for f in self.text_files + [ self.manifest_file ] if hasattr( f, "file" ) ]
+        if self.plink_file.stats.frq_file:
+            files.append( self.plink_file.stats.frq_file )
+
+        return files
+
+    ##
+    # Writes the files to disk and saves a checkpoint, called by the
+    # writer after the blocks before it have been written.
+    #
+    # @param num_pairs The number of pairs that have been written.
+    # @param random_state The random number generator states after the last pair.
+    #
+    def save_checkpoint(self, num_pairs, random_state):
+        if self.manifest_file:
+            self.manifest_file.flush( )
+
+        offsets = { }
+        for output_file in self.output_files( ):
+            writer.sync( output_file )
+            offsets[ output_file.name ] = output_file.tell( )
+
+        self.checkpoint.save( num_pairs, random_state, offsets, self.plink_file.stats.get_state( ) )
+
+    ##
+    # Returns the realised phenotype and genotype statistics.
+    #
+    def summary(self):
+        summary = self.pheno_stats.summary( )
+        summary.update( self.plink_file.stats.summary( ) )
+
+        return summary
+
+    ##
+    # Writes the remaining pairs and closes the files after
+    # they have been written to disk.
+    #
     def close(self):
+        self.flush( )
+        self.writer.close( )
+        self.writer.report( )
+
+        if self.manifest_file:
+            self.manifest_file.flush( )
+
+        for output_file in self.output_files( ):
+            writer.sync( output_file )
+
+        # The pairs of a stream must be sent before it ends
+        for output_file in self.text_files + [ self.manifest_file ]:
+            if output_file:
+                output_file.close( )
         self.plink_file.close( )
-        self.pair_file.close( )
-        self.case_file.close( )
-        self.model_file.close( )
@@ -6,9 +6,10 @@ class PairFile:
     # Constructor.
     #
     # @param path Path to the file.
+    # @param append If true the file is appended to.
     #
-    def __init__(self, path):
-        self.file = open( path, "w" )
+    def __init__(self, path, append = False):
+        self.file = open( path, "a" if append else "w" )
 
     ##
     # Writes a pair with the next index.
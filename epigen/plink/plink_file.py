@@ -1,4 +1,25 @@
-from plinkio import plinkfile
+import numpy as np
+
+from epigen.plink import bed
+from epigen.plink import freq
+from epigen.plink import qc
+
+##
+# Returns the lines of the .fam file of the generated samples.
+#
+# @param phenotype Phenotypes of all individuals.
+# @param is_binary Determines whether phenotype should be interpreted
+#                  as binary or not.
+# @param iid_prefix Prefix for iids.
+#
+def format_samples(phenotype, is_binary, iid_prefix = "iid"):
+    lines = [ ]
+    for i, p in enumerate( phenotype ):
+        fid = "fid{0}".format( i )
+        iid = "{0}{1}".format( iid_prefix, i )
+        lines.append( bed.format_sample( fid, iid, p, is_binary ) )
+
+    return lines
 
 class PlinkFile:
     ##
@@ -9,21 +30,27 @@ class PlinkFile:
     # @param is_binary Determines whether phenotype should be interpreted
     #                  as binary or not.
     # @param iid_prefix Prefix for iids.
+    # @param frq If true the realised allele frequencies are written to .frq.
+    # @param append If true variants are appended to an existing plink file.
     #
-    def __init__(self, path, phenotype, is_binary = True, iid_prefix = "iid"):
-        samples = [ ]
-        for i, p in enumerate( phenotype ):
-            iid = "fid{0}".format( i )
-            fid = "{0}{1}".format( iid_prefix, i )
+    def __init__(self, path, phenotype, is_binary = True, iid_prefix = "iid", frq = False, append = False):
+        self.num_samples = len( phenotype )
+        self.stats = qc.GenotypeStats( path + ".frq" if frq else None, append )
+
+        if append:
+            # The statistics also cover the variants already in the file
+            self.stats.update_counts( freq.scan_bed( bed.open_bed( path ) ) )
+
+            self.bim_file = open( path + ".bim", "a" )
+            self.bed_file = open( path + ".bed", "ab" )
+            return
 
-            if is_binary:
-                sample = plinkfile.Sample( iid, fid, "0", "0", 1, p )
-                samples.append( sample )
-            else:
-                sample = plinkfile.Sample( iid, fid, "0", "0", 1, 3, p )
-                samples.append( sample )
+        with open( path + ".fam", "w" ) as fam_file:
+            fam_file.writelines( format_samples( phenotype, is_binary, iid_prefix ) )
 
-        self.plink_file = plinkfile.create( path, samples )
+        self.bim_file = open( path + ".bim", "w" )
+        self.bed_file = open( path + ".bed", "wb" )
+        self.bed_file.write( bed.BED_MAGIC )
         self.index = 1
 
     ##
@@ -33,16 +60,52 @@ class PlinkFile:
     # @param row The genotypes.
     #
     def write(self, i, row):
-        name = "rs{0}".format( i )
-        bp_position = i
-        locus = plinkfile.Locus( 1, name, 0, i, "A", "G" )
+        self.write_block( i, [ row ] )
+
+    ##
+    # Writes a block of consecutive variants to the plink file.
+    #
+    # @param i Index of the first variant.
+    # @param rows A matrix of genotypes, one row per variant.
+    # @param loci Lines of the .bim file for each row, if not set
+    #             the variants are named by their index.
+    #
+    def write_block(self, i, rows, loci = None):
+        rows = np.asarray( rows, dtype = np.uint8 )
+        if rows.ndim == 1:
+            rows = rows[ np.newaxis, : ]
+
+        if loci is None:
+            loci = [ bed.format_locus( "rs{0}".format( i + j ), i + j ) for j in range( rows.shape[ 0 ] ) ]
 
-        self.plink_file.write_row( locus, row )
+        self.write_packed( i, loci, bed.pack_rows( rows ) )
+
+        frq_loci = None
+        if self.stats.frq_file:
+            frq_loci = [ tuple( line.split( )[ j ] for j in ( 0, 1, 4, 5 ) ) for line in loci ]
+        self.stats.update( rows, frq_loci )
+
+    ##
+    # Writes the .bim lines and packed genotypes of a block.
+    #
+    # @param i Index of the first variant.
+    # @param loci Lines of the .bim file.
+    # @param packed The packed .bed rows.
+    #
+    def write_packed(self, i, loci, packed):
+        self.bim_file.writelines( loci )
+        self.bed_file.write( packed.tobytes( ) )
+
+    ##
+    # Returns the files that should be synced to disk before closing.
+    #
+    def files(self):
+        return [ self.bim_file, self.bed_file ]
 
     ##
     # Closes the plink file.
     #
     def close(self):
-        self.plink_file.close( )
-        pass
-
+        self.bim_file.close( )
+        self.bed_file.close( )
+        self.stats.close( )
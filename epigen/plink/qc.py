@@ -0,0 +1,243 @@
+import numpy as np
+from math import erfc, sqrt
+
+##
+# Running mean and variance computed with Welford's algorithm,
+# values can be added one at a time or in blocks.
+#
+class RunningMoments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    ##
+    # Adds a single value.
+    #
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * ( x - self.mean )
+
+    ##
+    # Adds a block of values by merging its moments.
+    #
+    # @param values A sequence of values.
+    #
+    def update(self, values):
+        values = np.asarray( values, dtype = np.float64 )
+        n = len( values )
+        if n == 0:
+            return
+
+        block_mean = values.mean( )
+        block_m2 = ( ( values - block_mean )**2 ).sum( )
+
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta**2 * self.count * n / total
+        self.count = total
+
+    ##
+    # Returns the population variance.
+    #
+    def variance(self):
+        if self.count < 1:
+            return 0.0
+
+        return self.m2 / self.count
+
+##
+# Computes Hardy-Weinberg chi-square p-values (1 df) from genotype counts.
+#
+# @param counts A ( variants, 3 ) array with the counts of genotype 0, 1 and 2.
+#
+# @return An array of p-values.
+#
+def hwe_pvalue(counts):
+    counts = np.asarray( counts, dtype = np.float64 )
+    n = counts.sum( axis = 1 )
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        p = ( counts[ :, 1 ] + 2 * counts[ :, 2 ] ) / ( 2 * n )
+        expected = n[ :, np.newaxis ] * np.stack( ( ( 1 - p )**2, 2 * p * ( 1 - p ), p**2 ), axis = 1 )
+        statistic = np.where( expected > 0, ( counts - expected )**2 / expected, 0.0 ).sum( axis = 1 )
+
+    return np.array( [ erfc( sqrt( x / 2.0 ) ) for x in statistic ] )
+
+##
+# Header of a plink style .frq file.
+#
+FRQ_HEADER = "CHR\tSNP\tA1\tA2\tMAF\tNCHROBS\tP_HWE\n"
+
+##
+# Formats the lines of a plink style .frq file.
+#
+# @param loci The ( chromosome, name, allele1, allele2 ) of each variant.
+# @param minor_is_second True for the variants where the second allele is the minor.
+# @param maf The minor allele frequency of each variant.
+# @param observed The number of non-missing genotypes of each variant.
+# @param hwe The Hardy-Weinberg p-value of each variant.
+#
+# @return A list of lines.
+#
+def format_frq(loci, minor_is_second, maf, observed, hwe):
+    lines = [ ]
+    for ( chromosome, name, allele1, allele2 ), second, f, n, p in zip( loci, np.asarray( minor_is_second ).tolist( ), np.asarray( maf ).tolist( ), np.asarray( observed ).tolist( ), np.asarray( hwe ).tolist( ) ):
+        if second:
+            allele1, allele2 = allele2, allele1
+
+        lines.append( "{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\n".format( chromosome, name, allele1, allele2, f, 2 * n, p ) )
+
+    return lines
+
+##
+# Accumulates genotype counts of the variants that are written
+# and optionally writes them to a plink style .frq file.
+#
+class GenotypeStats:
+    ##
+    # Constructor.
+    #
+    # @param frq_path If set, per-variant frequencies are written to this path.
+    # @param append If true the .frq file is appended to.
+    #
+    def __init__(self, frq_path = None, append = False):
+        self.num_variants = 0
+        self.num_genotypes = 0
+        self.num_missing = 0
+        self.maf = RunningMoments( )
+        self.maf_min = None
+        self.maf_max = None
+        self.hwe_failures = 0
+
+        self.frq_file = None
+        if frq_path and append:
+            self.frq_file = open( frq_path, "a" )
+        elif frq_path:
+            self.frq_file = open( frq_path, "w" )
+            self.frq_file.write( FRQ_HEADER )
+
+    ##
+    # Updates the statistics with a block of variants.
+    #
+    # @param rows A matrix of genotypes with one row per variant.
+    # @param loci The ( chromosome, name, allele1, allele2 ) of each row,
+    #             only needed if a .frq file is written.
+    #
+    def update(self, rows, loci = None):
+        rows = np.asarray( rows )
+        self.update_counts( np.stack( [ ( rows == g ).sum( axis = 1 ) for g in range( 4 ) ], axis = 1 ), loci )
+
+    ##
+    # Updates the statistics with the genotype counts of a block of
+    # variants.
+    #
+    # @param counts A matrix with the counts of genotype 0, 1, 2 and
+    #               missing for each variant.
+    # @param loci The ( chromosome, name, allele1, allele2 ) of each row,
+    #             if not set nothing is written to the .frq file.
+    #
+    def update_counts(self, counts, loci = None):
+        counts = np.asarray( counts, dtype = np.int64 )
+        observed = counts[ :, :3 ].sum( axis = 1 )
+        with np.errstate( divide = "ignore", invalid = "ignore" ):
+            freq = np.where( observed > 0, ( counts[ :, 1 ] + 2.0 * counts[ :, 2 ] ) / ( 2 * observed ), 0.0 )
+        hwe = hwe_pvalue( counts[ :, :3 ] )
+
+        # The genotypes count the second allele of the .bim file, which
+        # is swapped when it is the major allele as in plink
+        minor_is_second = freq <= 0.5
+        freq = np.minimum( freq, 1.0 - freq )
+
+        self.num_variants += counts.shape[ 0 ]
+        self.num_genotypes += int( counts.sum( ) )
+        self.num_missing += int( counts[ :, 3 ].sum( ) )
+        self.maf.update( freq )
+        self.hwe_failures += int( ( hwe < 1e-6 ).sum( ) )
+        if len( freq ) > 0:
+            self.maf_min = float( freq.min( ) ) if self.maf_min is None else min( self.maf_min, float( freq.min( ) ) )
+            self.maf_max = float( freq.max( ) ) if self.maf_max is None else max( self.maf_max, float( freq.max( ) ) )
+
+        if self.frq_file and loci is not None:
+            self.frq_file.writelines( format_frq( loci, minor_is_second, freq, observed, hwe ) )
+
+    ##
+    # Returns the realised statistics as a dict.
+    #
+    def summary(self):
+        return { "num-variants" : self.num_variants,
+                 "maf-mean" : self.maf.mean,
+                 "maf-min" : self.maf_min,
+                 "maf-max" : self.maf_max,
+                 "missing-rate" : float( self.num_missing ) / max( self.num_genotypes, 1 ),
+                 "hwe-failures" : self.hwe_failures }
+
+    ##
+    # Returns the accumulated counts, without the .frq file.
+    #
+    def get_state(self):
+        return dict( ( k, v ) for k, v in vars( self ).items( ) if k != "frq_file" )
+
+    ##
+    # Restores the counts returned by get_state.
+    #
+    def set_state(self, state):
+        vars( self ).update( state )
+
+    ##
+    # Closes the .frq file if one is written.
+    #
+    def close(self):
+        if self.frq_file:
+            self.frq_file.close( )
+
+##
+# Accumulates the realised phenotype statistics.
+#
+class PhenotypeStats:
+    ##
+    # Constructor.
+    #
+    # @param is_binary If true the number of cases and controls are counted.
+    #
+    def __init__(self, is_binary):
+        self.is_binary = is_binary
+        self.moments = RunningMoments( )
+        self.num_missing = 0
+        self.num_cases = 0
+        self.num_controls = 0
+
+    ##
+    # Adds the phenotype of a single sample, None or -9 is missing.
+    #
+    def add(self, pheno):
+        if pheno is None or pheno == -9:
+            self.num_missing += 1
+            return
+
+        self.moments.add( pheno )
+        if self.is_binary:
+            self.num_cases += int( pheno == 1 )
+            self.num_controls += int( pheno == 0 )
+
+    ##
+    # Adds the phenotypes of several samples.
+    #
+    def update(self, phenotype):
+        for p in phenotype:
+            self.add( p )
+
+    ##
+    # Returns the realised statistics as a dict.
+    #
+    def summary(self):
+        summary = { "pheno-mean" : self.moments.mean,
+                    "pheno-variance" : self.moments.variance( ),
+                    "pheno-missing" : self.num_missing }
+        if self.is_binary:
+            summary[ "num-cases" ] = self.num_cases
+            summary[ "num-controls" ] = self.num_controls
+
+        return summary
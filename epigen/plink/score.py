@@ -0,0 +1,151 @@
+##
+# Computes the linear predictor sum_i beta_i * ( g_i - mu_i ) / sd_i of
+# every sample over any number of variants, directly from the packed
+# .bed rows. For each variant a table holds the partial score of each
+# of the four genotypes of every possible byte, so a block of rows is
+# scored by looking up its bytes and summing over the variants. Blocks
+# of variants are scored by a pool of threads and their partial sums
+# are added at the end.
+#
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from epigen.plink import bed
+from epigen.plink import freq
+from epigen.plink import memory
+from epigen.plink.subset import SubsetPlinkFile
+
+##
+# The four genotypes of each byte as floats, missing is 0.
+#
+BYTE_GENOTYPES = np.where( bed.BYTE_TO_GENOTYPES == 3, 0, bed.BYTE_TO_GENOTYPES ).astype( np.float64 )
+
+##
+# True for the missing genotypes of each byte.
+#
+BYTE_IS_MISSING = bed.BYTE_TO_GENOTYPES == 3
+
+##
+# Default number of partial scores looked up at once.
+#
+BLOCK_SCORES = 2**24
+
+##
+# Estimated number of bytes per sample and variant in a block, the
+# looked up partial scores and the missing flags.
+#
+SCORE_BYTES = 10
+
+##
+# Each variant also has a table of 256 x 4 partial scores, so blocks
+# are sized as if there were at least this many samples.
+#
+TABLE_SAMPLES = 4096
+
+##
+# Computes the mean and standard deviation of the genotypes of packed
+# rows, assuming Hardy-Weinberg equilibrium as in the usual
+# standardization 2p and sqrt( 2p( 1 - p ) ).
+#
+# @param packed A uint8 matrix of packed rows.
+# @param num_samples The number of samples.
+# @param padded If false the rows are masked, see freq.count_packed.
+#
+# @return A tuple ( mean, standard deviation ) of arrays.
+#
+def genotype_moments(packed, num_samples, padded = True):
+    counts = freq.count_packed( packed, num_samples, padded )
+    observed = counts[ :, :3 ].sum( axis = 1 )
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        p = np.where( observed > 0, ( counts[ :, 1 ] + 2.0 * counts[ :, 2 ] ) / ( 2 * observed ), 0.0 )
+
+    std = np.sqrt( 2 * p * ( 1 - p ) )
+    return 2 * p, np.where( std < 1e-10, 1.0, std )
+
+##
+# Scores a block of packed rows.
+#
+# @param packed A uint8 matrix of packed rows.
+# @param weights The beta divided by the standard deviation of each row.
+# @param offsets The mean of each row.
+#
+# @return A tuple ( scores, missing ) with one element per genotype
+#         of the rows, including the unused ones of the last byte.
+#
+def score_block(packed, weights, offsets):
+    tables = weights[ :, np.newaxis, np.newaxis ] * ( BYTE_GENOTYPES[ np.newaxis ] - offsets[ :, np.newaxis, np.newaxis ] )
+    tables[ :, BYTE_IS_MISSING ] = 0.0
+
+    rows = np.arange( len( packed ) )[ :, np.newaxis ]
+    scores = tables[ rows, packed ].sum( axis = 0 ).reshape( -1 )
+    missing = BYTE_IS_MISSING[ packed ].any( axis = 0 ).reshape( -1 )
+
+    return scores, missing
+
+##
+# Computes the linear predictor of every sample.
+#
+# @param plink_file An opened plink file, see cache.open_plink and
+#                   subset.open_subset.
+# @param variants The indices of the variants.
+# @param beta The effect of each variant.
+# @param standardize If true the genotypes are centered and scaled by
+#                    2p and sqrt( 2p( 1 - p ) ) of the samples,
+#                    otherwise the genotypes are used as they are.
+# @param threads The number of threads, by default one per cpu.
+#
+# @return An array with the linear predictor without intercept of each
+#         sample, samples with a missing genotype are nan.
+#
+def compute_scores(plink_file, variants, beta, standardize = False, threads = None):
+    if threads is None:
+        threads = os.cpu_count( ) or 1
+
+    variants = np.asarray( variants, dtype = np.int64 )
+    beta = np.asarray( beta, dtype = np.float64 )
+    num_samples = len( plink_file.get_samples( ) )
+
+    # A subset is scored over the kept bytes of the whole file
+    mask = None
+    if isinstance( plink_file, SubsetPlinkFile ):
+        mask = plink_file.mask
+        variants = plink_file.get_loci( ).variants[ variants ]
+        plink_file = plink_file.plink_file
+
+    order = np.argsort( variants, kind = "mergesort" )
+    variants = variants[ order ]
+    beta = beta[ order ]
+
+    row_samples = 4 * ( len( mask.columns ) if mask is not None else bed.bytes_per_row( num_samples ) )
+    block_size = memory.block_size( SCORE_BYTES * max( row_samples, TABLE_SAMPLES ), BLOCK_SCORES // max( row_samples, TABLE_SAMPLES ) )
+
+    def score_variants(start):
+        stop = min( start + block_size, len( variants ) )
+        packed = plink_file.read_packed_rows( variants[ start:stop ] )
+        if mask is not None:
+            packed = mask.apply( packed )
+
+        offsets = np.zeros( stop - start )
+        std = np.ones( stop - start )
+        if standardize:
+            offsets, std = genotype_moments( packed, num_samples, mask is None )
+
+        return score_block( packed, beta[ start:stop ] / std, offsets )
+
+    starts = range( 0, len( variants ), block_size )
+    if threads <= 1 or len( starts ) <= 1:
+        partial = [ score_variants( start ) for start in starts ]
+    else:
+        with ThreadPoolExecutor( max_workers = threads ) as executor:
+            partial = list( executor.map( score_variants, starts ) )
+
+    scores = np.zeros( row_samples )
+    missing = np.zeros( row_samples, dtype = bool )
+    for block_scores, block_missing in partial:
+        scores += block_scores
+        missing |= block_missing
+
+    positions = mask.positions if mask is not None else np.arange( num_samples )
+    return np.where( missing[ positions ], np.nan, scores[ positions ] )
@@ -0,0 +1,130 @@
+##
+# Selects causal variants that satisfy constraints on their minor allele
+# frequency, chromosome, distance to each other and names. The variants
+# in a frequency range of each chromosome are a contiguous range of the
+# selection index of the frequency cache, see freq.py, so they are found
+# by binary search. The variants are then drawn from these ranges
+# without replacement until enough of them also satisfy the distance
+# and exclusion constraints, without visiting the other variants.
+#
+import random
+
+import numpy as np
+
+from epigen.plink import index
+from epigen.plink.freq import counts_maf
+
+##
+# The constraints on the causal variants.
+#
+class CausalConstraints:
+    ##
+    # Constructor.
+    #
+    # @param min_maf The smallest minor allele frequency.
+    # @param max_maf The largest minor allele frequency.
+    # @param chromosomes The names of the allowed chromosomes, or None for any.
+    # @param min_distance The smallest distance in base pairs between two
+    #                     causal variants on the same chromosome.
+    # @param exclude Names of variants that can not be causal.
+    #
+    def __init__(self, min_maf = 0.0, max_maf = 0.5, chromosomes = None, min_distance = 0, exclude = None):
+        self.min_maf = min_maf
+        self.max_maf = max_maf
+        self.chromosomes = chromosomes
+        self.min_distance = min_distance
+        self.exclude = exclude
+
+    ##
+    # Returns true if any variant can be causal.
+    #
+    def is_empty(self):
+        return ( self.min_maf <= 0.0 and self.max_maf >= 0.5 and not self.chromosomes and
+                 self.min_distance <= 0 and not self.exclude )
+
+##
+# Reads variant names from a file, the first column of each line.
+#
+def read_names(path):
+    names = [ ]
+    with open( path, "r" ) as name_file:
+        for line in name_file:
+            fields = line.split( )
+            if len( fields ) > 0:
+                names.append( fields[ 0 ] )
+
+    return names
+
+##
+# Returns the ranges of the selection index that are in the frequency
+# range on the allowed chromosomes.
+#
+# @param keys The sorted selection keys.
+# @param chromosome_names The name of each chromosome code.
+# @param constraints The CausalConstraints.
+#
+# @return A list of ( start, end ) of the non-empty ranges.
+#
+# @raises ValueError if a chromosome of the constraints is not in the file.
+#
+def find_ranges(keys, chromosome_names, constraints):
+    if constraints.chromosomes:
+        codes = np.array( index.find_chromosomes( chromosome_names, constraints.chromosomes ), dtype = np.float64 )
+    else:
+        codes = np.arange( len( chromosome_names ), dtype = np.float64 )
+
+    starts = np.searchsorted( keys, codes + constraints.min_maf, side = "left" )
+    ends = np.searchsorted( keys, codes + min( constraints.max_maf, 0.5 ), side = "right" )
+
+    return [ ( int( a ), int( b ) ) for a, b in zip( starts, ends ) if b > a ]
+
+##
+# Randomly selects n causal variants that satisfy the constraints.
+#
+# @param plink_file An opened IndexedPlinkFile.
+# @param n The number of variants.
+# @param constraints The CausalConstraints.
+#
+# @return The indices of the selected variants.
+#
+def select_causal(plink_file, n, constraints):
+    stats = plink_file.get_frequencies( )
+    loci = plink_file.get_loci( )
+    exclude = set( loci.find( constraints.exclude ) ) if constraints.exclude else set( )
+
+    ranges = find_ranges( stats.keys, loci.chromosome_names, constraints )
+    ends = np.cumsum( [ b - a for a, b in ranges ] ).tolist( )
+    total = ends[ -1 ] if ranges else 0
+
+    # Draws from the concatenated ranges without replacement by a
+    # Fisher-Yates shuffle that only stores the swapped positions
+    swapped = { }
+    selected = [ ]
+    for i in range( total ):
+        if len( selected ) == n:
+            break
+
+        j = random.randrange( i, total )
+        k = swapped.get( j, j )
+        swapped[ j ] = swapped.get( i, i )
+
+        r = int( np.searchsorted( ends, k, side = "right" ) )
+        start = ranges[ r ][ 0 ] + k - ( ends[ r - 1 ] if r > 0 else 0 )
+        v = int( stats.order[ start ] )
+        if v in exclude:
+            continue
+
+        # The keys are rounded, so the frequency is checked exactly
+        maf = counts_maf( stats.counts[ v:v + 1 ] )[ 0 ]
+        if maf < constraints.min_maf or maf > constraints.max_maf:
+            continue
+
+        if constraints.min_distance > 0 and any( loci.chromosomes[ u ] == loci.chromosomes[ v ] and abs( int( loci.positions[ u ] ) - int( loci.positions[ v ] ) ) < constraints.min_distance for u in selected ):
+            continue
+
+        selected.append( v )
+
+    if len( selected ) < n:
+        raise ValueError( "Only {0} variants satisfy the constraints on the causal variants, {1} are needed.".format( len( selected ), n ) )
+
+    return selected
@@ -0,0 +1,85 @@
+##
+# Splits a run into shards that can be generated by independent jobs
+# and merged afterwards. Every shard first draws the parts that are
+# shared by the whole run (the phenotype, sampled models and ancestry)
+# from the common --seed, and then reseeds with a seed derived from the
+# shard before it generates its own slice of the variants or pairs.
+#
+import random
+
+import numpy as np
+
+##
+# The seed given to --seed, or None if the generators are not seeded.
+#
+seed = None
+
+##
+# Seeds the random number generators of the whole run.
+#
+# @param value The seed or None to leave the generators as they are.
+#
+def set_seed(value):
+    global seed
+
+    seed = value
+    if value is not None:
+        random.seed( value )
+        np.random.seed( value )
+
+##
+# Parses a shard such as 3/8, the third of eight shards.
+#
+# @param value The shard as a string i/N with 1 <= i <= N.
+#
+# @return A tuple ( i, N ).
+#
+def parse_shard(value):
+    parts = value.split( "/" )
+    if len( parts ) != 2:
+        raise ValueError( "The shard must be given as i/N: {0}".format( value ) )
+
+    index, count = int( parts[ 0 ] ), int( parts[ 1 ] )
+    if not 1 <= index <= count:
+        raise ValueError( "The shard index must be between 1 and {0}: {1}".format( count, value ) )
+
+    if seed is None:
+        raise ValueError( "--shard requires --seed, so that all shards share the same samples." )
+
+    return ( index, count )
+
+##
+# Returns the part of a range that belongs to a shard, the ranges of
+# the shards are consecutive and differ by at most one in length.
+#
+# @param n The length of the whole range.
+# @param shard A tuple ( i, N ) or None for the whole range.
+#
+# @return A tuple ( start, end ).
+#
+def shard_range(n, shard):
+    if shard is None:
+        return 0, n
+
+    index, count = shard
+    return n * ( index - 1 ) // count, n * index // count
+
+##
+# Reseeds the random number generators for the slice of a shard.
+#
+# @param shard A tuple ( i, N ) or None, which leaves them as they are.
+#
+def seed_shard(shard):
+    if shard is None:
+        return
+
+    shard_seed = int( np.random.SeedSequence( [ seed, shard[ 0 ], shard[ 1 ] ] ).generate_state( 1 )[ 0 ] )
+    random.seed( shard_seed )
+    np.random.seed( shard_seed )
+
+##
+# Returns true if the shard should write the outputs that are the same
+# for every shard, such as the relationship matrix.
+#
+def is_first(shard):
+    return shard is None or shard[ 0 ] == 1
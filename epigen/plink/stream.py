@@ -0,0 +1,258 @@
+##
+# Writes generated data as a single stream of frames, so that it can be
+# sent to stdout or a named pipe and read by another program while it
+# is generated, without writing the plink files to disk.
+#
+# The stream starts with the magic bytes followed by frames. Each frame
+# is a 4 byte tag and the length of the payload as an unsigned 64-bit
+# little-endian integer, followed by the payload:
+#
+#   FAM   The lines of the .fam file, sent once before any variants.
+#   BIM   The lines of the .bim file for a block of variants.
+#   BED   The index of the first variant and the number of variants as
+#         unsigned 64-bit integers, followed by the packed SNP-major .bed
+#         rows of the block ( ( samples + 3 ) / 4 bytes per variant ).
+#   PAIR  A block of pairs in the same format as a block of a .manifest.
+#   END   Empty, the stream is complete.
+#
+# The BIM frame of a block is always sent before its BED frame, and the
+# PAIR frame after the variants it refers to.
+#
+import struct
+import sys
+
+from .plink_file import PlinkFile, format_samples
+from .manifest import ManifestFile, MANIFEST_MAGIC, MANIFEST_COLUMNS
+from . import bed
+from . import qc
+
+##
+# The first bytes of a stream.
+#
+STREAM_MAGIC = b"EPGSTR01"
+
+##
+# The tags of the frames.
+#
+FAM_FRAME = b"FAM "
+BIM_FRAME = b"BIM "
+BED_FRAME = b"BED "
+PAIR_FRAME = b"PAIR"
+END_FRAME = b"END "
+
+##
+# The header of each frame, the tag and the length of the payload.
+#
+FRAME_HEADER = struct.Struct( "<4sQ" )
+
+##
+# The header of the payload of a BED frame.
+#
+BED_HEADER = struct.Struct( "<QQ" )
+
+##
+# Writes frames to stdout or a file, which can be a named pipe.
+# A write waits when the reader is slower than the generator, which in
+# turn makes the generator wait on the queue of the background writer.
+#
+class StreamWriter:
+    ##
+    # Constructor.
+    #
+    # @param path Path to the file or - for stdout.
+    #
+    def __init__(self, path):
+        self.is_stdout = path == "-"
+        if self.is_stdout:
+            self.file = getattr( sys.stdout, "buffer", sys.stdout )
+        else:
+            self.file = open( path, "wb" )
+
+        self.file.write( STREAM_MAGIC )
+
+    ##
+    # Writes a frame.
+    #
+    # @param tag The tag of the frame.
+    # @param parts The payload, as a list of bytes that are concatenated.
+    #
+    def write_frame(self, tag, parts = ( )):
+        self.file.write( FRAME_HEADER.pack( tag, sum( len( p ) for p in parts ) ) )
+        for part in parts:
+            self.file.write( part )
+
+        self.file.flush( )
+
+    ##
+    # Ends the stream and closes the file.
+    #
+    def close(self):
+        self.write_frame( END_FRAME )
+        if not self.is_stdout:
+            self.file.close( )
+
+##
+# A plink file that is written to a stream instead of to disk.
+#
+class StreamPlinkFile(PlinkFile):
+    ##
+    # Constructor.
+    #
+    # @param path Prefix of the .frq file.
+    # @param stream Path to the stream or - for stdout.
+    # @param phenotype Phenotypes of all individuals.
+    # @param is_binary Determines whether phenotype should be interpreted
+    #                  as binary or not.
+    # @param iid_prefix Prefix for iids.
+    # @param frq If true the realised allele frequencies are written to .frq.
+    #
+    def __init__(self, path, stream, phenotype, is_binary = True, iid_prefix = "iid", frq = False):
+        self.num_samples = len( phenotype )
+        self.stats = qc.GenotypeStats( path + ".frq" if frq else None )
+
+        self.stream = StreamWriter( stream )
+        self.stream.write_frame( FAM_FRAME, [ "".join( format_samples( phenotype, is_binary, iid_prefix ) ).encode( "utf-8" ) ] )
+
+    def write_packed(self, i, loci, packed):
+        self.stream.write_frame( BIM_FRAME, [ "".join( loci ).encode( "utf-8" ) ] )
+        self.stream.write_frame( BED_FRAME, [ BED_HEADER.pack( i, packed.shape[ 0 ] ), packed.tobytes( ) ] )
+
+    def files(self):
+        return [ ]
+
+    def close(self):
+        self.stream.close( )
+        self.stats.close( )
+
+##
+# Writes blocks of pairs to a stream in the format of a manifest.
+#
+class StreamManifestFile(ManifestFile):
+    ##
+    # Constructor.
+    #
+    # @param stream A StreamWriter.
+    #
+    def __init__(self, stream):
+        self.stream = stream
+
+        # Every block of pairs is sent as soon as it is written
+        self.block_pairs = 0
+        self.columns = dict( ( name, [ ] ) for name, dtype in MANIFEST_COLUMNS )
+        self.num_buffered = 0
+
+    def write_packed(self, data):
+        self.stream.write_frame( PAIR_FRAME, [ data ] )
+
+    def close(self):
+        self.flush( )
+
+##
+# Opens a plink file for writing, either on disk or as a stream.
+#
+# @param path Prefix of the plink file.
+# @param phenotype Phenotypes of all individuals.
+# @param is_binary Determines whether phenotype should be interpreted
+#                  as binary or not.
+# @param iid_prefix Prefix for iids.
+# @param frq If true the realised allele frequencies are written to .frq.
+# @param stream If set the plink file is written to this path or - for
+#               stdout instead of to path.
+# @param append If true variants are appended to an existing plink file
+#               (not for streams).
+#
+# @return A PlinkFile or StreamPlinkFile.
+#
+def open_plink_file(path, phenotype, is_binary = True, iid_prefix = "iid", frq = False, stream = None, append = False):
+    if stream:
+        return StreamPlinkFile( path, stream, phenotype, is_binary, iid_prefix, frq )
+    else:
+        return PlinkFile( path, phenotype, is_binary, iid_prefix, frq, append )
+
+##
+# Reads the frames of a stream.
+#
+class StreamReader:
+    ##
+    # Constructor.
+    #
+    # @param path Path to the stream or - for stdin.
+    #
+    def __init__(self, path):
+        self.is_stdin = path == "-"
+        if self.is_stdin:
+            self.file = getattr( sys.stdin, "buffer", sys.stdin )
+        else:
+            self.file = open( path, "rb" )
+
+        if self.read_exactly( len( STREAM_MAGIC ) ) != STREAM_MAGIC:
+            raise ValueError( "{0} is not an epigen stream.".format( path ) )
+
+    ##
+    # Reads a number of bytes, raises an error if the stream ends before.
+    #
+    def read_exactly(self, size):
+        data = self.file.read( size )
+        if len( data ) < size:
+            raise ValueError( "The stream ended unexpectedly." )
+
+        return data
+
+    ##
+    # Iterates over the frames until the END frame.
+    #
+    # @return An iterator over tuples ( tag, payload ).
+    #
+    def frames(self):
+        while True:
+            tag, length = FRAME_HEADER.unpack( self.read_exactly( FRAME_HEADER.size ) )
+            if tag == END_FRAME:
+                break
+
+            yield tag, self.read_exactly( length )
+
+    ##
+    # Closes the stream.
+    #
+    def close(self):
+        if not self.is_stdin:
+            self.file.close( )
+
+##
+# Writes a stream to a plink file, and the pairs to a .manifest.
+#
+# @param path Path to the stream or - for stdin.
+# @param output_prefix The files are written to this prefix.
+#
+# @return The number of variants and pairs.
+#
+def write_files(path, output_prefix):
+    reader = StreamReader( path )
+    num_variants = 0
+    num_pairs = 0
+    manifest_file = None
+    with open( output_prefix + ".fam", "wb" ) as fam_file, open( output_prefix + ".bim", "wb" ) as bim_file, open( output_prefix + ".bed", "wb" ) as bed_file:
+        bed_file.write( bed.BED_MAGIC )
+        for tag, payload in reader.frames( ):
+            if tag == FAM_FRAME:
+                fam_file.write( payload )
+            elif tag == BIM_FRAME:
+                bim_file.write( payload )
+            elif tag == BED_FRAME:
+                first, count = BED_HEADER.unpack_from( payload )
+                bed_file.write( payload[ BED_HEADER.size: ] )
+                num_variants += count
+            elif tag == PAIR_FRAME:
+                if manifest_file is None:
+                    manifest_file = open( output_prefix + ".manifest", "wb" )
+                    manifest_file.write( MANIFEST_MAGIC )
+
+                manifest_file.write( payload )
+                num_pairs += struct.unpack_from( "<Q", payload )[ 0 ]
+
+    if manifest_file:
+        manifest_file.close( )
+
+    reader.close( )
+
+    return num_variants, num_pairs
@@ -0,0 +1,236 @@
+##
+# A view of a subset of the samples and variants of an indexed plink
+# file, given by --keep, --extract and --exclude. The subset is resolved
+# against the metadata index once and is never written to disk. The kept
+# samples are turned into a mask of the bits of each byte column of the
+# .bed rows, so that rows and genotype counts are computed from only the
+# bytes that hold a kept sample.
+#
+import numpy as np
+
+from epigen.plink import bed
+from epigen.plink import freq
+from epigen.plink.select import read_names
+
+##
+# The bytes and bits of the packed .bed rows that hold a set of samples.
+#
+class SampleMask:
+    ##
+    # Constructor.
+    #
+    # @param samples The sorted indices of the kept samples.
+    #
+    def __init__(self, samples):
+        samples = np.asarray( samples, dtype = np.int64 )
+        self.num_samples = len( samples )
+
+        # The byte column of each sample and the position of its
+        # genotype in the unpacked kept columns
+        self.columns, column_index = np.unique( samples // 4, return_inverse = True )
+        self.positions = 4 * column_index.ravel( ) + samples % 4
+
+        self.bits = np.zeros( len( self.columns ), dtype = np.uint8 )
+        np.bitwise_or.at( self.bits, column_index.ravel( ), ( 3 << ( 2 * ( samples % 4 ) ) ).astype( np.uint8 ) )
+
+    ##
+    # Returns the kept bytes of packed rows with the genotypes of the
+    # other samples cleared.
+    #
+    def apply(self, packed):
+        return packed[ :, self.columns ] & self.bits
+
+    ##
+    # Returns the genotypes of the kept samples of packed rows.
+    #
+    def unpack(self, packed):
+        return bed.BYTE_TO_GENOTYPES[ packed[ :, self.columns ] ].reshape( packed.shape[ 0 ], -1 )[ :, self.positions ]
+
+##
+# Reads the samples of a plink style --keep file, the family and
+# individual id of each line.
+#
+def read_keep(path):
+    samples = [ ]
+    with open( path, "r" ) as keep_file:
+        for line in keep_file:
+            fields = line.split( )
+            if len( fields ) >= 2:
+                samples.append( ( fields[ 0 ], fields[ 1 ] ) )
+
+    return samples
+
+##
+# The variants of a subset, as a sequence of Locus.
+#
+class SubsetLoci:
+    ##
+    # Constructor.
+    #
+    # @param loci The IndexedLoci of the whole file.
+    # @param variants The sorted indices of the kept variants.
+    #
+    def __init__(self, loci, variants):
+        self.loci = loci
+        self.variants = variants
+        self.chromosome_names = loci.chromosome_names
+        self.chromosomes = np.asarray( loci.chromosomes )[ variants ]
+        self.positions = np.asarray( loci.positions )[ variants ]
+
+    def __len__(self):
+        return len( self.variants )
+
+    def __getitem__(self, i):
+        return self.loci[ int( self.variants[ i ] ) ]
+
+    def __iter__(self):
+        for i in range( len( self.variants ) ):
+            yield self[ i ]
+
+    ##
+    # Returns the index in the subset of each of the given names that
+    # is present.
+    #
+    def find(self, names):
+        found = np.asarray( self.loci.find( names ), dtype = np.int64 )
+        found = found[ np.isin( found, self.variants ) ]
+        return np.searchsorted( self.variants, found ).tolist( )
+
+##
+# The samples of a subset, as a sequence of Sample.
+#
+class SubsetSamples:
+    ##
+    # Constructor.
+    #
+    # @param samples The IndexedSamples of the whole file.
+    # @param kept The sorted indices of the kept samples.
+    #
+    def __init__(self, samples, kept):
+        self.samples = samples
+        self.kept = kept
+
+    def __len__(self):
+        return len( self.kept )
+
+    def __getitem__(self, i):
+        return self.samples[ int( self.kept[ i ] ) ]
+
+    def __iter__(self):
+        for i in range( len( self.kept ) ):
+            yield self[ i ]
+
+    ##
+    # Returns the position of a sample in the subset given its iid, or -1.
+    #
+    def find(self, iid):
+        i = self.samples.find( iid )
+        k = int( np.searchsorted( self.kept, i ) )
+        return k if i >= 0 and k < len( self.kept ) and self.kept[ k ] == i else -1
+
+##
+# A subset of the samples and variants of an IndexedPlinkFile or a
+# MultiPlinkFile.
+#
+class SubsetPlinkFile:
+    ##
+    # Constructor.
+    #
+    # @param plink_file The IndexedPlinkFile or MultiPlinkFile.
+    # @param samples The sorted indices of the kept samples, or None for all.
+    # @param variants The sorted indices of the kept variants, or None for all.
+    #
+    def __init__(self, plink_file, samples = None, variants = None):
+        self.plink_file = plink_file
+        self.mask = SampleMask( samples ) if samples is not None else None
+        if samples is None:
+            samples = np.arange( len( plink_file.get_samples( ) ) )
+        if variants is None:
+            variants = np.arange( len( plink_file.get_loci( ) ) )
+
+        self.samples = SubsetSamples( plink_file.get_samples( ), np.asarray( samples, dtype = np.int64 ) )
+        self.loci = SubsetLoci( plink_file.get_loci( ), np.asarray( variants, dtype = np.int64 ) )
+        self.frequencies = None
+
+    def get_samples(self):
+        return self.samples
+
+    def get_loci(self):
+        return self.loci
+
+    ##
+    # Returns the genotype counts of the kept samples for every kept
+    # variant. Without --keep they are taken from the frequency cache of
+    # the whole file, otherwise the kept bytes are counted.
+    #
+    def get_frequencies(self):
+        if self.frequencies is not None:
+            return self.frequencies
+
+        if self.mask is None:
+            counts = self.plink_file.get_frequencies( ).counts[ self.loci.variants ]
+        else:
+            counts = self.plink_file.count_genotypes( self.mask, self.loci.variants )
+
+        keys, order = freq.make_selection( counts, self.loci.chromosomes )
+        self.frequencies = freq.VariantStats( counts, keys, order )
+        return self.frequencies
+
+    ##
+    # Returns the genotypes of the kept samples of a single kept variant.
+    #
+    def read_row(self, i):
+        v = int( self.loci.variants[ i ] )
+        if self.mask is None:
+            return self.plink_file.read_row( v )
+
+        return self.mask.unpack( self.plink_file.read_packed( v, v + 1 ) )[ 0 ]
+
+    def __iter__(self):
+        for i in range( len( self.loci ) ):
+            yield self.read_row( i )
+
+##
+# Restricts a plink file to the samples and variants given by --keep,
+# --extract and --exclude.
+#
+# @param plink_file An opened IndexedPlinkFile or MultiPlinkFile.
+# @param keep Path to a file with the family and individual id of the
+#             samples to keep, or None to keep all.
+# @param extract Path to a file with the names of the variants to keep,
+#                or None to keep all.
+# @param exclude Path to a file with the names of the variants to remove,
+#                or None.
+#
+# @return The plink file itself if no filter is given, otherwise a
+#         SubsetPlinkFile.
+#
+def open_subset(plink_file, keep = None, extract = None, exclude = None):
+    if not keep and not extract and not exclude:
+        return plink_file
+
+    samples = None
+    if keep:
+        all_samples = plink_file.get_samples( )
+        kept = set( )
+        for fid, iid in read_keep( keep ):
+            i = all_samples.find_pair( fid, iid )
+            if i >= 0:
+                kept.add( i )
+
+        if len( kept ) == 0:
+            raise ValueError( "None of the samples in {0} are in the plink file.".format( keep ) )
+
+        samples = sorted( kept )
+
+    loci = plink_file.get_loci( )
+    variants = np.arange( len( loci ) )
+    if extract:
+        variants = np.asarray( loci.find( read_names( extract ) ), dtype = np.int64 )
+    if exclude:
+        variants = np.setdiff1d( variants, np.asarray( loci.find( read_names( exclude ) ), dtype = np.int64 ) )
+
+    if len( variants ) == 0:
+        raise ValueError( "No variants are left after --extract and --exclude." )
+
+    return SubsetPlinkFile( plink_file, samples, variants )
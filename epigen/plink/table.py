@@ -0,0 +1,37 @@
+##
+# Helper class that writes the case and control genotype
+# counts of a list of pairs.
+#
+class TableFile:
+    ##
+    # Constructor, writes the header.
+    #
+    # @param path Path to the file.
+    #
+    def __init__(self, path):
+        self.file = open( path, "w" )
+
+        cells = [ "{0}{1}".format( i, j ) for i in range( 3 ) for j in range( 3 ) ]
+        columns = [ "snp1", "snp2" ] + [ "case" + c for c in cells ] + [ "control" + c for c in cells ]
+        self.file.write( "\t".join( columns ) + "\n" )
+
+    ##
+    # Writes the counts of a block of pairs, the cells are
+    # ordered row-wise in the same way as the penetrance.
+    #
+    # @param pairs List of pairs.
+    # @param case_counts A ( pairs, 9 ) array of counts in cases.
+    # @param control_counts A ( pairs, 9 ) array of counts in controls.
+    #
+    def write(self, pairs, case_counts, control_counts):
+        lines = [ ]
+        for pair, case, control in zip( pairs, case_counts.tolist( ), control_counts.tolist( ) ):
+            lines.append( "{0}\t{1}\t{2}\n".format( pair.replace( " ", "\t" ), "\t".join( map( str, case ) ), "\t".join( map( str, control ) ) ) )
+
+        self.file.writelines( lines )
+
+    ##
+    # Closes the file.
+    #
+    def close(self):
+        self.file.close( )
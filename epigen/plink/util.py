@@ -1,10 +1,18 @@
 import random
+import numpy as np
+
+from epigen.plink import kernels
+from epigen.plink import select
 
 ##
 # Given a list of variant names this function finds
 # the corresponding genotypes and returns them.
 #
 def find_rows(plink_file, loci):
+    # Cached files can read the rows directly
+    if hasattr( plink_file, "read_row" ):
+        return [ plink_file.read_row( i ).tolist( ) for i in sorted( set( loci ) ) ]
+
     loci_set = set( loci )
     rows = [ ]
     for i, row in enumerate( plink_file ):
@@ -24,7 +32,8 @@ def find_rows(plink_file, loci):
 # @param gxe_indices Indices of gene-environment variables.
 #
 # @return A list of columns for each specified variable in three blocks:
-#         genotypes, environment, gene-environment.
+#         genotypes, environment, gene-environment. Each column is
+#         a float array.
 #
 def find_gxe(plink_file, env, snp_indices, env_indices, gxe_indices):
     all_snps = set( snp_indices )
@@ -34,15 +43,25 @@ def find_gxe(plink_file, env, snp_indices, env_indices, gxe_indices):
         all_snps.add( g )
         all_env.add( e )
 
+    # Only the selected rows are kept, and reading
+    # stops after the last one
     genotype_data = dict( )
-    for i, row in enumerate( plink_file ):
-        if i in all_snps:
-            genotype_data[ i ] = row
+    last_snp = max( all_snps ) if all_snps else -1
+    if hasattr( plink_file, "read_row" ):
+        for i in all_snps:
+            genotype_data[ i ] = plink_file.read_row( i ).astype( np.float64 )
+    else:
+        for i, row in enumerate( plink_file ):
+            if i > last_snp:
+                break
+
+            if i in all_snps:
+                genotype_data[ i ] = np.array( row, dtype = np.float64 )
 
     env_data = dict( )
     for i, col in enumerate( env.data ):
         if i in all_env:
-            env_data[ i ] = col
+            env_data[ i ] = np.asarray( col, dtype = np.float64 )
 
     all_data = [ ]
     for i in snp_indices:
@@ -52,7 +71,7 @@ def find_gxe(plink_file, env, snp_indices, env_indices, gxe_indices):
         all_data.append( env_data[ i ] )
 
     for i, j in gxe_indices:
-        all_data.append( [ g * e for g, e in zip( genotype_data[ i ], env_data[ j ] ) ] )
+        all_data.append( genotype_data[ i ] * env_data[ j ] )
 
     return all_data
 
@@ -65,8 +84,12 @@ def find_gxe(plink_file, env, snp_indices, env_indices, gxe_indices):
 # @return The indices of the given locus.
 #
 def find_index(loci, names):
+    # Indexed loci are looked up by hash
+    if hasattr( loci, "find" ):
+        return loci.find( names )
+
     loci_name_set = set( names )
-    return [ i for i, x in enumerate( loci ) if x in loci_name_set ]
+    return [ i for i, x in enumerate( loci ) if x.name in loci_name_set ]
 
 ##
 # Randomly selects n loci from the loci list.
@@ -76,10 +99,23 @@ def find_index(loci, names):
 # @return The indices of the selected loci.
 #
 def sample_loci_set(loci, n):
-    loci_index = list( range( len( loci ) ) )
-    random.shuffle( loci_index )
+    return random.sample( range( len( loci ) ), min( n, len( loci ) ) )
 
-    return loci_index[:n]
+##
+# Randomly selects n causal loci that satisfy the given constraints.
+#
+# @param plink_file An opened plink file.
+# @param n The number of loci.
+# @param constraints A select.CausalConstraints, if it is empty all
+#                    loci can be selected.
+#
+# @return The indices of the selected loci.
+#
+def sample_causal_loci(plink_file, n, constraints):
+    if constraints.is_empty( ):
+        return sample_loci_set( plink_file.get_loci( ), n )
+
+    return select.select_causal( plink_file, n, constraints )
 
 ##
 # Randomly selects n gene-environment interactions.
@@ -91,10 +127,10 @@ def sample_loci_set(loci, n):
 # @return A list of (loci, env) indicies.
 #
 def sample_gxe(loci, env, n):
-    env_index = xrange( len( loci ) * len( env ) ) 
+    env_index = range( len( loci ) * len( env ) )
     sampled_indicies = random.sample( env_index, n )
 
-    return list( map( lambda x: ( x / len( env ), x % len( env ) ), sampled_indicies ) )
+    return list( map( lambda x: ( x // len( env ), x % len( env ) ), sampled_indicies ) )
 
 ##
 # Sample genotyeps from a categorical distribution.
@@ -144,6 +180,21 @@ def fast_sample_setup(probs):
  
     return J, q
  
+##
+# Draws many samples from an alias table at once.
+#
+# @param J The aliases from fast_sample_setup.
+# @param q The probabilities from fast_sample_setup.
+# @param n The number of samples.
+#
+# @return An array with the index of each sampled outcome.
+#
+def fast_sample_array(J, q, n):
+    k = np.random.randint( 0, len( J ), n )
+    u = np.random.random( n )
+
+    return kernels.alias_sample( np.asarray( J, dtype = np.int64 ), np.asarray( q, dtype = np.float64 ), k, u )
+
 def fast_sample(J, q, cat=[(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)] ):
     K  = len( J )
  
@@ -157,6 +208,33 @@ def fast_sample(J, q, cat=[(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0
     else:
         return cat[ J[ kk ] ]
 
+##
+# Draws multinomial counts for many rows at once, where each row can
+# have its own cell probabilities. The counts are drawn as a sequence
+# of conditional binomials, vectorized over the rows.
+#
+# @param n The total count of each row.
+# @param probs A ( rows, cells ) array of probabilities.
+#
+# @return A ( rows, cells ) integer array of counts.
+#
+def multinomial_rows(n, probs):
+    probs = np.asarray( probs, dtype = np.float64 )
+    counts = np.zeros( probs.shape, dtype = np.int64 )
+    remaining = np.full( probs.shape[ 0 ], n, dtype = np.int64 )
+    remaining_prob = np.ones( probs.shape[ 0 ] )
+    for k in range( probs.shape[ 1 ] - 1 ):
+        with np.errstate( divide = "ignore", invalid = "ignore" ):
+            p = np.where( remaining_prob > 0, probs[ :, k ] / remaining_prob, 0.0 )
+
+        counts[ :, k ] = np.random.binomial( remaining, np.clip( p, 0.0, 1.0 ) )
+        remaining -= counts[ :, k ]
+        remaining_prob -= probs[ :, k ]
+
+    counts[ :, -1 ] = remaining
+
+    return counts
+
 ##
 # Computes the joint Hardy-Weinberg model represented
 # as a vector.
@@ -198,12 +276,7 @@ def joint_maf(maf, ld):
 # @return The second allele frequency.
 #
 def compute_maf(row):
-    no_missing = filter( lambda x: x != 3, row )
-    
-    if len( no_missing ) > 0:
-        return sum( no_missing ) / ( 2.0 * len( no_missing ) )
-    else:
-        return 0.0
+    return compute_mafs( [ row ] )[ 0 ]
 
 ##
 # Computes the second allele frequency for the
@@ -214,8 +287,14 @@ def compute_maf(row):
 # @return A list of second allele frequencies.
 #
 def compute_mafs(rows):
-    return [ compute_maf( r ) for r in rows ]
-    
+    if len( rows ) == 0:
+        return [ ]
+
+    rows = np.asarray( rows )
+    observed = ( rows != 3 ).sum( axis = 1 )
+    alleles = np.where( rows != 3, rows, 0 ).sum( axis = 1 )
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        return np.where( observed > 0, alleles / ( 2.0 * observed ), 0.0 ).tolist( )
 
 ##
 # Determines a beta0 that gives the probability of being
@@ -227,11 +306,86 @@ def compute_mafs(rows):
 # @return A beta0 that makes the probability of being a case 0.5.
 #
 def find_beta0(rows, beta):
-    means = [ sum( r ) / len( r ) for r in rows ]
+    means = [ mean( r ) for r in rows ]
     beta0 = -sum( b * m for b, m in zip( beta, means ) )
 
     return beta0
 
+##
+# Finds the beta0 that gives a prevalence, the mean of link( eta + beta0 )
+# clipped to [0, 1] over all samples. The bracket around the solution is
+# found by doubling a step from -mean( eta ), and is then narrowed by
+# Newton steps that fall back to bisection when they leave the bracket.
+#
+# @param eta The linear predictor without intercept of each sample,
+#            missing is nan.
+# @param link The link function for arrays, see genmodels.get_array_link.
+# @param prevalence The desired prevalence.
+# @param weights The probability of each linear predictor, by default
+#                all samples are equally likely.
+#
+# @return The beta0 that gives the prevalence.
+#
+def solve_beta0(eta, link, prevalence, weights = None):
+    eta = np.asarray( eta, dtype = np.float64 )
+    if weights is None:
+        weights = np.ones( len( eta ) )
+
+    weights = np.asarray( weights, dtype = np.float64 )
+    keep = ~np.isnan( eta )
+    eta = eta[ keep ]
+    weights = weights[ keep ] / weights[ keep ].sum( )
+
+    # A mean value outside [0, 1] is a case or control with certainty
+    def excess(beta0):
+        with np.errstate( all = "ignore" ):
+            return float( np.dot( weights, np.clip( link( eta + beta0 ), 0.0, 1.0 ) ) ) - prevalence
+
+    center = -float( np.dot( weights, eta ) )
+    f_center = excess( center )
+    if f_center == 0.0:
+        return center
+
+    # Moves away from the center in both directions until the sign changes
+    lo, hi = center, center
+    f_lo, f_hi = f_center, f_center
+    step = 1.0
+    for i in range( 64 ):
+        lo, hi = center - step, center + step
+        f_lo, f_hi = excess( lo ), excess( hi )
+        if f_lo * f_center <= 0:
+            hi, f_hi = center, f_center
+            break
+        if f_hi * f_center <= 0:
+            lo, f_lo = center, f_center
+            break
+
+        step *= 2
+    else:
+        raise ValueError( "The prevalence {0} can not be reached with the link function.".format( prevalence ) )
+
+    beta0 = lo - f_lo * ( hi - lo ) / ( f_hi - f_lo )
+    for i in range( 100 ):
+        f = excess( beta0 )
+        if abs( f ) < 1e-12 or hi - lo < 1e-12:
+            break
+
+        if ( f < 0 ) == ( f_lo < 0 ):
+            lo, f_lo = beta0, f
+        else:
+            hi, f_hi = beta0, f
+
+        h = 1e-6 * max( 1.0, abs( beta0 ) )
+        slope = ( excess( beta0 + h ) - excess( beta0 - h ) ) / ( 2 * h )
+        newton = beta0 - f / slope if slope != 0 else lo
+        beta0 = newton if lo < newton < hi else ( lo + hi ) / 2
+
+    # A sign change across a pole of the link is not a solution
+    if not abs( excess( beta0 ) ) < 1e-6:
+        raise ValueError( "The prevalence {0} can not be reached with the link function.".format( prevalence ) )
+
+    return beta0
+
 ##
 # Generates effect sizes according to the effect size
 # distribution.
@@ -246,13 +400,14 @@ def generate_beta(n, mean, sd):
     return [ random.normalvariate( mean, sd ) for i in range( n ) ]
 
 ##
-# Compute the arithmetic mean.
+# Compute the arithmetic mean, missing values (nan) are skipped.
 #
 # @param data List of floats.
 #
 # @return the arithmetic mean.
 #
 def mean(data):
+    data = [ x for x in data if x == x ]
     n = len( data )
     if n < 1:
         raise ValueError( 'mean requires at least one data point' )
@@ -271,13 +426,14 @@ def _ss(data):
     return ss
 
 ##
-# Compute the standard deviation.
+# Compute the standard deviation, missing values (nan) are skipped.
 #
 # @param data List of floats.
 #
 # @return the estimated standard deviation.
 #
 def stdev(data):
+    data = [ x for x in data if x == x ]
     n = len( data )
     if n < 2:
         raise ValueError( 'variance requires at least two data points' )
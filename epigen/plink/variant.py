@@ -1,5 +1,7 @@
 from epigen.plink import util
 
+import numpy as np
+
 ##
 # Generate a single variant.
 #
@@ -31,3 +33,87 @@ def generate_variant_set(mafs):
 # 
 def generate_variant_row(m, num_samples):
     return [ generate_variant( m ) for i in range( num_samples ) ]
+
+##
+# A variant stored as the list of samples that carry the
+# minor allele, useful for rare variants.
+#
+class SparseVariant:
+    ##
+    # Constructor.
+    #
+    # @param positions Sorted indices of the samples that carry the allele.
+    # @param genotypes Genotype of each carrier (1 or 2).
+    # @param num_samples The total number of samples.
+    #
+    def __init__(self, positions, genotypes, num_samples):
+        self.positions = positions
+        self.genotypes = genotypes
+        self.num_samples = num_samples
+
+    ##
+    # Returns the genotypes of all samples.
+    #
+    def to_dense(self):
+        row = np.zeros( self.num_samples, dtype = np.uint8 )
+        row[ self.positions ] = self.genotypes
+
+        return row
+
+##
+# Generate a rare variant by only drawing its carriers. The gaps between
+# consecutive carriers are geometric, so the cost is proportional to the
+# number of carriers rather than the number of samples.
+#
+# @param m The minor allele frequency.
+# @param num_samples The number of samples.
+#
+# @return A SparseVariant.
+#
+def generate_sparse_variant(m, num_samples):
+    carrier_prob = 1 - ( 1 - m )**2
+    if carrier_prob <= 0.0:
+        return SparseVariant( np.zeros( 0, dtype = np.int64 ), np.zeros( 0, dtype = np.uint8 ), num_samples )
+
+    expected = num_samples * carrier_prob
+    positions = np.cumsum( np.random.geometric( carrier_prob, int( expected + 5 * expected**0.5 + 10 ) ) ) - 1
+    while positions[ -1 ] < num_samples:
+        more = np.cumsum( np.random.geometric( carrier_prob, len( positions ) ) ) + positions[ -1 ]
+        positions = np.concatenate( ( positions, more ) )
+
+    positions = positions[ :np.searchsorted( positions, num_samples ) ]
+    genotypes = 1 + ( np.random.random( len( positions ) ) < m**2 / carrier_prob ).astype( np.uint8 )
+
+    return SparseVariant( positions, genotypes, num_samples )
+
+##
+# Generate a block of variants for a set of individuals. Variants with
+# a minor allele frequency below rare_maf are generated by only drawing
+# the carriers of the minor allele.
+#
+# @param mafs The allele frequency of each variant.
+# @param num_samples The number of samples.
+# @param rare_maf Threshold for the sparse generation.
+#
+# @return A uint8 matrix of genotypes with one row per variant.
+#
+def generate_variant_block(mafs, num_samples, rare_maf = 0.01):
+    mafs = np.asarray( mafs, dtype = np.float64 )
+    block = np.zeros( ( len( mafs ), num_samples ), dtype = np.uint8 )
+
+    minor = np.minimum( mafs, 1 - mafs )
+    for i in np.flatnonzero( minor < rare_maf ):
+        sparse = generate_sparse_variant( minor[ i ], num_samples )
+        if mafs[ i ] > 0.5:
+            block[ i ] = 2
+            block[ i, sparse.positions ] = 2 - sparse.genotypes
+        else:
+            block[ i, sparse.positions ] = sparse.genotypes
+
+    common = np.flatnonzero( minor >= rare_maf )
+    if len( common ) > 0:
+        m = mafs[ common, np.newaxis ]
+        u = np.random.random( ( len( common ), num_samples ) )
+        block[ common ] = ( u < 1 - ( 1 - m )**2 ).astype( np.uint8 ) + ( u < m**2 )
+
+    return block
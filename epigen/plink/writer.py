@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+
+if sys.version_info[ 0 ] == 2:
+    import Queue as queue
+else:
+    import queue
+
+##
+# Runs write tasks in a background thread so that the next block can
+# be sampled while the previous one is packed and written. Tasks are
+# passed through a bounded queue, when it is full the caller waits
+# and the time it waits is counted as stall time.
+#
+class BackgroundWriter:
+    ##
+    # Constructor.
+    #
+    # @param queue_depth The number of tasks that can wait to be written,
+    #                    if 0 tasks are run directly by the caller.
+    #
+    def __init__(self, queue_depth = 2):
+        self.queue_depth = queue_depth
+        self.stall_time = 0.0
+        self.busy_time = 0.0
+        self.error = None
+
+        self.thread = None
+        if queue_depth > 0:
+            self.queue = queue.Queue( queue_depth )
+            self.thread = threading.Thread( target = self.run )
+            self.thread.daemon = True
+            self.thread.start( )
+
+    ##
+    # Consumes the tasks of the queue until None is received.
+    #
+    def run(self):
+        while True:
+            item = self.queue.get( )
+            if item is None:
+                break
+
+            # Skip the remaining tasks after an error, it is raised in the caller
+            if self.error is None:
+                self.run_task( *item )
+
+    ##
+    # Runs a single task and keeps any error.
+    #
+    def run_task(self, task, args):
+        start = time.time( )
+        try:
+            task( *args )
+        except Exception:
+            self.error = sys.exc_info( )[ 1 ]
+
+        self.busy_time += time.time( ) - start
+
+    ##
+    # Raises the error of a failed task in the caller.
+    #
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    ##
+    # Adds a task to the queue, waits if the queue is full.
+    #
+    # @param task A function.
+    # @param args The arguments of the function.
+    #
+    def submit(self, task, *args):
+        self.check( )
+        if self.thread is None:
+            self.run_task( task, args )
+            self.check( )
+            return
+
+        start = time.time( )
+        self.queue.put( ( task, args ) )
+        self.stall_time += time.time( ) - start
+
+    ##
+    # Waits for all tasks to finish and stops the thread.
+    #
+    def close(self):
+        if self.thread is not None:
+            self.queue.put( None )
+            self.thread.join( )
+            self.thread = None
+
+        self.check( )
+
+    ##
+    # Writes the stall and busy times in seconds. They depend on
+    # the machine and its load, so they are kept out of the .info
+    # file to leave it identical between runs with the same seed.
+    #
+    # @param output_file The file to write to, stderr by default.
+    #
+    def report(self, output_file = None):
+        output_file = output_file or sys.stderr
+        output_file.write( "epigen: writer-stall-seconds {0:.3f}, writer-busy-seconds {1:.3f}\n".format( self.stall_time, self.busy_time ) )
+
+##
+# Flushes a file and waits until it is written to disk.
+#
+# @param output_file An open file.
+#
+def sync(output_file):
+    output_file.flush( )
+    os.fsync( output_file.fileno( ) )
@@ -0,0 +1,143 @@
+import numpy as np
+
+from epigen.plink import genmodels, util, memory
+from epigen.power import stats
+
+##
+# Number of genotypes that are simulated in memory at once.
+#
+BLOCK_GENOTYPES = 2**23
+
+##
+# Estimated peak number of bytes per simulated genotype.
+#
+GENOTYPE_BYTES = 64
+
+##
+# Returns the joint genotype distribution of each replicate.
+#
+# @param fixed_params The simulation parameters.
+# @param replicates The number of replicates.
+#
+# @return A ( replicates, 9 ) array.
+#
+def replicate_mafs(fixed_params, replicates):
+    if fixed_params.maf_is_fixed( ):
+        return np.tile( fixed_params.get_maf( ), ( replicates, 1 ) )
+    else:
+        return np.array( [ fixed_params.get_maf( ) for i in range( replicates ) ] )
+
+##
+# Simulates the case/control tables of replicate datasets for a
+# binomial model, conditioning on the phenotype in the same way
+# as write_general_data.
+#
+# @param model A BinomialModel.
+# @param fixed_params The simulation parameters.
+# @param params The BinomialParams.
+# @param replicates The number of replicates.
+#
+# @return A tuple ( case_counts, control_counts ) of ( replicates, 9 ) arrays.
+#
+def simulate_binomial(model, fixed_params, params, replicates):
+    mafs = replicate_mafs( fixed_params, replicates )
+    case_probs = np.array( [ model.joint_prob( m, params.penetrance, 1 ) for m in mafs ] )
+    control_probs = np.array( [ model.joint_prob( m, params.penetrance, 0 ) for m in mafs ] )
+
+    return ( util.multinomial_rows( fixed_params.num_cases( ), case_probs ),
+             util.multinomial_rows( fixed_params.num_controls( ), control_probs ) )
+
+##
+# Simulates replicate datasets for a normal model, the genotype cells
+# are drawn from the population and the phenotype around the cell mean.
+#
+# @param fixed_params The simulation parameters.
+# @param params The NormalParams.
+# @param replicates The number of replicates.
+#
+# @return A tuple ( cells, phenotype ) of ( replicates, samples ) arrays.
+#
+def simulate_normal(fixed_params, params, replicates):
+    num_samples = fixed_params.num_samples( )
+    cumulative = np.cumsum( replicate_mafs( fixed_params, replicates ), axis = 1 )
+    cumulative[ :, -1 ] = 1.0
+
+    u = np.random.random( ( replicates, num_samples ) )
+    cells = np.empty( ( replicates, num_samples ), dtype = np.int64 )
+    for r in range( replicates ):
+        cells[ r ] = np.searchsorted( cumulative[ r ], u[ r ] )
+
+    mu = np.asarray( params.mu, dtype = np.float64 )
+    std = np.asarray( params.std, dtype = np.float64 )
+    phenotype = mu[ cells ] + std[ cells ] * np.random.standard_normal( cells.shape )
+
+    return cells, phenotype
+
+##
+# Simulates replicates and counts how many times each test rejects.
+#
+# @param model_name The type of model (binomial or normal).
+# @param model The model object from genmodels.
+# @param params The parameters of the model.
+# @param fixed_params The simulation parameters.
+# @param replicates The number of replicates.
+# @param alpha The significance level.
+#
+# @return A dict from test name to a tuple ( df, rejections ).
+#
+def count_rejections(model_name, model, params, fixed_params, replicates, alpha):
+    num_samples = sum( fixed_params.sample_size )
+    chunk = memory.block_size( num_samples * GENOTYPE_BYTES, BLOCK_GENOTYPES // num_samples )
+    rejections = { }
+    for start in range( 0, replicates, chunk ):
+        n = min( chunk, replicates - start )
+        if model_name == "binomial":
+            case_counts, control_counts = simulate_binomial( model, fixed_params, params, n )
+            results = { "chisq" : stats.chisq_test( case_counts, control_counts ),
+                        "lrt" : stats.logistic_interaction_test( case_counts, control_counts ) }
+        else:
+            cells, phenotype = simulate_normal( fixed_params, params, n )
+            results = stats.linear_tests( *stats.cell_moments( cells, phenotype ) )
+
+        for test, ( statistic, df, pvalue ) in results.items( ):
+            prev_df, prev_count = rejections.get( test, ( 0, 0 ) )
+            rejections[ test ] = ( max( prev_df, int( df.max( ) ) ), prev_count + int( ( pvalue <= alpha ).sum( ) ) )
+
+    return rejections
+
+##
+# Estimates the power and type I error of the tests of a two-locus model
+# without writing any data. The type I error is estimated under a model
+# where every genotype has the population mean of the given model.
+#
+# @param model_name The type of model (binomial or normal).
+# @param mu The mean value for each genotype.
+# @param dispersion The dispersion parameter (only used in normal).
+# @param fixed_params The simulation parameters.
+# @param replicates The number of replicates.
+# @param alpha The significance level.
+#
+# @return A list of dicts with the power and type I error of each test.
+#
+def estimate_power(model_name, mu, dispersion, fixed_params, replicates, alpha):
+    pop_mu = float( np.dot( mu, genmodels.joint_maf( fixed_params.maf, fixed_params.ld ) ) )
+    null_mu = [ pop_mu ] * 9
+
+    model, params = genmodels.get_model_and_params( model_name, mu, dispersion, fixed_params.maf, fixed_params.ld )
+    null_model, null_params = genmodels.get_model_and_params( model_name, null_mu, dispersion, fixed_params.maf, fixed_params.ld )
+
+    power = count_rejections( model_name, model, params, fixed_params, replicates, alpha )
+    type1 = count_rejections( model_name, null_model, null_params, fixed_params, replicates, alpha )
+
+    results = [ ]
+    for test in sorted( power.keys( ) ):
+        df, rejected = power[ test ]
+        null_rejected = type1[ test ][ 1 ]
+        results.append( { "test" : test,
+                          "df" : df,
+                          "power" : float( rejected ) / replicates,
+                          "power_ci" : stats.wilson_interval( rejected, replicates ),
+                          "type1" : float( null_rejected ) / replicates,
+                          "type1_ci" : stats.wilson_interval( null_rejected, replicates ) } )
+
+    return results
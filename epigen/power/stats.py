@@ -0,0 +1,194 @@
+import numpy as np
+from math import erfc, pi
+
+##
+# Design matrix of the additive two-locus model on the 9 genotype
+# cells (ordered row-wise as the penetrance): intercept and two
+# codominant dummies for each variant.
+#
+ADDITIVE_DESIGN = np.array( [ [ 1, int( i == 1 ), int( i == 2 ), int( j == 1 ), int( j == 2 ) ] for i in range( 3 ) for j in range( 3 ) ], dtype = np.float64 )
+
+##
+# Survival function of the chi-square distribution for integer
+# degrees of freedom, computed from the closed form series.
+#
+# @param x Array of statistics.
+# @param df Array or scalar of degrees of freedom.
+#
+# @return Array of p-values.
+#
+def chi2_sf(x, df):
+    x = np.maximum( np.asarray( x, dtype = np.float64 ), 0.0 )
+    df = np.broadcast_to( np.asarray( df, dtype = np.int64 ), x.shape )
+    half = x / 2.0
+    odd = df % 2 == 1
+
+    # Odd degrees of freedom start from the normal tail
+    pvalue = np.where( odd, np.vectorize( erfc, otypes = [ np.float64 ] )( np.sqrt( half ) ), 0.0 )
+    term = np.where( odd, np.sqrt( 2 * x / pi ), 1.0 ) * np.exp( -half )
+
+    num_terms = df // 2
+    for t in range( int( num_terms.max( ) ) if x.size > 0 else 0 ):
+        pvalue = np.where( t < num_terms, pvalue + term, pvalue )
+        term = term * np.where( odd, x / ( 2 * t + 3 ), half / ( t + 1 ) )
+
+    return np.where( df > 0, np.clip( pvalue, 0.0, 1.0 ), 1.0 )
+
+##
+# Computes sum( a * log( b ) ) where terms with a = 0 are zero.
+#
+def xlogy_sum(a, b, axis = -1):
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        return np.where( a > 0, a * np.log( np.where( a > 0, b, 1.0 ) ), 0.0 ).sum( axis = axis )
+
+##
+# Pearson chi-square test of association in a 2x9 table,
+# vectorized over replicates. Genotype cells that are empty
+# in both groups do not count towards the degrees of freedom.
+#
+# @param case_counts A ( replicates, 9 ) array of counts in cases.
+# @param control_counts A ( replicates, 9 ) array of counts in controls.
+#
+# @return A tuple of arrays ( statistic, df, p-value ).
+#
+def chisq_test(case_counts, control_counts):
+    table = np.stack( ( case_counts, control_counts ), axis = 1 ).astype( np.float64 )
+    total = table.sum( axis = ( 1, 2 ) )[ :, np.newaxis, np.newaxis ]
+    expected = table.sum( axis = 2 )[ :, :, np.newaxis ] * table.sum( axis = 1 )[ :, np.newaxis, : ] / total
+
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        statistic = np.where( expected > 0, ( table - expected )**2 / expected, 0.0 ).sum( axis = ( 1, 2 ) )
+
+    df = np.maximum( ( table.sum( axis = 1 ) > 0 ).sum( axis = 1 ) - 1, 0 )
+
+    return statistic, df, chi2_sf( statistic, df )
+
+##
+# Solves a batch of weighted least squares problems on the 9 cells.
+#
+# @param weights A ( replicates, 9 ) array of weights.
+# @param response A ( replicates, 9 ) array of weighted responses, i.e. X'Wz = X' response.
+#
+# @return A ( replicates, 5 ) array of coefficients.
+#
+def additive_solve(weights, response):
+    X = ADDITIVE_DESIGN
+    xtwx = np.einsum( "ck,rc,cl->rkl", X, weights, X ) + 1e-10 * np.eye( X.shape[ 1 ] )
+    xtwz = np.dot( response, X )
+
+    return np.linalg.solve( xtwx, xtwz[ :, :, np.newaxis ] )[ :, :, 0 ]
+
+##
+# Likelihood ratio test of interaction for a binary phenotype, the
+# saturated logistic model (9 cells) is compared with the additive
+# logistic model with codominant main effects (4 df). The models are
+# fit on the grouped cell counts with IRLS, vectorized over replicates.
+#
+# @param case_counts A ( replicates, 9 ) array of counts in cases.
+# @param control_counts A ( replicates, 9 ) array of counts in controls.
+# @param max_iter Maximum number of IRLS iterations.
+#
+# @return A tuple of arrays ( statistic, df, p-value ).
+#
+def logistic_interaction_test(case_counts, control_counts, max_iter = 25):
+    y = np.asarray( case_counts, dtype = np.float64 )
+    n = y + np.asarray( control_counts, dtype = np.float64 )
+
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        p_sat = np.where( n > 0, y / n, 0.5 )
+    ll_sat = xlogy_sum( y, p_sat ) + xlogy_sum( n - y, 1 - p_sat )
+
+    beta = np.zeros( ( y.shape[ 0 ], ADDITIVE_DESIGN.shape[ 1 ] ) )
+    for i in range( max_iter ):
+        eta = np.dot( beta, ADDITIVE_DESIGN.T )
+        p = 1.0 / ( 1.0 + np.exp( -eta ) )
+        w = np.maximum( n * p * ( 1 - p ), 1e-12 )
+        z = eta + ( y - n * p ) / w
+        new_beta = additive_solve( w, w * z )
+        converged = np.abs( new_beta - beta ).max( ) < 1e-8
+        beta = new_beta
+        if converged:
+            break
+
+    p = np.clip( 1.0 / ( 1.0 + np.exp( -np.dot( beta, ADDITIVE_DESIGN.T ) ) ), 1e-300, 1 - 1e-16 )
+    ll_add = xlogy_sum( y, p ) + xlogy_sum( n - y, 1 - p )
+
+    statistic = np.maximum( 2 * ( ll_sat - ll_add ), 0.0 )
+    df = np.full( len( statistic ), 4 )
+
+    return statistic, df, chi2_sf( statistic, df )
+
+##
+# Computes the sufficient statistics of a continuous phenotype
+# in each of the 9 genotype cells.
+#
+# @param cells A ( replicates, samples ) array of cell indices.
+# @param phenotype A ( replicates, samples ) array of phenotypes.
+#
+# @return A tuple ( counts, sums, sum of squares ) of ( replicates, 9 ) arrays.
+#
+def cell_moments(cells, phenotype):
+    offset = 9 * np.arange( cells.shape[ 0 ] )[ :, np.newaxis ]
+    index = ( cells + offset ).ravel( )
+    size = 9 * cells.shape[ 0 ]
+
+    counts = np.bincount( index, minlength = size ).reshape( -1, 9 ).astype( np.float64 )
+    sums = np.bincount( index, weights = phenotype.ravel( ), minlength = size ).reshape( -1, 9 )
+    squares = np.bincount( index, weights = phenotype.ravel( )**2, minlength = size ).reshape( -1, 9 )
+
+    return counts, sums, squares
+
+##
+# Linear regression tests for a continuous phenotype, vectorized over
+# replicates. Returns both the overall test of association (saturated
+# model against the intercept, 8 df) and the test of interaction
+# (saturated model against the additive model, 4 df) as likelihood
+# ratio tests.
+#
+# @param counts A ( replicates, 9 ) array of the number of samples in each cell.
+# @param sums A ( replicates, 9 ) array of the phenotype sum in each cell.
+# @param squares A ( replicates, 9 ) array of the sum of squared phenotypes in each cell.
+#
+# @return A dict from test name to a tuple of arrays ( statistic, df, p-value ).
+#
+def linear_tests(counts, sums, squares):
+    n = counts.sum( axis = 1 )
+    total_ss = squares.sum( axis = 1 )
+
+    with np.errstate( divide = "ignore", invalid = "ignore" ):
+        rss_sat = total_ss - np.where( counts > 0, sums**2 / counts, 0.0 ).sum( axis = 1 )
+    rss_null = total_ss - sums.sum( axis = 1 )**2 / n
+
+    beta = additive_solve( counts, sums )
+    rss_add = total_ss - ( beta * np.dot( sums, ADDITIVE_DESIGN ) ).sum( axis = 1 )
+
+    rss_sat = np.maximum( rss_sat, 1e-300 )
+    nonempty = ( counts > 0 ).sum( axis = 1 )
+
+    association = n * np.log( rss_null / rss_sat )
+    association_df = np.maximum( nonempty - 1, 0 )
+    interaction = np.maximum( n * np.log( np.maximum( rss_add, rss_sat ) / rss_sat ), 0.0 )
+    interaction_df = np.full( len( n ), 4 )
+
+    return { "linear" : ( association, association_df, chi2_sf( association, association_df ) ),
+             "lrt" : ( interaction, interaction_df, chi2_sf( interaction, interaction_df ) ) }
+
+##
+# Computes the Wilson score confidence interval of a proportion.
+#
+# @param successes Number of successes.
+# @param n Number of trials.
+# @param z The normal quantile of the interval (1.96 gives 95%).
+#
+# @return A tuple ( lower, upper ).
+#
+def wilson_interval(successes, n, z = 1.959964):
+    if n == 0:
+        return 0.0, 1.0
+
+    p = float( successes ) / n
+    denom = 1 + z**2 / n
+    center = ( p + z**2 / ( 2 * n ) ) / denom
+    half_width = z * ( p * ( 1 - p ) / n + z**2 / ( 4 * n**2 ) )**0.5 / denom
+
+    return max( 0.0, center - half_width ), min( 1.0, center + half_width )
@@ -3,10 +3,16 @@ import sys
 import click
 
 from epigen.commands.command import ComplexCLI
+from epigen.plink import memory
+from epigen.plink import shard
 
 @click.command(no_args_is_help = True, cmd_subdirs = ["pair", "pheno", "plink", "env"], cls = ComplexCLI)
-def epigen():
+@click.option( '--max-memory', type=memory.parse_memory, help='Limit the memory used by the generators, e.g. 512M or 4G (default no limit).', default = None )
+@click.option( '--seed', type=click.IntRange( 0, 2**32 - 1 ), help='Seed of the random number generators, required by --shard.', default = None )
+def epigen(max_memory, seed):
     """Generate plink or phenotype data using an epistatic model."""
+    memory.set_max_memory( max_memory )
+    shard.set_seed( seed )
 
 if __name__ == "__main__":
     epigen( )
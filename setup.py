@@ -72,6 +72,7 @@ setup(
     # You can install these using the following syntax, for example:
     # $ pip install -e .[dev,test]
     extras_require = {
+        'jit': ['numba'],
     },
 
     # If there are data files included in your packages that need to be
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from epigen.plink import bed
+
+##
+# Writes a small plink file.
+#
+# @param prefix The plink prefix.
+# @param genotypes A matrix of genotypes with one row per variant.
+# @param samples A list of ( fid, iid ).
+# @param loci A list of ( chromosome, name, position ), by default
+#             rs0, rs1, ... on chromosome 1.
+#
+def write_plink(prefix, genotypes, samples, loci = None):
+    genotypes = np.asarray( genotypes, dtype = np.uint8 )
+    if loci is None:
+        loci = [ ( 1, "rs{0}".format( i ), 1000 * ( i + 1 ) ) for i in range( len( genotypes ) ) ]
+
+    with open( prefix + ".bed", "wb" ) as bed_file:
+        bed_file.write( bed.BED_MAGIC )
+        bed_file.write( bed.pack_rows( genotypes ).tobytes( ) )
+
+    with open( prefix + ".bim", "w" ) as bim_file:
+        for chromosome, name, position in loci:
+            bim_file.write( bed.format_locus( name, position, chromosome ) )
+
+    with open( prefix + ".fam", "w" ) as fam_file:
+        for fid, iid in samples:
+            fam_file.write( bed.format_sample( fid, iid, -9, True ) )
+
+    return prefix
+
+@pytest.fixture
+def plink_writer(tmp_path):
+    def write(name, genotypes, samples, loci = None):
+        return write_plink( str( tmp_path / name ), genotypes, samples, loci )
+
+    return write
@@ -0,0 +1,58 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from epigen.plink import checkpoint, generate, genmodels, output
+
+EXTENSIONS = [ ".bed", ".bim", ".fam", ".pair", ".case", ".model", ".frq" ]
+
+class Interrupted(Exception):
+    pass
+
+def write_data(prefix, seed, **kwargs):
+    random.seed( seed )
+    np.random.seed( seed )
+
+    mu = [ 0.1, 0.1, 0.1, 0.1, 0.5, 0.1, 0.1, 0.1, 0.1 ]
+    fixed_params = genmodels.FixedParams( [ 0.3, 0.4 ], None, [ 30, 31 ], False )
+    model, params = genmodels.get_model_and_params( "binomial", mu, 1.0, [ 0.3, 0.4 ], None )
+
+    return generate.write_general_data( model, fixed_params, [ ( 40, 1, params ) ], prefix, frq = True, **kwargs )
+
+def test_resume_gives_identical_output(tmp_path, monkeypatch):
+    # Blocks of 4 pairs and a checkpoint after every block
+    monkeypatch.setattr( output, "BLOCK_GENOTYPES", 61 * 8 )
+    monkeypatch.setattr( checkpoint.Checkpoint, "is_due", lambda self: True )
+
+    full = str( tmp_path / "full" )
+    write_data( full, 7, queue_depth = 0 )
+
+    generate_pairs = generate.generate_general_data
+    def interrupted_pairs(*args):
+        for i, pair in enumerate( generate_pairs( *args ) ):
+            if i == 22:
+                raise Interrupted( )
+
+            yield pair
+
+    resumed = str( tmp_path / "resumed" )
+    monkeypatch.setattr( generate, "generate_general_data", interrupted_pairs )
+    with pytest.raises( Interrupted ):
+        write_data( resumed, 7, queue_depth = 0, checkpoint_interval = 1 )
+
+    # A crash may leave data after the checkpoint
+    for ext in [ ".bed", ".bim", ".pair", ".frq" ]:
+        with open( resumed + ext, "ab" ) as partial_file:
+            partial_file.write( b"partial" )
+
+    state = checkpoint.load_checkpoint( resumed + ".checkpoint", { } )
+    assert 0 < state[ "pairs" ] < 40
+    monkeypatch.setattr( generate, "generate_general_data", generate_pairs )
+    write_data( resumed, 8, checkpoint_interval = 1, resume = True )
+    assert not os.path.exists( resumed + ".checkpoint" )
+
+    for ext in EXTENSIONS:
+        with open( full + ext, "rb" ) as full_file, open( resumed + ext, "rb" ) as resumed_file:
+            assert full_file.read( ) == resumed_file.read( ), ext
@@ -0,0 +1,21 @@
+import io
+import math
+
+from epigen.plink import envfile
+from epigen.plink.util import find_beta0, mean, stdev
+
+def test_missing_samples_and_values_are_nan():
+    env_file = io.StringIO( "FID\tIID\tenv0\tenv1\nf0\ti0\t1.5\tNA\nf2\ti2\t2.0\t3.0\n" )
+    env = envfile.EnvFile( "env.txt", env_file )
+    env.parse( [ "i0", "i1", "i2" ] )
+
+    env0, env1 = env.get_variables( [ 0, 1 ] )
+    assert env0[ 0 ] == 1.5 and math.isnan( env0[ 1 ] ) and env0[ 2 ] == 2.0
+    assert math.isnan( env1[ 0 ] ) and math.isnan( env1[ 1 ] ) and env1[ 2 ] == 3.0
+
+def test_statistics_skip_missing_values():
+    data = [ 1.0, float( "nan" ), 3.0 ]
+
+    assert mean( data ) == 2.0
+    assert stdev( data ) == 1.0
+    assert find_beta0( [ data ], [ 2.0 ] ) == -4.0
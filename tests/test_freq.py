@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+from plinkio import plinkfile
+
+from epigen.plink import bed, freq
+from epigen.plink.subset import SampleMask
+
+##
+# Counts the genotypes of each variant as decoded by plinkio.
+#
+def plinkio_counts(prefix, samples = None):
+    pf = plinkfile.open( prefix )
+    counts = [ ]
+    for row in pf:
+        genotypes = np.array( list( row ) )
+        if samples is not None:
+            genotypes = genotypes[ samples ]
+
+        counts.append( np.bincount( genotypes, minlength = 4 ) )
+
+    pf.close( )
+    return np.array( counts, dtype = np.int64 )
+
+def random_genotypes(num_variants, num_samples, seed = 0):
+    rng = np.random.RandomState( seed )
+    genotypes = rng.randint( 0, 3, size = ( num_variants, num_samples ) )
+    genotypes[ rng.uniform( size = genotypes.shape ) < 0.1 ] = 3
+
+    return genotypes
+
+def samples(n):
+    return [ ( "fam{0}".format( i ), "iid{0}".format( i ) ) for i in range( n ) ]
+
+@pytest.mark.parametrize( "num_samples", [ 1, 5, 6, 7, 8, 13 ] )
+def test_counts_match_plinkio(plink_writer, num_samples):
+    prefix = plink_writer( "counts", random_genotypes( 11, num_samples ), samples( num_samples ) )
+
+    reader = bed.open_bed( prefix )
+    expected = plinkio_counts( prefix )
+    assert np.array_equal( freq.count_packed( reader.read_packed( 0, reader.num_variants ), num_samples ), expected )
+    assert np.array_equal( freq.scan_bed( reader ), expected )
+    assert np.array_equal( freq.scan_bed( reader, threads = 1, variants = [ 3, 0, 7 ] ), expected[ [ 3, 0, 7 ] ] )
+    reader.close( )
+
+def test_padding_bits_are_ignored(plink_writer):
+    prefix = plink_writer( "padding", random_genotypes( 4, 6 ), samples( 6 ) )
+
+    reader = bed.open_bed( prefix )
+    packed = reader.read_packed( 0, reader.num_variants ).copy( )
+    packed[ :, -1 ] |= np.uint8( 0xf0 )
+    assert np.array_equal( freq.count_packed( packed, 6 ), plinkio_counts( prefix ) )
+    reader.close( )
+
+def test_masked_counts_match_plinkio(plink_writer):
+    prefix = plink_writer( "masked", random_genotypes( 9, 15, seed = 1 ), samples( 15 ) )
+    kept = [ 0, 2, 3, 7, 8, 14 ]
+
+    reader = bed.open_bed( prefix )
+    counts = freq.scan_bed( reader, mask = SampleMask( kept ) )
+    reader.close( )
+
+    assert np.array_equal( counts, plinkio_counts( prefix, kept ) )
+    assert np.array_equal( counts.sum( axis = 1 ), [ len( kept ) ] * 9 )
+
+def test_cache_is_rebuilt_when_stale(plink_writer):
+    prefix = plink_writer( "cache", random_genotypes( 6, 10, seed = 2 ), samples( 10 ) )
+
+    stats = freq.open_frequencies( prefix )
+    assert os.path.exists( prefix + ".epgfrq" )
+    assert np.array_equal( stats.counts, plinkio_counts( prefix ) )
+    assert np.array_equal( freq.open_frequencies( prefix ).counts, stats.counts )
+
+    # Same size, but different genotypes and modification time
+    plink_writer( "cache", random_genotypes( 6, 10, seed = 3 ), samples( 10 ) )
+    mtime = os.path.getmtime( prefix + ".bed" ) + 10
+    os.utime( prefix + ".bed", ( mtime, mtime ) )
+    assert np.array_equal( freq.open_frequencies( prefix ).counts, plinkio_counts( prefix ) )
+
+def test_truncated_cache_is_rebuilt(plink_writer):
+    prefix = plink_writer( "truncated", random_genotypes( 6, 10, seed = 4 ), samples( 10 ) )
+    freq.open_frequencies( prefix )
+
+    with open( prefix + ".epgfrq", "r+b" ) as freq_file:
+        freq_file.truncate( os.path.getsize( prefix + ".epgfrq" ) // 2 )
+
+    assert np.array_equal( freq.open_frequencies( prefix ).counts, plinkio_counts( prefix ) )
@@ -0,0 +1,23 @@
+import random
+
+import pytest
+
+from epigen.plink import generate
+
+def test_generate_segments_boundaries():
+    random.seed( 0 )
+    segments = generate.generate_segments( 100, 5, [ 40, 70, 100 ] )
+
+    assert segments[ 0 ] == 0 and segments[ -1 ] == 100
+    assert 40 in segments and 70 in segments
+    assert segments == sorted( set( segments ) )
+
+def test_generate_segments_default_breaks():
+    random.seed( 1 )
+    first = generate.generate_segments( 50, 50 )
+    random.seed( 1 )
+    assert generate.generate_segments( 50, 50 ) == first
+
+def test_generate_segments_requires_a_segment():
+    with pytest.raises( ValueError ):
+        generate.generate_segments( 100, 0 )
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from epigen.plink import bed, kernels
+
+SAMPLE_SIZES = [ 1, 3, 4, 5, 8, 13, 101 ]
+
+def alias_inputs(num_samples, seed):
+    rng = np.random.RandomState( seed )
+    J = rng.randint( 0, 9, size = 9 ).astype( np.int64 )
+    q = rng.random_sample( 9 )
+    k = rng.randint( 0, 9, size = num_samples ).astype( np.int64 )
+    u = rng.random_sample( num_samples )
+
+    return J, q, k, u
+
+def segment_inputs(num_samples, seed):
+    rng = np.random.RandomState( seed )
+    haplotypes = rng.randint( 0, 2, size = ( 6, 20 ) ).astype( np.uint8 )
+    first = rng.randint( 0, 6, size = num_samples ).astype( np.int64 )
+    second = rng.randint( 0, 6, size = num_samples ).astype( np.int64 )
+
+    return haplotypes, first, second, 3, 17
+
+def pack_inputs(num_samples, seed):
+    rng = np.random.RandomState( seed )
+    return ( rng.randint( 0, 4, size = ( 7, num_samples ) ).astype( np.uint8 ), )
+
+INPUTS = {
+    "alias_sample" : alias_inputs,
+    "segment_genotypes" : segment_inputs,
+    "pack_rows" : pack_inputs,
+}
+
+def compiled(name):
+    pytest.importorskip( "numba" )
+    return kernels.JIT_KERNELS[ name ]
+
+@pytest.mark.parametrize( "name", sorted( INPUTS ) )
+@pytest.mark.parametrize( "num_samples", SAMPLE_SIZES )
+def test_loop_matches_numpy(name, num_samples):
+    args = INPUTS[ name ]( num_samples, num_samples )
+    expected = kernels.NUMPY_KERNELS[ name ]( *args )
+    result = getattr( kernels, name + "_loop" )( *args )
+
+    assert result.shape == expected.shape
+    assert np.array_equal( result, expected )
+
+@pytest.mark.parametrize( "name", sorted( INPUTS ) )
+@pytest.mark.parametrize( "num_samples", SAMPLE_SIZES )
+def test_jit_matches_numpy(name, num_samples):
+    kernel = compiled( name )
+    args = INPUTS[ name ]( num_samples, num_samples )
+    expected = kernels.NUMPY_KERNELS[ name ]( *args )
+    result = kernel( *args )
+
+    assert result.shape == expected.shape
+    assert np.array_equal( result, expected )
+
+@pytest.fixture
+def restore_kernels():
+    active = dict( kernels.active )
+    yield
+    kernels.active.clear( )
+    kernels.active.update( active )
+
+def test_pack_rows_round_trip(restore_kernels):
+    rows = pack_inputs( 13, 0 )[ 0 ]
+    for enabled in ( False, True ):
+        kernels.use_jit( enabled )
+        assert np.array_equal( bed.unpack_rows( bed.pack_rows( rows ), 13 ), rows )
+
+def test_use_jit_selects_kernels(restore_kernels):
+    assert not kernels.use_jit( False )
+    assert kernels.active[ "pack_rows" ] is kernels.pack_rows_numpy
+
+    jit = kernels.use_jit( True )
+    assert jit == ( kernels.numba is not None )
+    if jit:
+        assert kernels.active[ "pack_rows" ] is kernels.JIT_KERNELS[ "pack_rows" ]
@@ -0,0 +1,19 @@
+import pytest
+
+from epigen.plink import memory
+
+class Usage:
+    ru_maxrss = 60 * 2**20
+
+class Resource:
+    RUSAGE_SELF = 0
+
+    def getrusage(self, who):
+        return Usage( )
+
+@pytest.mark.parametrize( "platform, expected", [ ( "darwin", 60 * 2**20 ), ( "linux", 60 * 2**30 ) ] )
+def test_peak_memory_unit(monkeypatch, platform, expected):
+    monkeypatch.setattr( memory, "resource", Resource( ) )
+    monkeypatch.setattr( memory.sys, "platform", platform )
+
+    assert memory.peak_memory( ) == expected
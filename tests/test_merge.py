@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from epigen.plink import merge
+from epigen.plink.plink_file import PlinkFile
+
+def write_shard(prefix, first, num_variants, num_samples = 6):
+    pf = PlinkFile( prefix, [ -9 ] * num_samples, True )
+    pf.write_block( first, np.zeros( ( num_variants, num_samples ), dtype = np.uint8 ) )
+    pf.close( )
+
+    return prefix
+
+@pytest.fixture
+def shards(tmp_path):
+    return [ write_shard( str( tmp_path / "shard{0}".format( i ) ), 5 * i, 5 ) for i in range( 3 ) ]
+
+def test_merge_in_order(shards, tmp_path):
+    with open( shards[ 0 ] + ".grm.id", "w" ) as grm_file:
+        grm_file.write( "fid0\tiid0\n" )
+
+    output = str( tmp_path / "merged" )
+    merge.merge_shards( shards, output )
+
+    with open( output + ".bim" ) as bim_file:
+        assert [ line.split( )[ 1 ] for line in bim_file ] == [ "rs{0}".format( i ) for i in range( 15 ) ]
+
+    with open( output + ".grm.id" ) as grm_file:
+        assert grm_file.read( ) == "fid0\tiid0\n"
+
+@pytest.mark.parametrize( "order", [ [ 1, 0, 2 ], [ 0, 0, 1, 2 ], [ 0, 2 ] ] )
+def test_merge_rejects_order(shards, tmp_path, order):
+    with pytest.raises( ValueError ):
+        merge.merge_shards( [ shards[ i ] for i in order ], str( tmp_path / "merged" ) )
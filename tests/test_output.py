@@ -0,0 +1,21 @@
+import numpy as np
+
+from epigen.plink.output import OutputFiles, minor_allele_frequencies
+
+def test_minor_allele_frequencies_are_folded_and_skip_missing():
+    rows = np.array( [ [ 2, 2, 2, 1 ],
+                       [ 0, 0, 1, 3 ],
+                       [ 3, 3, 3, 3 ] ] )
+
+    mafs = minor_allele_frequencies( rows )
+
+    assert np.allclose( mafs[ :2 ], [ 1.0 / 8, 1.0 / 6 ] )
+    assert np.isnan( mafs[ 2 ] )
+
+def test_summary_has_no_timings(tmp_path, capsys):
+    output_files = OutputFiles( str( tmp_path / "out" ), [ 0, 1, 0, 1 ], queue_depth = 1 )
+    output_files.write( np.array( [ 0, 1, 2, 1 ] ), np.array( [ 1, 1, 0, 2 ] ), 1, 0 )
+    output_files.close( )
+
+    assert not any( key.startswith( "writer-" ) for key in output_files.summary( ) )
+    assert "writer-stall-seconds" in capsys.readouterr( ).err
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from epigen.plink import bed, freq, qc
+from epigen.plink.plink_file import PlinkFile
+
+def test_append_keeps_statistics_of_existing_variants(tmp_path):
+    prefix = str( tmp_path / "append" )
+    rng = np.random.RandomState( 0 )
+    first = rng.randint( 0, 4, size = ( 5, 9 ) )
+    second = rng.randint( 0, 3, size = ( 4, 9 ) )
+
+    pf = PlinkFile( prefix, [ -9 ] * 9, True )
+    pf.write_block( 0, first )
+    pf.close( )
+
+    pf = PlinkFile( prefix, [ -9 ] * 9, True, append = True )
+    pf.write_block( 5, second )
+    pf.close( )
+
+    expected = qc.GenotypeStats( )
+    expected.update( np.vstack( [ first, second ] ) )
+
+    assert pf.stats.summary( ) == pytest.approx( expected.summary( ) )
+    assert freq.scan_bed( bed.open_bed( prefix ) ).shape == ( 9, 4 )
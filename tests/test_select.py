@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from epigen.plink import cache, multi, select
+
+def write_contigs(plink_writer, name, contigs, positions = None):
+    num_variants = len( contigs )
+    if positions is None:
+        positions = [ 1000 * ( i + 1 ) for i in range( num_variants ) ]
+
+    genotypes = np.tile( [ 0, 1, 2, 1 ], ( num_variants, 1 ) )
+    loci = [ ( c, "rs{0}".format( i ), p ) for i, ( c, p ) in enumerate( zip( contigs, positions ) ) ]
+    samples = [ ( "fam{0}".format( i ), "iid{0}".format( i ) ) for i in range( 4 ) ]
+
+    return plink_writer( name, genotypes, samples, loci )
+
+def test_chromosome_matches_contig_name(plink_writer):
+    contigs = [ "ctgA", "ctgB" ] * 10
+    plink_file = cache.open_plink( write_contigs( plink_writer, "contigs", contigs ) )
+    loci = plink_file.get_loci( )
+
+    random.seed( 1 )
+    constraints = select.CausalConstraints( chromosomes = [ "ctgA" ] )
+    selected = select.select_causal( plink_file, 10, constraints )
+
+    assert sorted( selected ) == [ i for i, c in enumerate( contigs ) if c == "ctgA" ]
+    assert all( loci.chromosome_names[ loci.chromosomes[ i ] ] == "ctgA" for i in selected )
+
+def test_chromosome_aliases(plink_writer):
+    contigs = [ "chr1", "chr2", "chrX", "chrM" ]
+    plink_file = cache.open_plink( write_contigs( plink_writer, "aliases", contigs ) )
+
+    for name, expected in [ ( "1", 0 ), ( "02", 1 ), ( "23", 2 ), ( "MT", 3 ) ]:
+        constraints = select.CausalConstraints( chromosomes = [ name ] )
+        assert select.select_causal( plink_file, 1, constraints ) == [ expected ]
+
+def test_unknown_chromosome_is_rejected(plink_writer):
+    plink_file = cache.open_plink( write_contigs( plink_writer, "unknown", [ "ctgA", "ctgB" ] ) )
+
+    with pytest.raises( ValueError ):
+        select.select_causal( plink_file, 1, select.CausalConstraints( chromosomes = [ "ctgC" ] ) )
+
+def test_min_distance_on_different_contigs(plink_writer):
+    # Both variants are at the same position but on different contigs
+    contigs = [ "ctgA", "ctgB" ]
+    plink_file = cache.open_plink( write_contigs( plink_writer, "distance", contigs, [ 1000, 1000 ] ) )
+
+    constraints = select.CausalConstraints( min_distance = 100 )
+    assert sorted( select.select_causal( plink_file, 2, constraints ) ) == [ 0, 1 ]
+
+def test_multi_file_chromosomes(plink_writer, tmp_path):
+    first = write_contigs( plink_writer, "first", [ "ctgA", "ctgB" ] )
+    second = write_contigs( plink_writer, "second", [ "ctgB", "ctgC" ] )
+    list_path = tmp_path / "list.txt"
+    list_path.write_text( "{0}\n{1}\n".format( first, second ) )
+
+    plink_file = multi.MultiPlinkFile( multi.read_list( str( list_path ) ) )
+    constraints = select.CausalConstraints( chromosomes = [ "ctgB" ] )
+
+    assert sorted( select.select_causal( plink_file, 2, constraints ) ) == [ 1, 2 ]
@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+
+from epigen.plink import generate, genmodels, output, stream
+from epigen.plink.manifest import read_manifest
+
+def write_data(prefix, **kwargs):
+    random.seed( 5 )
+    np.random.seed( 5 )
+
+    mu = [ 0.1, 0.1, 0.1, 0.1, 0.5, 0.1, 0.1, 0.1, 0.1 ]
+    fixed_params = genmodels.FixedParams( [ 0.3, 0.4 ], None, [ 30, 31 ], False )
+    model, params = genmodels.get_model_and_params( "binomial", mu, 1.0, [ 0.3, 0.4 ], None )
+
+    return generate.write_general_data( model, fixed_params, [ ( 20, 1, params ) ], prefix, manifest = True, **kwargs )
+
+def test_stream_round_trip_matches_files(tmp_path, monkeypatch):
+    # Several BIM, BED and PAIR frames
+    monkeypatch.setattr( output, "BLOCK_GENOTYPES", 61 * 8 )
+
+    on_disk = str( tmp_path / "disk" )
+    write_data( on_disk )
+
+    streamed = str( tmp_path / "streamed" )
+    write_data( streamed, stream = streamed + ".stream" )
+    assert stream.write_files( streamed + ".stream", streamed ) == ( 40, 20 )
+
+    for ext in [ ".bed", ".bim", ".fam" ]:
+        with open( on_disk + ext, "rb" ) as disk_file, open( streamed + ext, "rb" ) as streamed_file:
+            assert disk_file.read( ) == streamed_file.read( ), ext
+
+    expected = read_manifest( on_disk + ".manifest" )
+    manifest = read_manifest( streamed + ".manifest" )
+    for name in expected:
+        assert np.array_equal( manifest[ name ], expected[ name ] ), name
+
+def test_frame_without_payload(tmp_path):
+    path = str( tmp_path / "empty.stream" )
+    writer = stream.StreamWriter( path )
+    writer.write_frame( stream.BIM_FRAME )
+    writer.close( )
+
+    reader = stream.StreamReader( path )
+    assert list( reader.frames( ) ) == [ ( stream.BIM_FRAME, b"" ) ]
+    reader.close( )
@@ -0,0 +1,28 @@
+import numpy as np
+
+from epigen.plink import cache, subset
+
+def test_keep_matches_fid_and_iid(plink_writer, tmp_path):
+    samples = [ ( "fam0", "p1" ), ( "fam1", "p1" ), ( "fam2", "p2" ) ]
+    genotypes = np.array( [ [ 0, 1, 2 ], [ 2, 1, 0 ] ] )
+    prefix = plink_writer( "repeated", genotypes, samples )
+
+    keep = tmp_path / "keep.txt"
+    keep.write_text( "fam1 p1\nfam2 p2\n" )
+
+    subset_file = subset.open_subset( cache.open_plink( prefix ), str( keep ) )
+    kept = list( subset_file.get_samples( ) )
+
+    assert [ ( s.fid, s.iid ) for s in kept ] == [ ( "fam1", "p1" ), ( "fam2", "p2" ) ]
+    assert subset_file.read_row( 0 ).tolist( ) == [ 1, 2 ]
+    assert subset_file.read_row( 1 ).tolist( ) == [ 1, 0 ]
+
+def test_keep_skips_unknown_family(plink_writer, tmp_path):
+    samples = [ ( "fam0", "p1" ), ( "fam1", "p1" ) ]
+    prefix = plink_writer( "unknown", np.zeros( ( 1, 2 ) ), samples )
+
+    keep = tmp_path / "keep.txt"
+    keep.write_text( "fam9 p1\nfam0 p1\n" )
+
+    kept = subset.open_subset( cache.open_plink( prefix ), str( keep ) ).get_samples( )
+    assert [ ( s.fid, s.iid ) for s in kept ] == [ ( "fam0", "p1" ) ]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from epigen.plink import genmodels, info
+from epigen.plink.util import solve_beta0
+
+@pytest.mark.parametrize( "link", [ "logodds", "log", "identity", "logc" ] )
+@pytest.mark.parametrize( "prevalence", [ 0.01, 0.2, 0.5, 0.9 ] )
+def test_solve_beta0_reaches_prevalence(link, prevalence):
+    rng = np.random.RandomState( 0 )
+    eta = rng.normal( scale = 2.0, size = 1000 )
+    eta[ 3 ] = np.nan
+    lf = genmodels.get_array_link( "binomial", link )
+
+    beta0 = solve_beta0( eta, lf, prevalence )
+    mu = np.clip( lf( eta[ ~np.isnan( eta ) ] + beta0 ), 0.0, 1.0 )
+
+    assert np.mean( mu ) == pytest.approx( prevalence, abs = 1e-9 )
+
+def test_solve_beta0_clips_mean_values():
+    # With the log link most samples have a mean value above 1 at the
+    # solution, each of them is only one case
+    eta = np.linspace( 0.0, 10.0, 101 )
+    lf = genmodels.get_array_link( "binomial", "log" )
+
+    beta0 = solve_beta0( eta, lf, 0.5 )
+    assert np.mean( np.minimum( np.exp( eta + beta0 ), 1.0 ) ) == pytest.approx( 0.5 )
+    assert info.compute_realised( "binomial", np.exp( eta + beta0 ), 1.0 )[ "prevalence" ] == pytest.approx( 0.5 )
+
+def test_solve_beta0_weights():
+    eta = np.arange( 9, dtype = np.float64 )
+    weights = np.array( [ 0.5 ] + [ 0.5 / 8 ] * 8 )
+    lf = genmodels.get_array_link( "binomial", "logodds" )
+
+    beta0 = solve_beta0( eta, lf, 0.3, weights )
+    assert np.dot( weights, lf( eta + beta0 ) ) == pytest.approx( 0.3 )
+
+def test_solve_beta0_unreachable():
+    lf = genmodels.get_array_link( "binomial", "logodds" )
+    with pytest.raises( ValueError ):
+        solve_beta0( np.zeros( 10 ), lf, 1.0 )